@@ -0,0 +1,119 @@
+"""
+Benchmark the bot data JSON codecs.
+
+Builds a synthetic bot_data document with 10k reminders and 5k media entries
+and times parsing and serializing it with every installed codec, in both the
+pretty (indented) and compact file layouts.
+
+Usage:
+    python bench_codec.py [--reminders 10000] [--media 5000] [--repeat 5]
+"""
+import argparse
+import datetime
+import random
+import time
+
+import codec as codec_module
+from codec import JsonCodec
+
+
+def build_bot_data(reminder_count: int, media_count: int) -> dict:
+    """
+    Build a synthetic bot_data document.
+
+    Args:
+        reminder_count (int): Total number of reminders, split across the three reminder sections
+        media_count (int): Total number of image and video entries
+
+    Returns:
+        dict: Bot data in the on-disk JSON shape
+    """
+    rng = random.Random(42)
+    users = [str(100000000 + i) for i in range(50)]
+    start = datetime.datetime(2025, 1, 1)
+    data = {
+        'user_roles': {user: rng.choice(['boyfriend', 'girlfriend']) for user in users},
+        'user_names': {user: f"name {user[-3:]}" for user in users},
+        'daily_reminders': {},
+        'one_time_reminders': {},
+        'partner_reminders': {},
+        'content': {'boyfriend': {'image_paths': [], 'video_messages': []},
+                    'girlfriend': {'image_paths': [], 'video_messages': []}},
+        'flirt_messages': [f"flirt message {i} 💕" for i in range(100)],
+        'jokes': [f"joke number {i} 😂" for i in range(100)],
+    }
+
+    for i in range(reminder_count):
+        user = rng.choice(users)
+        created_at = (start + datetime.timedelta(minutes=i)).isoformat()
+        due = (start + datetime.timedelta(hours=i)).isoformat()
+        if i % 3 == 0:
+            data['daily_reminders'].setdefault(user, []).append({
+                'id': f"{i:08x}", 'text': f"drink water #{i} 💧", 'time': f"{i % 24:02d}:{i % 60:02d}",
+                'active': True, 'created_at': created_at})
+        elif i % 3 == 1:
+            data['one_time_reminders'].setdefault(user, []).append({
+                'id': f"{i:08x}", 'text': f"call mom #{i}", 'datetime': due, 'sent': i % 2 == 0,
+                'created_at': created_at})
+        else:
+            data['partner_reminders'].setdefault(user, []).append({
+                'id': f"{i:08x}", 'text': f"i miss you #{i} 💕", 'datetime': due, 'sent': False,
+                'sender_id': int(rng.choice(users)), 'sender_name': 'anselm', 'created_at': created_at})
+
+    for i in range(media_count):
+        role = 'boyfriend' if i % 2 else 'girlfriend'
+        if i % 4 < 3:
+            data['content'][role]['image_paths'].append(f"images/{role}/submitted_{1753333269 + i}_AgACAgUA.jpg")
+        else:
+            data['content'][role]['video_messages'].append(f"videos/{role}/bubble_{1753339794 + i}_DQACAgUA.mp4")
+
+    return data
+
+
+def best_of(repeat: int, func) -> float:
+    """
+    Time a function.
+
+    Args:
+        repeat (int): Number of runs
+        func: Function to call
+
+    Returns:
+        float: Fastest run in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot data JSON codecs")
+    parser.add_argument('--reminders', type=int, default=10000)
+    parser.add_argument('--media', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = build_bot_data(args.reminders, args.media)
+    backends = ['json']
+    if codec_module.orjson is not None:
+        backends.append('orjson')
+    if codec_module.msgspec is not None:
+        backends.append('msgspec')
+
+    print(f"bot_data with {args.reminders} reminders and {args.media} media entries (best of {args.repeat})\n")
+    print(f"{'codec':<8} {'layout':<8} {'size':>10} {'serialize':>12} {'parse':>10}")
+    for backend in backends:
+        json_codec = JsonCodec(backend)
+        for pretty in (True, False):
+            encoded = json_codec.dumps(data, pretty=pretty)
+            serialize_ms = best_of(args.repeat, lambda: json_codec.dumps(data, pretty=pretty))
+            parse_ms = best_of(args.repeat, lambda: json_codec.loads(encoded))
+            layout = 'pretty' if pretty else 'compact'
+            print(f"{backend:<8} {layout:<8} {len(encoded) / 1024:>8.0f}KB {serialize_ms:>10.1f}ms {parse_ms:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
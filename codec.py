@@ -0,0 +1,111 @@
+import json
+import logging
+from typing import Any, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JsonCodec:
+    """
+    Encodes and decodes bot data, using the fastest JSON library available.
+
+    orjson and msgspec are several times faster than the stdlib json module
+    for both parsing and serializing, which matters once bot data holds
+    thousands of reminders and media entries. All three produce the same
+    UTF-8 JSON, so files written by one can be read by any other.
+
+    In compact mode the live data files are written without indentation,
+    which makes them smaller and faster to write; `python storage.py export`
+    produces a pretty copy for humans.
+    """
+
+    def __init__(self, backend: str = 'auto', compact: bool = False):
+        """
+        Create a codec.
+
+        Args:
+            backend (str): 'orjson', 'msgspec', 'json' or 'auto' (fastest installed)
+            compact (bool): Write data files without indentation
+        """
+        self.configure(backend, compact)
+
+    def configure(self, backend: str = 'auto', compact: bool = False) -> None:
+        """
+        Switch the JSON library and file layout.
+
+        Args:
+            backend (str): 'orjson', 'msgspec', 'json' or 'auto' (fastest installed)
+            compact (bool): Write data files without indentation
+        """
+        self.compact = compact
+        if backend == 'auto':
+            backend = 'orjson' if orjson else 'msgspec' if msgspec else 'json'
+        elif backend == 'orjson' and orjson is None or backend == 'msgspec' and msgspec is None:
+            logger.warning(f"JSON codec '{backend}' is not installed, falling back to json")
+            backend = 'json'
+        elif backend not in ('orjson', 'msgspec', 'json'):
+            logger.warning(f"Unknown JSON codec '{backend}', falling back to json")
+            backend = 'json'
+        self.name = backend
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """
+        Parse JSON.
+
+        Args:
+            data (Union[bytes, str]): UTF-8 JSON document
+
+        Returns:
+            Any: Decoded value
+        """
+        if self.name == 'orjson':
+            return orjson.loads(data)
+        if self.name == 'msgspec':
+            return msgspec.json.decode(data)
+        return json.loads(data)
+
+    def dumps(self, value: Any, pretty: bool = False) -> bytes:
+        """
+        Serialize to UTF-8 JSON.
+
+        Args:
+            value: JSON-serializable value
+            pretty (bool): Indent with 2 spaces for humans instead of the compact form
+
+        Returns:
+            bytes: Encoded document (non-ASCII characters are kept as UTF-8)
+        """
+        if self.name == 'orjson':
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2 if pretty else 0)
+        if self.name == 'msgspec':
+            encoded = msgspec.json.encode(value)
+            return msgspec.json.format(encoded, indent=2) if pretty else encoded
+        if pretty:
+            return json.dumps(value, indent=2, ensure_ascii=False).encode('utf-8')
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def dumps_file(self, value: Any) -> bytes:
+        """
+        Serialize a data file in the configured layout (pretty unless compact mode is on).
+
+        Args:
+            value: JSON-serializable value
+
+        Returns:
+            bytes: Encoded document
+        """
+        return self.dumps(value, pretty=not self.compact)
+
+
+# Shared codec for all bot data files; main.py configures it from BOT_DATA_CODEC / BOT_DATA_COMPACT
+codec = JsonCodec()
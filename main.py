@@ -1,15 +1,26 @@
 import logging
 import os
-import json
 import random
 import datetime
 import asyncio
 from re import S
 import threading
+import time
+import functools
+import heapq
+import secrets
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import pytz
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from dotenv import load_dotenv
+from codec import codec
+from models import (FIRE_SENDING, FIRE_SENT, FIRE_SKIPPED, REMINDER_TYPES, DailyReminder, OneTimeReminder, PartnerReminder, UserProfile,
+                    next_time_of_day, parse_due_datetime, timestamp_to_local)
+from recurrence import CronRule, parse_recurrence
+from storage import BotDataStore, FileLease, JournaledBotDataStore, append_to_archive, open_sqlite_store
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.error import BadRequest, Forbidden, RetryAfter
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -20,6 +31,11 @@ from telegram.ext import (
     filters,
 )
 
+try:
+    from tzlocal import get_localzone_name
+except ImportError:
+    get_localzone_name = None
+
 # Load environment variables
 load_dotenv()
 
@@ -121,51 +137,187 @@ def format_time_with_both_zones(base_time: str, context: str = "") -> str:
     
     return time_display
 
-# Helper function to load JSON data
-def load_json_data(filename: str) -> dict:
+# Bounded thread pool for blocking I/O (media files and every bot data store call) so handlers never stall the event loop.
+# IO_THREADS=0 runs the I/O inline on the loop (the old behaviour), useful to compare loop stall times.
+IO_THREADS = int(os.getenv("IO_THREADS", "4"))
+io_executor = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="bot-io") if IO_THREADS > 0 else None
+
+async def run_blocking(func, *args):
     """
-    Load JSON data from a file in the same directory as the script.
+    Run a blocking function in the I/O thread pool and wait for its result.
     
     Args:
-        filename (str): Name of the JSON file to load
+        func: Blocking function to run
+        *args: Positional arguments for the function
         
     Returns:
-        dict: Loaded JSON data or empty dict if error occurs
+        Whatever the function returns (exceptions are re-raised in the caller)
     """
-    try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        json_path = os.path.join(script_dir, filename)
-        
-        with open(json_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        logger.error(f"File not found: {filename}")
-        return {}
-    except Exception as e:
-        logger.error(f"Error loading {filename}: {e}")
-        return {}
+    if io_executor is None:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args))
 
-def save_json_data(filename: str, data: dict) -> bool:
+def find_existing_files(relative_paths: list) -> tuple:
     """
-    Save JSON data to a file in the same directory as the script.
+    Resolve content paths against the script directory and keep the ones that exist.
     
     Args:
-        filename (str): Name of the JSON file to save
-        data (dict): Data to save
+        relative_paths (list): Paths relative to the script directory
         
     Returns:
-        bool: True if successful, False otherwise
+        tuple: (absolute paths, matching relative paths) of the files found on disk
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    full_paths = []
+    found_paths = []
+    for relative_path in relative_paths:
+        full_path = os.path.join(script_dir, relative_path)
+        if os.path.exists(full_path):
+            full_paths.append(full_path)
+            found_paths.append(relative_path)
+    return full_paths, found_paths
+
+def read_media_file(path: str) -> InputFile:
     """
-    try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        json_path = os.path.join(script_dir, filename)
+    Read a media file into memory so it can be uploaded without touching the disk on the loop.
+    
+    Args:
+        path (str): Absolute path of the file
         
-        with open(json_path, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=2, ensure_ascii=False)
-        return True
-    except Exception as e:
-        logger.error(f"Error saving {filename}: {e}")
-        return False
+    Returns:
+        InputFile: File contents ready to pass to reply_photo / reply_video
+    """
+    with open(path, 'rb') as file:
+        return InputFile(file.read(), filename=os.path.basename(path))
+
+def write_media_file(path: str, content: bytes) -> None:
+    """
+    Write downloaded media to disk, creating its directory if needed.
+    
+    Args:
+        path (str): Absolute path of the file
+        content (bytes): File contents
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+
+class EventLoopMonitor:
+    """
+    Measures how long the event loop is blocked by synchronous work.
+    
+    A task sleeps for a short interval and records how late it wakes up; any
+    delay past the threshold is time where no other update could be handled.
+    """
+    
+    def __init__(self, interval: float = 0.1, threshold: float = 0.05):
+        """
+        Initialize the monitor.
+        
+        Args:
+            interval (float): Seconds between probes
+            threshold (float): Lateness in seconds that counts as a stall
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked_seconds = 0.0
+        self.stalls = 0
+        self.longest_stall = 0.0
+        self.started_at = None
+        self._task = None
+    
+    def start(self):
+        """Start probing the running event loop."""
+        if self._task is None:
+            self.started_at = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._probe())
+    
+    async def _probe(self):
+        """Sleep repeatedly and accumulate how late each wakeup was."""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lateness = time.monotonic() - expected
+            if lateness > self.threshold:
+                self.blocked_seconds += lateness
+                self.stalls += 1
+                self.longest_stall = max(self.longest_stall, lateness)
+    
+    def summary(self) -> str:
+        """
+        Describe the blocked time measured so far.
+        
+        Returns:
+            str: Human readable summary for the logs
+        """
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        return (f"event loop blocked for {self.blocked_seconds:.3f}s over {uptime:.0f}s "
+                f"({self.stalls} stalls, longest {self.longest_stall * 1000:.0f}ms, io threads: {IO_THREADS})")
+    
+    async def stop(self):
+        """Stop probing and log the summary."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info(self.summary())
+
+# Global event loop monitor
+loop_monitor = EventLoopMonitor()
+
+def create_bot_data_store():
+    """
+    Create the shared data store for the configured backend.
+    
+    BOT_DATA_BACKEND=json (default) keeps the bot_data/ shards (profiles, reminders,
+    content, catalog) in memory and coalesces writes into one atomic flush per second,
+    rewriting only the shards that changed. BOT_DATA_BACKEND=journal appends each change
+    to bot_data.journal.jsonl and compacts it into the shards every few minutes.
+    BOT_DATA_BACKEND=sqlite uses bot_data.db in WAL mode, importing the shards
+    (or bot_data_backup.json) the first time it is opened.
+    
+    A single-file bot_data.json from older versions is split into shards on first start.
+    
+    BOT_DATA_CODEC picks the JSON library (orjson, msgspec or json; default: the fastest
+    installed) and BOT_DATA_COMPACT=1 writes the shards without indentation.
+    
+    Returns:
+        BotDataStore, JournaledBotDataStore or SqliteBotDataStore: The store used by all data helpers
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    backend = os.getenv("BOT_DATA_BACKEND", "json").lower()
+    codec.configure(
+        os.getenv("BOT_DATA_CODEC", "auto").lower(),
+        compact=os.getenv("BOT_DATA_COMPACT", "0").lower() in ("1", "true", "yes")
+    )
+    logger.info(f"Using {codec.name} for bot data ({'compact' if codec.compact else 'pretty'} files)")
+    shard_dir = os.path.join(script_dir, 'bot_data')
+    legacy_path = os.path.join(script_dir, 'bot_data.json')
+    
+    if backend == "sqlite":
+        return open_sqlite_store(
+            os.path.join(script_dir, 'bot_data.db'),
+            [shard_dir, legacy_path, os.path.join(script_dir, 'bot_data_backup.json')]
+        )
+    
+    if backend == "journal":
+        return JournaledBotDataStore(
+            shard_dir,
+            os.path.join(script_dir, 'bot_data.journal.jsonl'),
+            compact_interval=300.0,
+            legacy_path=legacy_path
+        )
+    
+    if backend != "json":
+        logger.warning(f"Unknown BOT_DATA_BACKEND '{backend}', falling back to json")
+    return BotDataStore(shard_dir, flush_interval=1.0, legacy_path=legacy_path)
+
+# Shared data store - all reads and writes of bot data go through it
+bot_data_store = create_bot_data_store()
 
 def calculate_days_between(start_date: str, end_date: str) -> int:
     """
@@ -204,6 +356,110 @@ def days_from_today(target_date: str) -> int:
         logger.error(f"Error calculating days from today: {e}")
         return 0
 
+# Seconds a cached profile is trusted; set/join invalidate it immediately, the TTL only covers manual edits
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+
+class ProfileCache:
+    """
+    Per-user cache of resolved profiles (role, name, couple, partner, timezone).
+    
+    A single button press asks for the user's role several times and the scheduler
+    looks up a name for every reminder it sends; with the cache only the first lookup
+    reads the store. set_user_role, set_user_name and pairing invalidate the affected
+    users right after writing.
+    """
+    
+    def __init__(self, ttl: float = 300.0):
+        """
+        Create an empty cache.
+        
+        Args:
+            ttl (float): Seconds before a cached profile is re-read from the store
+        """
+        self.ttl = ttl
+        self._profiles = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: int) -> UserProfile:
+        """
+        Get a user's profile, loading it from the store on a miss.
+        
+        Args:
+            user_id (int): Telegram user ID
+            
+        Returns:
+            UserProfile: The user's profile (read-only; fields are None if not set)
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._profiles.get(user_id)
+            if cached and now - cached[1] < self.ttl:
+                return cached[0]
+            generation = self._generation
+        
+        profile = self._load(user_id)
+        with self._lock:
+            # Don't cache a profile read while an invalidation raced with us
+            if generation == self._generation:
+                self._profiles[user_id] = (profile, now)
+        return profile
+    
+    def invalidate(self, *user_ids: int) -> None:
+        """
+        Drop cached profiles so the next lookup re-reads them.
+        
+        Args:
+            *user_ids (int): Telegram user IDs to forget
+        """
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._profiles.pop(user_id, None)
+    
+    def _load(self, user_id: int) -> UserProfile:
+        """Resolve a profile from the store."""
+        role = bot_data_store.get_user_value('user_roles', user_id)
+        name = bot_data_store.get_user_value('user_names', user_id)
+        couple_id = bot_data_store.get_user_couple(user_id)
+        couple = bot_data_store.get_couple(couple_id) if couple_id else None
+        partner_id = None
+        for uid in (couple['members'] if couple else []):
+            if int(uid) != user_id:
+                partner_id = int(uid)
+        return UserProfile(user_id, role, name, couple_id, partner_id, get_user_timezone(role))
+
+# Shared profile cache - identity lookups in handlers and the scheduler go through it
+profile_cache = ProfileCache(ttl=PROFILE_CACHE_TTL)
+
+def get_user_profile(user_id: int) -> UserProfile:
+    """
+    Get a user's resolved profile from the cache.
+    
+    Args:
+        user_id (int): Telegram user ID
+        
+    Returns:
+        UserProfile: Role, name, couple, partner and timezone of the user
+    """
+    try:
+        return profile_cache.get(user_id)
+    except Exception as e:
+        logger.error(f"Error getting profile for user {user_id}: {e}")
+        return UserProfile(user_id)
+
+def get_user_now(user_id: int) -> datetime.datetime:
+    """
+    Get the current wall-clock time in a user's timezone.
+    
+    Args:
+        user_id (int): Telegram user ID
+        
+    Returns:
+        datetime.datetime: Naive local time of the user (minute precision starts from here)
+    """
+    return timestamp_to_local(time.time(), get_user_profile(user_id).timezone)
+
 def get_user_role(user_id: int) -> Optional[str]:
     """
     Get the role of a user (boyfriend or girlfriend).
@@ -214,13 +470,7 @@ def get_user_role(user_id: int) -> Optional[str]:
     Returns:
         Optional[str]: User role ('boyfriend' or 'girlfriend') or None if not set
     """
-    try:
-        data = load_json_data('bot_data.json')
-        user_roles = data.get('user_roles', {})
-        return user_roles.get(str(user_id))
-    except Exception as e:
-        logger.error(f"Error getting user role: {e}")
-        return None
+    return get_user_profile(user_id).role
 
 def get_user_name(user_id: int) -> Optional[str]:
     """
@@ -232,13 +482,7 @@ def get_user_name(user_id: int) -> Optional[str]:
     Returns:
         Optional[str]: User name or None if not set
     """
-    try:
-        data = load_json_data('bot_data.json')
-        user_names = data.get('user_names', {})
-        return user_names.get(str(user_id))
-    except Exception as e:
-        logger.error(f"Error getting user name: {e}")
-        return None
+    return get_user_profile(user_id).name
 
 def set_user_name(user_id: int, name: str) -> bool:
     """
@@ -252,12 +496,9 @@ def set_user_name(user_id: int, name: str) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        if 'user_names' not in data:
-            data['user_names'] = {}
-        
-        data['user_names'][str(user_id)] = name
-        return save_json_data('bot_data.json', data)
+        success = bot_data_store.set_user_value('user_names', user_id, name)
+        profile_cache.invalidate(user_id)
+        return success
     except Exception as e:
         logger.error(f"Error setting user name: {e}")
         return False
@@ -274,16 +515,304 @@ def set_user_role(user_id: int, role: str) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        if 'user_roles' not in data:
-            data['user_roles'] = {}
-        
-        data['user_roles'][str(user_id)] = role
-        return save_json_data('bot_data.json', data)
+        success = bot_data_store.set_user_value('user_roles', user_id, role)
+        profile_cache.invalidate(user_id)
+        return success
     except Exception as e:
         logger.error(f"Error setting user role: {e}")
         return False
 
+def set_user_role_and_name(user_id: int, role: str, name: str) -> bool:
+    """
+    Set a user's role and name together (blocking, run it through run_blocking).
+    
+    Args:
+        user_id (int): Telegram user ID
+        role (str): Role to set ('boyfriend' or 'girlfriend')
+        name (str): Name to set
+        
+    Returns:
+        bool: True if both were saved, False otherwise
+    """
+    try:
+        # One transaction so nobody reads a half-updated profile
+        with bot_data_store.transaction(('user_roles', user_id), ('user_names', user_id)):
+            role_success = set_user_role(user_id, role)
+            name_success = set_user_name(user_id, name)
+        return role_success and name_success
+    except Exception as e:
+        logger.error(f"Error setting user role and name: {e}")
+        return False
+
+# Invite codes avoid look-alike characters (0/O, 1/I/L) since they're typed by hand
+INVITE_CODE_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+INVITE_CODE_LENGTH = 6
+
+# Outcomes of join_couple_by_invite
+JOIN_PAIRED = 'paired'
+JOIN_UNKNOWN_CODE = 'unknown_code'
+JOIN_OWN_CODE = 'own_code'
+JOIN_SAME_ROLE = 'same_role'
+JOIN_FAILED = 'failed'
+
+def get_user_couple_id(user_id: int) -> Optional[str]:
+    """
+    Get the ID of the couple a user belongs to.
+    
+    Args:
+        user_id (int): Telegram user ID
+        
+    Returns:
+        Optional[str]: Couple ID or None if the user hasn't created or joined a couple
+    """
+    return get_user_profile(user_id).couple_id
+
+def create_couple_invite(user_id: int) -> Optional[str]:
+    """
+    Create a couple for a user and get the invite code their partner joins with.
+    If the user already created a couple that is still waiting for a partner, its code is returned.
+    
+    Args:
+        user_id (int): Telegram user ID of the inviting partner
+        
+    Returns:
+        Optional[str]: Invite code, or None if the user is already paired or the couple couldn't be saved
+    """
+    try:
+        couple_id = bot_data_store.get_user_couple(user_id)
+        if couple_id:
+            couple = bot_data_store.get_couple(couple_id)
+            return couple.get('invite_code') if couple else None
+        
+        for _ in range(5):
+            invite_code = ''.join(secrets.choice(INVITE_CODE_ALPHABET) for _ in range(INVITE_CODE_LENGTH))
+            if bot_data_store.get_couple_by_invite(invite_code) is None:
+                break
+        
+        if bot_data_store.create_couple(uuid.uuid4().hex[:8], user_id, invite_code):
+            profile_cache.invalidate(user_id)
+            return invite_code
+        return None
+    except Exception as e:
+        logger.error(f"Error creating couple invite: {e}")
+        return None
+
+def join_couple_by_invite(user_id: int, invite_code: str, check_roles: bool = True) -> Tuple[str, Optional[int]]:
+    """
+    Join the couple behind an invite code (blocking, run it through run_blocking).
+    
+    The code is checked again and the roles compared inside the store transaction
+    that joins, so a code used or a role changed in the meantime can't slip through.
+    
+    Args:
+        user_id (int): Telegram user ID of the joining partner
+        invite_code (str): Code shared by the inviting partner (case-insensitive)
+        check_roles (bool): Refuse to pair two users holding the same role
+        
+    Returns:
+        Tuple[str, Optional[int]]: One of the JOIN_* outcomes and the inviting partner's user ID (None if the code is unknown)
+    """
+    try:
+        invite_code = invite_code.strip().upper()
+        couple_id = bot_data_store.get_couple_by_invite(invite_code)
+        couple = bot_data_store.get_couple(couple_id) if couple_id else None
+        if not couple:
+            return JOIN_UNKNOWN_CODE, None
+        inviter_id = int(couple['members'][0])
+        if inviter_id == user_id:
+            return JOIN_OWN_CODE, inviter_id
+        
+        with bot_data_store.transaction(('couples', couple_id), ('user_roles', user_id), ('user_roles', inviter_id)):
+            if bot_data_store.get_couple_by_invite(invite_code) != couple_id:
+                return JOIN_UNKNOWN_CODE, None
+            user_role = bot_data_store.get_user_value('user_roles', user_id)
+            if check_roles and user_role and user_role == bot_data_store.get_user_value('user_roles', inviter_id):
+                return JOIN_SAME_ROLE, inviter_id
+            if not bot_data_store.join_couple(couple_id, user_id):
+                return JOIN_FAILED, inviter_id
+        
+        profile_cache.invalidate(user_id, inviter_id)
+        return JOIN_PAIRED, inviter_id
+    except Exception as e:
+        logger.error(f"Error joining couple: {e}")
+        return JOIN_FAILED, None
+
+# The two users of a single-couple install (from before couples existed), as comma-separated user IDs.
+# Only these two are ever paired with the old shared photos and bubbles; without it they stay hidden
+LEGACY_COUPLE_MEMBERS = os.getenv("LEGACY_COUPLE_MEMBERS", "")
+
+def migrate_legacy_couple() -> None:
+    """
+    Turn the single couple of older versions into a couple record.
+    
+    Before couples existed, the bot served exactly one boyfriend and one girlfriend and
+    kept their content in the shared 'content' section. Who those two were isn't recorded
+    anywhere reliable (role holders can be anyone who picked a role since), so they must be
+    named in LEGACY_COUPLE_MEMBERS. They are paired if they aren't yet, and the legacy content
+    moves into their couple's partition. Runs once: the couple ID is remembered as 'legacy_couple'.
+    Until then the legacy content isn't shown to anyone.
+    """
+    try:
+        if bot_data_store.get('legacy_couple'):
+            return
+        
+        member_ids = [int(uid) for uid in LEGACY_COUPLE_MEMBERS.replace(' ', '').split(',') if uid]
+        if not member_ids:
+            if any(bot_data_store.get_content(role, content_type)
+                   for role in ('boyfriend', 'girlfriend') for content_type in ('image_paths', 'video_messages', 'telebubbles')):
+                logger.info("Legacy shared content is hidden until LEGACY_COUPLE_MEMBERS names the couple it belongs to")
+            return
+        if len(member_ids) != 2 or member_ids[0] == member_ids[1]:
+            logger.error(f"LEGACY_COUPLE_MEMBERS must be two different user IDs, got {LEGACY_COUPLE_MEMBERS!r}")
+            return
+        
+        first_couple, second_couple = (bot_data_store.get_user_couple(uid) for uid in member_ids)
+        if first_couple and first_couple == second_couple:
+            couple_id = first_couple
+        elif first_couple and second_couple:
+            logger.error(f"Legacy users {member_ids[0]} and {member_ids[1]} belong to different couples, not migrating")
+            return
+        else:
+            # Whoever already has a couple waiting for a partner invites the other
+            inviter, joiner = member_ids if second_couple is None else member_ids[::-1]
+            invite_code = create_couple_invite(inviter)
+            # Their roles predate couples, so a clash doesn't stop the migration (find_role_conflicts reports it)
+            outcome = join_couple_by_invite(joiner, invite_code, check_roles=False)[0] if invite_code else JOIN_FAILED
+            couple_id = bot_data_store.get_user_couple(joiner) if outcome == JOIN_PAIRED else None
+            if not couple_id:
+                logger.error(f"Could not pair legacy users {member_ids[0]} and {member_ids[1]} into a couple")
+                return
+        
+        moved = 0
+        for role in ('boyfriend', 'girlfriend'):
+            for content_type in ('image_paths', 'video_messages', 'telebubbles'):
+                for item in list(bot_data_store.get_content(role, content_type)):
+                    if bot_data_store.add_content(role, content_type, item, couple_id):
+                        bot_data_store.remove_content(role, content_type, item)
+                        moved += 1
+        
+        bot_data_store.set('legacy_couple', couple_id)
+        logger.info(f"Moved {moved} legacy content items into couple {couple_id}")
+    except Exception as e:
+        logger.error(f"Error migrating legacy couple: {e}")
+
+# Zone the server ran in before reminders stored a timezone (default: detected from the system)
+LEGACY_REMINDER_TIMEZONE = os.getenv("LEGACY_REMINDER_TIMEZONE")
+
+def detect_server_timezone() -> Optional[str]:
+    """
+    Get the name of the server's local timezone.
+    
+    LEGACY_REMINDER_TIMEZONE wins if set (the server may have moved since). Otherwise it
+    tries TZ, tzlocal (if installed), /etc/localtime and /etc/timezone, and only accepts a
+    zone whose current UTC offset matches the server's.
+    
+    Returns:
+        Optional[str]: pytz zone name such as 'Asia/Singapore', or None if it can't be determined
+    """
+    if LEGACY_REMINDER_TIMEZONE:
+        if LEGACY_REMINDER_TIMEZONE in pytz.all_timezones_set:
+            return LEGACY_REMINDER_TIMEZONE
+        logger.error(f"Unknown LEGACY_REMINDER_TIMEZONE: {LEGACY_REMINDER_TIMEZONE}")
+    
+    candidates = [os.getenv("TZ")]
+    if get_localzone_name is not None:
+        try:
+            candidates.append(get_localzone_name())
+        except Exception as e:
+            logger.warning(f"tzlocal couldn't determine the server timezone: {e}")
+    localtime = os.path.realpath("/etc/localtime")
+    if "zoneinfo/" in localtime:
+        candidates.append(localtime.split("zoneinfo/", 1)[1])
+    try:
+        with open("/etc/timezone") as f:
+            candidates.append(f.read().strip())
+    except OSError:
+        pass
+    
+    offset = time.localtime().tm_gmtoff
+    for name in candidates:
+        name = (name or "").lstrip(":")
+        if name not in pytz.all_timezones_set:
+            continue
+        if datetime.datetime.now(pytz.timezone(name)).utcoffset().total_seconds() == offset:
+            return name
+        logger.warning(f"Ignoring timezone {name}: its UTC offset doesn't match the server's")
+    return None
+
+def assign_reminder_timezones() -> int:
+    """
+    Give reminders saved before reminders had a timezone the server's timezone.
+    
+    The old code built their times from the server's clock (datetime.now(), "tomorrow",
+    an HH:MM on the server's date) and fired daily reminders at server-local HH:MM,
+    so stamping the server's zone keeps every pending reminder at the instant it would
+    have fired before. This applies to every user, with or without a role. Reminders
+    created from now on get their recipient's zone. All records are updated in one
+    store write.
+    
+    Returns:
+        int: Number of reminders updated
+    """
+    try:
+        updates = [(kind, int(user_id), reminder.id)
+                   for kind in REMINDER_TYPES
+                   for user_id, reminders in bot_data_store.get_all_reminders(kind).items()
+                   for reminder in reminders if reminder.timezone is None]
+        if not updates:
+            return 0
+        
+        server_zone = detect_server_timezone()
+        if server_zone is None:
+            # Without a zone the records keep being read in server time, which is still correct here
+            logger.warning(f"Couldn't determine the server timezone; {len(updates)} reminders stay in server time "
+                           f"(set LEGACY_REMINDER_TIMEZONE to pin them)")
+            return 0
+        
+        if bot_data_store.update_reminders([(kind, user_id, reminder_id, {'timezone': server_zone})
+                                            for kind, user_id, reminder_id in updates]):
+            logger.info(f"Assigned the server timezone {server_zone} to {len(updates)} reminders")
+        return len(updates)
+    except Exception as e:
+        logger.error(f"Error assigning reminder timezones: {e}")
+        return 0
+
+def find_role_conflicts() -> Dict[str, str]:
+    """
+    Find couples whose two members hold the same role, and log a report.
+    
+    Content is submitted for the partner's role, so such a couple would never see
+    each other's photos and bubbles until one of them changes role.
+    
+    Returns:
+        Dict[str, str]: Mapping of couple ID to the role both members hold
+    """
+    try:
+        conflicts = {}
+        for couple_id, couple in bot_data_store.get_couples().items():
+            roles = [bot_data_store.get_user_value('user_roles', int(uid)) for uid in couple['members']]
+            if len(roles) == 2 and roles[0] and roles[0] == roles[1]:
+                conflicts[couple_id] = roles[0]
+        
+        for couple_id, role in conflicts.items():
+            logger.warning(f"Role conflict: both members of couple {couple_id} are set as {role}")
+        return conflicts
+    except Exception as e:
+        logger.error(f"Error checking role conflicts: {e}")
+        return {}
+
+def notify_scheduler(kind: str, user_id: int, reminder_id: str) -> None:
+    """
+    Tell the reminder scheduler that a reminder was added, changed or removed.
+    
+    Args:
+        kind (str): Reminder section name
+        user_id (int): Telegram user ID of the recipient
+        reminder_id (str): Reminder ID
+    """
+    if reminder_scheduler is not None:
+        reminder_scheduler.reschedule(kind, user_id, reminder_id)
+
 def get_user_daily_reminders(user_id: int) -> list:
     """
     Get daily reminders for a specific user.
@@ -295,9 +824,7 @@ def get_user_daily_reminders(user_id: int) -> list:
         list: List of daily reminders for the user
     """
     try:
-        data = load_json_data('bot_data.json')
-        daily_reminders = data.get('daily_reminders', {})
-        return daily_reminders.get(str(user_id), [])
+        return bot_data_store.get_reminders('daily_reminders', user_id)
     except Exception as e:
         logger.error(f"Error getting daily reminders: {e}")
         return []
@@ -313,9 +840,7 @@ def get_user_one_time_reminders(user_id: int) -> list:
         list: List of one-time reminders for the user
     """
     try:
-        data = load_json_data('bot_data.json')
-        one_time_reminders = data.get('one_time_reminders', {})
-        return one_time_reminders.get(str(user_id), [])
+        return bot_data_store.get_reminders('one_time_reminders', user_id)
     except Exception as e:
         logger.error(f"Error getting one-time reminders: {e}")
         return []
@@ -327,58 +852,37 @@ def save_one_time_reminder(user_id: int, reminder_text: str, reminder_datetime:
     Args:
         user_id (int): Telegram user ID
         reminder_text (str): The reminder message
-        reminder_datetime (str): DateTime in ISO format
+        reminder_datetime (str): DateTime in ISO format, in the user's local time
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'one_time_reminders' not in data:
-            data['one_time_reminders'] = {}
-        
-        if str(user_id) not in data['one_time_reminders']:
-            data['one_time_reminders'][str(user_id)] = []
-        
         # Add the new reminder
-        reminder = {
-            'text': reminder_text,
-            'datetime': reminder_datetime,
-            'sent': False,
-            'created_at': datetime.datetime.now().isoformat()
-        }
+        reminder = OneTimeReminder(reminder_text, reminder_datetime, timezone=get_user_profile(user_id).timezone)
         
-        data['one_time_reminders'][str(user_id)].append(reminder)
-        return save_json_data('bot_data.json', data)
+        if not bot_data_store.add_reminder('one_time_reminders', user_id, reminder):
+            return False
+        notify_scheduler('one_time_reminders', user_id, reminder.id)
+        return True
         
     except Exception as e:
         logger.error(f"Error saving one-time reminder: {e}")
         return False
 
-def mark_reminder_sent(user_id: int, reminder_index: int) -> bool:
+def mark_reminder_sent(user_id: int, reminder_id: str) -> bool:
     """
     Mark a one-time reminder as sent.
     
     Args:
         user_id (int): Telegram user ID
-        reminder_index (int): Index of the reminder to mark as sent
+        reminder_id (str): ID of the reminder to mark as sent
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'one_time_reminders' not in data or str(user_id) not in data['one_time_reminders']:
-            return False
-        
-        reminders = data['one_time_reminders'][str(user_id)]
-        if 0 <= reminder_index < len(reminders):
-            reminders[reminder_index]['sent'] = True
-            return save_json_data('bot_data.json', data)
-        
-        return False
+        return bot_data_store.update_reminder('one_time_reminders', user_id, reminder_id, {'sent': True})
         
     except Exception as e:
         logger.error(f"Error marking reminder as sent: {e}")
@@ -386,33 +890,15 @@ def mark_reminder_sent(user_id: int, reminder_index: int) -> bool:
 
 def get_partner_user_id(user_id: int) -> Optional[int]:
     """
-    Get the partner's user ID based on roles.
+    Get the partner's user ID from the user's couple.
     
     Args:
         user_id (int): Current user's Telegram ID
         
     Returns:
-        Optional[int]: Partner's user ID or None if not found
+        Optional[int]: Partner's user ID or None if the user isn't paired yet
     """
-    try:
-        data = load_json_data('bot_data.json')
-        user_roles = data.get('user_roles', {})
-        current_role = user_roles.get(str(user_id))
-        
-        if not current_role:
-            return None
-        
-        # Find partner with opposite role
-        partner_role = 'girlfriend' if current_role == 'boyfriend' else 'boyfriend'
-        
-        for uid, role in user_roles.items():
-            if role == partner_role and int(uid) != user_id:
-                return int(uid)
-        
-        return None
-    except Exception as e:
-        logger.error(f"Error getting partner user ID: {e}")
-        return None
+    return get_user_profile(user_id).partner_id
 
 def save_partner_reminder(sender_id: int, partner_id: int, reminder_text: str, reminder_datetime: str) -> bool:
     """
@@ -422,35 +908,23 @@ def save_partner_reminder(sender_id: int, partner_id: int, reminder_text: str, r
         sender_id (int): User ID who is setting the reminder
         partner_id (int): Partner's user ID who will receive the reminder
         reminder_text (str): The reminder message
-        reminder_datetime (str): DateTime in ISO format
+        reminder_datetime (str): DateTime in ISO format, in the partner's local time
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'partner_reminders' not in data:
-            data['partner_reminders'] = {}
-        
-        if str(partner_id) not in data['partner_reminders']:
-            data['partner_reminders'][str(partner_id)] = []
-        
         # Get sender's name
         sender_name = get_user_name(sender_id) or "your partner"
         
         # Add the new partner reminder
-        reminder = {
-            'text': reminder_text,
-            'datetime': reminder_datetime,
-            'sent': False,
-            'sender_id': sender_id,
-            'sender_name': sender_name,
-            'created_at': datetime.datetime.now().isoformat()
-        }
+        reminder = PartnerReminder(reminder_text, reminder_datetime, sender_id=sender_id, sender_name=sender_name,
+                                   timezone=get_user_profile(partner_id).timezone)
         
-        data['partner_reminders'][str(partner_id)].append(reminder)
-        return save_json_data('bot_data.json', data)
+        if not bot_data_store.add_reminder('partner_reminders', partner_id, reminder):
+            return False
+        notify_scheduler('partner_reminders', partner_id, reminder.id)
+        return True
         
     except Exception as e:
         logger.error(f"Error saving partner reminder: {e}")
@@ -467,327 +941,1015 @@ def get_user_partner_reminders(user_id: int) -> list:
         list: List of partner reminders for the user
     """
     try:
-        data = load_json_data('bot_data.json')
-        partner_reminders = data.get('partner_reminders', {})
-        return partner_reminders.get(str(user_id), [])
+        return bot_data_store.get_reminders('partner_reminders', user_id)
     except Exception as e:
         logger.error(f"Error getting partner reminders: {e}")
         return []
 
-def mark_partner_reminder_sent(user_id: int, reminder_index: int) -> bool:
+def mark_partner_reminder_sent(user_id: int, reminder_id: str) -> bool:
     """
     Mark a partner reminder as sent.
     
     Args:
         user_id (int): Telegram user ID
-        reminder_index (int): Index of the reminder to mark as sent
+        reminder_id (str): ID of the reminder to mark as sent
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'partner_reminders' not in data or str(user_id) not in data['partner_reminders']:
-            return False
-        
-        reminders = data['partner_reminders'][str(user_id)]
-        if 0 <= reminder_index < len(reminders):
-            reminders[reminder_index]['sent'] = True
-            return save_json_data('bot_data.json', data)
+        return bot_data_store.update_reminder('partner_reminders', user_id, reminder_id, {'sent': True})
         
+    except Exception as e:
+        logger.error(f"Error marking partner reminder as sent: {e}")
         return False
+
+def record_reminder_deliveries(deliveries: list, durable: bool = False) -> bool:
+    """
+    Record reminder occurrences in their fire logs with a single store write.
+    
+    One-time and partner reminders that are done with are marked sent in the same write,
+    so a reminder's fire log and its sent flag never disagree.
+    
+    Args:
+        deliveries (list): (kind, user_id, reminder, fire_at, state, done) of each occurrence;
+            a state of None forgets the occurrence
+        durable (bool): Return only once the write is on disk
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        keep_after = int(time.time() - FIRE_LOG_RETENTION)
+        merged = {}
+        for kind, user_id, reminder, fire_at, state, done in deliveries:
+            _, states, changes = merged.setdefault((kind, user_id, reminder.id), (reminder, {}, {}))
+            states[fire_at] = state
+            if done and kind != 'daily_reminders':
+                changes['sent'] = True
+        
+        updates = [(kind, user_id, reminder_id, dict(changes, fire_log=reminder.logged(states, keep_after)))
+                   for (kind, user_id, reminder_id), (reminder, states, changes) in merged.items()]
+        if not bot_data_store.update_reminders(updates):
+            return False
+        return bot_data_store.sync() if durable else True
         
     except Exception as e:
-        logger.error(f"Error marking partner reminder as sent: {e}")
+        logger.error(f"Error recording reminder deliveries: {e}")
         return False
 
-def save_daily_reminder(user_id: int, reminder_text: str, reminder_time: str) -> bool:
+# Delivered one-time and partner reminders older than this many days move to gzip archives
+# in reminder_archive/ (0 keeps them in the store forever)
+REMINDER_RETENTION_DAYS = float(os.getenv("REMINDER_RETENTION_DAYS", "30"))
+REMINDER_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reminder_archive')
+
+def archive_delivered_reminders() -> int:
     """
-    Save a daily reminder for a user.
+    Move delivered reminders past the retention period out of the store.
+    
+    They are appended to reminder_archive/YYYY-MM.jsonl.gz (by due month, UTC) first and
+    only then removed in one store write, so a crash in between can duplicate archive
+    lines but never lose a reminder.
+    
+    Returns:
+        int: Number of reminders archived
+    """
+    if REMINDER_RETENTION_DAYS <= 0:
+        return 0
+    try:
+        cutoff = time.time() - REMINDER_RETENTION_DAYS * 86400
+        archived_at = datetime.datetime.now(pytz.UTC).isoformat()
+        records_by_month = {}
+        expired = []
+        for kind in ('one_time_reminders', 'partner_reminders'):
+            for user_id, reminders in bot_data_store.get_all_reminders(kind).items():
+                for reminder in reminders:
+                    if not reminder.sent or reminder.fire_at is None or reminder.fire_at >= cutoff:
+                        continue
+                    month = datetime.datetime.fromtimestamp(reminder.fire_at, pytz.UTC).strftime("%Y-%m")
+                    records_by_month.setdefault(month, []).append(
+                        {'kind': kind, 'user_id': user_id, 'archived_at': archived_at, 'reminder': reminder.to_dict()})
+                    expired.append((kind, int(user_id), reminder.id))
+        
+        if not expired:
+            return 0
+        append_to_archive(REMINDER_ARCHIVE_DIR, records_by_month)
+        if not bot_data_store.remove_reminders(expired):
+            return 0
+        logger.info(f"Archived {len(expired)} delivered reminders to {os.path.basename(REMINDER_ARCHIVE_DIR)}/")
+        return len(expired)
+    except Exception as e:
+        logger.error(f"Error archiving delivered reminders: {e}")
+        return 0
+
+def save_daily_reminder(user_id: int, reminder_text: str, reminder_time: str, rule: Optional[CronRule] = None) -> bool:
+    """
+    Save a daily (or recurring) reminder for a user.
     
     Args:
         user_id (int): Telegram user ID
         reminder_text (str): The reminder message
-        reminder_time (str): Time in HH:MM format
+        reminder_time (str): Time in HH:MM format, in the user's local time
+        rule (Optional[CronRule]): Recurrence rule to fire on instead of every day
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'daily_reminders' not in data:
-            data['daily_reminders'] = {}
-        
-        if str(user_id) not in data['daily_reminders']:
-            data['daily_reminders'][str(user_id)] = []
-        
         # Add the new reminder
-        reminder = {
-            'text': reminder_text,
-            'time': reminder_time,
-            'active': True,
-            'created_at': datetime.datetime.now().isoformat()
-        }
+        reminder = DailyReminder(reminder_text, reminder_time, timezone=get_user_profile(user_id).timezone,
+                                 rule=rule.to_cron() if rule is not None else None)
         
-        data['daily_reminders'][str(user_id)].append(reminder)
-        return save_json_data('bot_data.json', data)
+        if not bot_data_store.add_reminder('daily_reminders', user_id, reminder):
+            return False
+        notify_scheduler('daily_reminders', user_id, reminder.id)
+        return True
         
     except Exception as e:
         logger.error(f"Error saving daily reminder: {e}")
         return False
 
-def remove_daily_reminder(user_id: int, reminder_index: int) -> bool:
+def remove_daily_reminder(user_id: int, reminder_id: str) -> bool:
     """
     Remove a daily reminder for a user.
     
     Args:
         user_id (int): Telegram user ID
-        reminder_index (int): Index of the reminder to remove
+        reminder_id (str): ID of the reminder to remove
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'daily_reminders' not in data or str(user_id) not in data['daily_reminders']:
+        if not bot_data_store.remove_reminder('daily_reminders', user_id, reminder_id):
             return False
-        
-        reminders = data['daily_reminders'][str(user_id)]
-        if 0 <= reminder_index < len(reminders):
-            reminders.pop(reminder_index)
-            return save_json_data('bot_data.json', data)
-        
-        return False
+        notify_scheduler('daily_reminders', user_id, reminder_id)
+        return True
         
     except Exception as e:
         logger.error(f"Error removing daily reminder: {e}")
         return False
 
-def toggle_daily_reminder(user_id: int, reminder_index: int) -> bool:
+def toggle_daily_reminder(user_id: int, reminder_id: str) -> bool:
     """
-    Toggle a daily reminder active/inactive status.
+    Toggle a daily reminder active/inactive status (blocking, run it through run_blocking).
     
     Args:
         user_id (int): Telegram user ID
-        reminder_index (int): Index of the reminder to toggle
+        reminder_id (str): ID of the reminder to toggle
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if 'daily_reminders' not in data or str(user_id) not in data['daily_reminders']:
-            return False
-        
-        reminders = data['daily_reminders'][str(user_id)]
-        if 0 <= reminder_index < len(reminders):
-            reminders[reminder_index]['active'] = not reminders[reminder_index].get('active', True)
-            return save_json_data('bot_data.json', data)
-        
-        return False
+        # Read and flip inside one transaction so a concurrent update can't interleave
+        with bot_data_store.transaction(('daily_reminders', user_id)):
+            reminder = bot_data_store.get_reminder('daily_reminders', user_id, reminder_id)
+            if reminder is None:
+                return False
+            if not bot_data_store.update_reminder('daily_reminders', user_id, reminder_id, {'active': not reminder.active}):
+                return False
+        
+        notify_scheduler('daily_reminders', user_id, reminder_id)
+        return True
         
     except Exception as e:
         logger.error(f"Error toggling daily reminder: {e}")
         return False
 
-def get_role_based_content(content_type: str, user_role: str) -> list:
+def get_role_based_content(content_type: str, user_role: str, couple_id: Optional[str] = None) -> list:
     """
     Get content based on user role.
     
     Args:
         content_type (str): Type of content (e.g., 'image_paths', 'telebubbles')
         user_role (str): User role ('boyfriend' or 'girlfriend')
+        couple_id (Optional[str]): The user's couple, whose partner submitted the content
         
     Returns:
         list: List of content items for the user's role
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        # Try to get role-specific content first
-        if 'content' in data and user_role in data['content']:
-            role_content = data['content'][user_role].get(content_type, [])
-            if role_content:
-                return role_content
-        
-        # Fall back to general content if role-specific doesn't exist
-        return data.get(content_type, [])
+        # Only a couple's own submissions are private content; unpaired users never see the
+        # legacy single-couple content, which belongs to whoever LEGACY_COUPLE_MEMBERS names
+        role_content = bot_data_store.get_content(user_role, content_type, couple_id) if couple_id else []
+        if role_content:
+            return role_content
+        
+        # Fall back to the built-in content
+        return bot_data_store.get(content_type, [])
     except Exception as e:
         logger.error(f"Error getting role-based content: {e}")
         return []
 
+# How often the scheduler re-reads every reminder (picks up manual edits of the reminders shard)
+SCHEDULER_RESYNC_INTERVAL = 3600.0
+
+# Only one bot process at a time runs the reminder scheduler: it holds a lock on this file, and other
+# processes stand by, trying again every SCHEDULER_LEASE_POLL seconds, so one of them takes over within
+# seconds when the holder exits or dies. Instances that share a store must share the lock file too
+SCHEDULER_LEASE_FILE = os.getenv("SCHEDULER_LEASE_FILE",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scheduler.lock'))
+SCHEDULER_LEASE_POLL = 2.0
+
+# A standby warns when the holder's heartbeat (written at least once a minute) is older than this
+SCHEDULER_LEASE_STALE = 180.0
+
+# A wake-up whose wall-clock and monotonic elapsed times differ by more than this is logged as a clock jump
+SCHEDULER_CLOCK_JUMP = 5.0
+
+# Reminders found overdue (after a restart or a stalled loop) are still delivered if they are at most this
+# many seconds late; older ones are skipped
+REMINDER_MAX_LATENESS = float(os.getenv("REMINDER_MAX_LATENESS", "3600"))
+
+# Occurrences stay in a reminder's fire log this long; older ones can't be delivered anymore anyway
+FIRE_LOG_RETENTION = REMINDER_MAX_LATENESS + 86400
+
+# Due reminders are sent in batches with a short pause in between, so a catch-up after downtime
+# stays under Telegram's rate limits
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "20"))
+REMINDER_BATCH_PAUSE = 1.0
+
+# Reminders of a batch are sent concurrently, at most this many requests in flight at once
+REMINDER_SEND_CONCURRENCY = int(os.getenv("REMINDER_SEND_CONCURRENCY", "10"))
+
+# A failed send is retried with exponential backoff (REMINDER_RETRY_BASE seconds doubling up to
+# REMINDER_RETRY_MAX_DELAY, with jitter) until it goes through, REMINDER_RETRY_LIMIT attempts fail
+# or the reminder gets more than REMINDER_MAX_LATENESS late
+REMINDER_RETRY_LIMIT = int(os.getenv("REMINDER_RETRY_LIMIT", "8"))
+REMINDER_RETRY_BASE = 5.0
+REMINDER_RETRY_MAX_DELAY = 600.0
+
+def reminder_retry_delay(attempts: int, error: Optional[Exception] = None) -> float:
+    """
+    Get how long to wait before retrying a failed reminder send.
+    
+    Args:
+        attempts (int): Failed attempts so far (1 after the first failure)
+        error (Optional[Exception]): The error; a RetryAfter sets the minimum wait
+        
+    Returns:
+        float: Delay in seconds
+    """
+    backoff = min(REMINDER_RETRY_MAX_DELAY, REMINDER_RETRY_BASE * 2 ** (attempts - 1))
+    # Jitter spreads out retries of reminders that failed together
+    delay = backoff * random.uniform(0.5, 1.0)
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        if isinstance(retry_after, datetime.timedelta):
+            retry_after = retry_after.total_seconds()
+        delay = max(delay, retry_after + random.uniform(0, REMINDER_RETRY_BASE))
+    return delay
+
+def load_scheduler_watermark() -> Optional[datetime.datetime]:
+    """
+    Get the time up to which the scheduler has delivered every due reminder.
+    
+    Returns:
+        Optional[datetime.datetime]: Persisted watermark or None if the scheduler never ran
+    """
+    try:
+        watermark = bot_data_store.get('scheduler_state', {}).get('watermark')
+        return datetime.datetime.fromisoformat(watermark) if watermark else None
+    except Exception as e:
+        logger.error(f"Error loading scheduler watermark: {e}")
+        return None
+
+def load_reminder_retries() -> list:
+    """
+    Get the failed reminder sends waiting for another attempt.
+    
+    Returns:
+        list: Retry records (kind, user_id, id, fire_at, attempts, next_try)
+    """
+    try:
+        return list(bot_data_store.get('scheduler_state', {}).get('retries', []))
+    except Exception as e:
+        logger.error(f"Error loading reminder retries: {e}")
+        return []
+
+def load_all_reminders() -> dict:
+    """
+    Snapshot every reminder section for the scheduler (blocking, run it through run_blocking).
+    
+    Returns:
+        dict: Reminder section name -> {user ID string: [reminders]}
+    """
+    return {kind: bot_data_store.get_all_reminders(kind) for kind in REMINDER_TYPES}
+
+def load_reminders_by_id(keys) -> dict:
+    """
+    Look up several reminders in one go (blocking, run it through run_blocking).
+    
+    Args:
+        keys: (kind, user ID string, reminder ID) of each reminder
+        
+    Returns:
+        dict: Each key mapped to its reminder, or None if it no longer exists
+    """
+    return {key: bot_data_store.get_reminder(key[0], int(key[1]), key[2]) for key in keys}
+
+def save_scheduler_watermark(watermark: datetime.datetime, retries: Optional[list] = None) -> bool:
+    """
+    Persist the time up to which the scheduler has delivered every due reminder.
+    
+    Args:
+        watermark (datetime.datetime): Everything due at or before this time was handled (or is in retries)
+        retries (Optional[list]): Pending retry records to save in the same write (None leaves them unchanged)
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        state = dict(bot_data_store.get('scheduler_state', {}))
+        state['watermark'] = watermark.isoformat()
+        if retries is not None:
+            state['retries'] = retries
+        return bot_data_store.set('scheduler_state', state)
+    except Exception as e:
+        logger.error(f"Error saving scheduler watermark: {e}")
+        return False
+
+def describe_daily_schedule(reminder: DailyReminder) -> str:
+    """
+    Describe when a daily or recurring reminder fires.
+    
+    Args:
+        reminder (DailyReminder): The reminder
+        
+    Returns:
+        str: e.g. '8:00 AM', 'weekdays at 08:00' or 'invalid time'
+    """
+    if reminder.rule is not None:
+        return reminder.recurrence.describe() if reminder.recurrence is not None else "invalid schedule"
+    if reminder.hour is None:
+        return "invalid time"
+    return datetime.time(reminder.hour, reminder.minute).strftime("%I:%M %p").lstrip('0')
+
+def late_note(late_minutes: int) -> str:
+    """
+    Get the apology appended to a reminder delivered late.
+    
+    Args:
+        late_minutes (int): How late the reminder is
+        
+    Returns:
+        str: Note to append, empty if the reminder is on time
+    """
+    if late_minutes <= 0:
+        return ""
+    return f"\n\n_(sorry, this one is {late_minutes} min late - i was taking a nap 😴)_"
+
 class DailyReminderScheduler:
     """
-    Class to handle daily reminder scheduling and sending.
+    Deliver daily, one-time and partner reminders from the application's event loop.
+    
+    Upcoming fire times are kept in a min-heap, and the scheduler task sleeps until
+    the earliest one instead of rescanning every reminder each minute. One-time and
+    partner reminders get a heap entry each. Daily reminders are grouped into
+    minute-of-day slots (at most 1440), and the heap holds one entry per occupied
+    slot, so each firing only touches the reminders due in that minute.
+    
+    Adding, toggling or removing a reminder calls reschedule(), which updates its
+    heap entry or slot and wakes the task if the new time comes first.
+    
+    The store is only read from the I/O pool: rebuilds, reschedules and the reminders
+    popped on a tick are each fetched in one run_blocking call. A queue lock keeps
+    these from interleaving while they wait for their read.
+    
+    Recurring reminders (a DailyReminder with a rule) get a heap entry each, and
+    only their next occurrence is ever queued.
+    
+    Fire times are UTC epoch seconds, precomputed from each reminder's own
+    timezone, so the heap compares plain integers and reminders fire at the
+    recipient's local time whatever the server's zone. Daily slots are keyed by
+    (timezone, minute of day).
+    
+    Sleeps end at the earliest fire time or the next wall-clock minute boundary,
+    whichever comes first, measured against a monotonic deadline. Fire times are
+    minute-aligned, so the task is awake on every minute that matters, and a
+    wall-clock jump (NTP step, VM resume) costs at most one minute. stop() sets a
+    dedicated event that ends any sleep or batch pause immediately.
+    
+    After each round of deliveries the scheduler persists a watermark. On startup
+    it queues everything that came due since then (up to REMINDER_MAX_LATENESS
+    ago), so a restart or a stalled loop delays reminders instead of dropping them.
+    
+    Each occurrence goes out at most once, even across restarts: before a batch
+    is sent its occurrences are claimed in the reminders' fire logs with a durable
+    write, and afterwards the outcome and the sent flags are written together.
+    Occurrences the fire log already has are never sent again, including one
+    claimed by a send the bot was killed in the middle of.
+    
+    Only the process holding the scheduler lease (a FileLease on
+    SCHEDULER_LEASE_FILE) delivers anything. In any other process the task stands
+    by until the lease frees up, then starts from the watermark like a restart.
+    
+    A send that fails (timeout, network error, flood control) is not marked sent.
+    It goes into a retry queue, persisted with the watermark, and gets a heap entry
+    of its own at the backoff time, so retries never hold up the tick. A retry keeps
+    the occurrence's original fire time, which drives the late note and the
+    max-lateness cutoff.
     """
     
-    def __init__(self, application):
-        self.application = application
-        self.running = False
-        self.scheduler_thread = None
-        self.loop = None
+    def __init__(self, application):
+        """
+        Create the scheduler.
+        
+        Args:
+            application: Telegram application whose bot sends the reminders
+        """
+        self.application = application
+        self.running = False
+        self.task = None
+        self.loop = None
+        self._heap = []
+        self._entries = {}
+        self._last_fired = {}
+        self._daily_slots = {}
+        self._daily_slot_of = {}
+        self._counter = 0
+        self._wakeup = None
+        self._stopping = None
+        self._delivering_from = None
+        self._send_slots = None
+        self._next_resync = 0.0
+        self._retries = {}
+        self._retries_changed = False
+        self._lease = FileLease(SCHEDULER_LEASE_FILE)
+        self._queue_lock = None
+        self._stale = set()
+        self._refresher = None
+    
+    def start(self):
+        """Start the scheduler task on the running event loop (call from post_init)."""
+        if not self.running:
+            self.running = True
+            self.loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._queue_lock = asyncio.Lock()
+            self._send_slots = asyncio.Semaphore(max(1, REMINDER_SEND_CONCURRENCY))
+            self.task = self.loop.create_task(self._run())
+            logger.info("Daily reminder scheduler started! 📅")
+    
+    async def stop(self):
+        """Stop the scheduler task and wait for it to finish."""
+        if not self.running:
+            return
+        self.running = False
+        self._stopping.set()
+        self._wakeup.set()
+        try:
+            # Sends in flight get a moment to finish; wait_for cancels the task after that
+            await asyncio.wait_for(self.task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        if self._refresher is not None:
+            self._refresher.cancel()
+        if self._lease.held:
+            # A standby has no state of its own to save
+            await run_blocking(save_scheduler_watermark, self._safe_watermark(), list(self._retries.values()))
+            self._lease.release()
+        logger.info("Daily reminder scheduler stopped! 📅")
+    
+    def reschedule(self, kind: str, user_id: int, reminder_id: str):
+        """
+        Refresh one reminder's place in the queue after it was added, changed or removed.
+        Safe to call from any thread.
+        
+        Args:
+            kind (str): Reminder section name
+            user_id (int): Telegram user ID of the recipient
+            reminder_id (str): Reminder ID
+        """
+        if self.running and self.loop is not None:
+            self.loop.call_soon_threadsafe(self._refresh_entry, kind, str(user_id), reminder_id)
+    
+    def _refresh_entry(self, kind: str, user_id: str, reminder_id: str):
+        """Mark a reminder for re-reading; a single refresher task reads the marked ones in the I/O pool."""
+        self._stale.add((kind, user_id, reminder_id))
+        if self._refresher is None or self._refresher.done():
+            self._refresher = self.loop.create_task(self._refresh_stale())
+    
+    async def _refresh_stale(self):
+        """Re-read the marked reminders and replace their heap entries or daily slots."""
+        while self._stale and self.running:
+            async with self._queue_lock:
+                keys, self._stale = self._stale, set()
+                try:
+                    reminders = await run_blocking(load_reminders_by_id, keys)
+                except Exception as e:
+                    logger.error(f"Error re-reading reminders for the scheduler: {e}")
+                    continue
+                for kind, user_id, reminder_id in keys:
+                    if kind == 'daily_reminders':
+                        self._remove_from_slot(reminder_id)
+                    self._cancel(reminder_id)
+                    
+                    reminder = reminders[(kind, user_id, reminder_id)]
+                    if reminder is None:
+                        continue
+                    if kind == 'daily_reminders':
+                        self._add_to_slot(user_id, reminder)
+                    else:
+                        self._push(kind, user_id, reminder)
+    
+    def _current_minute(self) -> int:
+        """Start of the current minute in UTC epoch seconds - reminders due in it still fire."""
+        return int(time.time()) // 60 * 60
+    
+    def _not_before(self, key, floor: Optional[int] = None) -> int:
+        """Earliest time a queue key may fire: floor (default now), but never an occurrence that was already delivered."""
+        not_before = self._current_minute() if floor is None else floor
+        last_fired = self._last_fired.get(key)
+        if last_fired is not None:
+            not_before = max(not_before, last_fired + 60)
+        return not_before
+    
+    def _queue(self, key, kind: str, user_id: Optional[str], fire_at: int):
+        """Add a heap entry and wake the task."""
+        self._counter += 1
+        entry = [fire_at, self._counter, kind, user_id, key, True]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        self._wakeup.set()
+    
+    def _push(self, kind: str, user_id: str, reminder, floor: Optional[int] = None):
+        """Queue the next occurrence of a one-time, partner or recurring reminder if it still has to fire."""
+        fire_at = reminder.next_occurrence(self._not_before(reminder.id, floor))
+        if fire_at is not None:
+            self._queue(reminder.id, kind, user_id, fire_at)
+    
+    def _cancel(self, key):
+        """Drop a pending heap entry (it is skipped when it reaches the top of the heap)."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[-1] = False
+    
+    def _queue_retry(self, record: dict):
+        """Queue the next attempt of a failed send."""
+        key = ('retry', record['kind'], record['id'], record['fire_at'])
+        self._cancel(key)
+        self._queue(key, record['kind'], str(record['user_id']), record['next_try'])
+    
+    def _drop_retry(self, kind: str, reminder_id: str, fire_at: int):
+        """Forget the pending retry of an occurrence, if any."""
+        if self._retries.pop((kind, reminder_id, fire_at), None) is not None:
+            self._cancel(('retry', kind, reminder_id, fire_at))
+            self._retries_changed = True
     
-    def start(self):
-        """Start the daily reminder scheduler."""
-        if not self.running:
-            self.running = True
-            self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
-            self.scheduler_thread.start()
-            logger.info("Daily reminder scheduler started! 📅")
+    def _retry_later(self, kind: str, user_id: int, reminder, fire_at: int, error: Exception) -> bool:
+        """
+        Put a failed send in the retry queue.
+        
+        Returns:
+            bool: True if the scheduler gave up on it (permanent error or too many attempts)
+        """
+        record = self._retries.get((kind, reminder.id, fire_at)) or {
+            'kind': kind, 'user_id': user_id, 'id': reminder.id, 'fire_at': fire_at, 'attempts': 0}
+        attempts = record['attempts'] + 1
+        # Forbidden (bot blocked) and BadRequest (chat gone, bad markup) won't go away by retrying
+        if isinstance(error, (Forbidden, BadRequest)) or attempts >= REMINDER_RETRY_LIMIT:
+            logger.error(f"Giving up on {kind} {reminder.id} for user {user_id} after {attempts} attempt(s): {error}")
+            self._drop_retry(kind, reminder.id, fire_at)
+            return True
+        
+        delay = reminder_retry_delay(attempts, error)
+        record = dict(record, attempts=attempts, next_try=int(time.time() + delay) + 1)
+        self._retries[(kind, reminder.id, fire_at)] = record
+        self._retries_changed = True
+        self._queue_retry(record)
+        logger.warning(f"Error sending {kind} {reminder.id} to user {user_id} (attempt {attempts}), "
+                       f"retrying in {delay:.0f}s: {error}")
+        return False
     
-    def stop(self):
-        """Stop the daily reminder scheduler."""
-        self.running = False
-        if self.scheduler_thread:
-            self.scheduler_thread.join()
-        logger.info("Daily reminder scheduler stopped! 📅")
+    def _add_to_slot(self, user_id: str, reminder, floor: Optional[int] = None):
+        """Put an active daily reminder in its (timezone, minute of day) slot, queueing the slot if it was empty."""
+        if reminder.rule is not None:
+            # Recurring reminders don't fire every day, so each gets its own heap entry
+            self._push('daily_reminders', user_id, reminder, floor)
+            return
+        minute_of_day = reminder.minute_of_day
+        if not reminder.active or minute_of_day is None:
+            return
+        slot = (reminder.timezone, minute_of_day)
+        self._daily_slots.setdefault(slot, {})[reminder.id] = user_id
+        self._daily_slot_of[reminder.id] = slot
+        self._queue_slot(slot, floor)
     
-    def _run_scheduler(self):
-        """Run the scheduler loop."""
-        # Create a new event loop for this thread
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        
-        while self.running:
+    def _queue_slot(self, slot: tuple, floor: Optional[int] = None):
+        """Queue the next occurrence of a daily slot unless it is already queued."""
+        key = ('daily',) + slot
+        if key not in self._entries:
+            timezone, minute_of_day = slot
+            self._queue(key, 'daily_reminders', None,
+                        next_time_of_day(minute_of_day, self._not_before(key, floor), timezone))
+    
+    def _remove_from_slot(self, reminder_id: str):
+        """Take a daily reminder out of its slot, dropping the slot's heap entry once it is empty."""
+        slot = self._daily_slot_of.pop(reminder_id, None)
+        if slot is None:
+            return
+        members = self._daily_slots.get(slot, {})
+        members.pop(reminder_id, None)
+        if not members:
+            self._daily_slots.pop(slot, None)
+            self._cancel(('daily',) + slot)
+    
+    async def _rebuild(self, floor: Optional[int] = None):
+        """
+        Re-read every reminder (in the I/O pool) and rebuild the queue and the daily slots.
+        
+        Args:
+            floor (Optional[int]): Queue occurrences from this UTC epoch second on (default: the current minute)
+        """
+        # Holding the queue lock makes refreshes that arrive during the read wait and apply on top of it
+        async with self._queue_lock:
+            sections = await run_blocking(load_all_reminders)
+            self._fill_queue(sections, floor)
+    
+    def _fill_queue(self, sections: dict, floor: Optional[int] = None):
+        """Replace the queue and the daily slots with the reminders in a load_all_reminders() snapshot."""
+        self._heap = []
+        self._entries = {}
+        self._daily_slots = {}
+        self._daily_slot_of = {}
+        current_minute = self._current_minute()
+        self._last_fired = {key: fired_at for key, fired_at in self._last_fired.items() if fired_at >= current_minute}
+        
+        for user_id, reminders in sections['daily_reminders'].items():
+            for reminder in reminders:
+                self._add_to_slot(user_id, reminder, floor)
+        for kind in ('one_time_reminders', 'partner_reminders'):
+            for user_id, reminders in sections[kind].items():
+                for reminder in reminders:
+                    self._push(kind, user_id, reminder, floor)
+        for record in self._retries.values():
+            self._queue_retry(record)
+        
+        self._next_resync = time.monotonic() + SCHEDULER_RESYNC_INTERVAL
+        logger.info(f"Reminder queue rebuilt: {len(self._daily_slot_of)} daily reminders in "
+                    f"{len(self._daily_slots)} minute slots, "
+                    f"{len(self._entries) - len(self._daily_slots) - len(self._retries)} upcoming one-time and recurring, "
+                    f"{len(self._retries)} retries")
+    
+    def _catch_up_floor(self, watermark: Optional[datetime.datetime]) -> int:
+        """Earliest occurrence to deliver on startup: just after the saved watermark, but no more than the max lateness ago."""
+        if watermark is None:
+            return self._current_minute()
+        floor = max(int(watermark.timestamp()) + 1, int(time.time() - REMINDER_MAX_LATENESS))
+        return min(floor, self._current_minute())
+    
+    def _safe_watermark(self) -> datetime.datetime:
+        """Latest time up to which every queued or in-flight occurrence has been handled."""
+        watermark = int(time.time())
+        if self._heap and self._heap[0][0] <= watermark:
+            watermark = self._heap[0][0] - 1
+        if self._delivering_from is not None:
+            watermark = min(watermark, self._delivering_from - 1)
+        return datetime.datetime.fromtimestamp(watermark, pytz.UTC)
+    
+    def _next_deadline(self) -> float:
+        """Monotonic time to wake up: the earliest fire time, but no later than the next minute boundary or resync."""
+        now = time.time()
+        wake_at = now - now % 60 + 60
+        if self._heap:
+            wake_at = min(wake_at, self._heap[0][0])
+        return min(time.monotonic() + max(0.0, wake_at - now), self._next_resync)
+    
+    async def _pause(self, seconds: float):
+        """Sleep between send batches, returning at once if the scheduler is stopping."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _acquire_lease(self) -> bool:
+        """
+        Wait until this process holds the scheduler lease.
+        
+        Returns:
+            bool: True once the lease is held, False if the scheduler was stopped first
+        """
+        standing_by = False
+        warned = False
+        while not self._stopping.is_set():
+            if self._lease.try_acquire():
+                if standing_by:
+                    logger.info("Took over the reminder scheduler from the previous process")
+                return True
+            
+            holder = self._lease.holder()
+            if not standing_by:
+                pid = f"pid {holder[0]}" if holder else "another process"
+                logger.info(f"Reminder scheduler runs in {pid}; standing by")
+                standing_by = True
+            if holder and holder[1] > SCHEDULER_LEASE_STALE and not warned:
+                logger.warning(f"Reminder scheduler in pid {holder[0]} hasn't sent a heartbeat for "
+                               f"{holder[1]:.0f}s, but still holds {SCHEDULER_LEASE_FILE}")
+                warned = True
+            await self._pause(SCHEDULER_LEASE_POLL)
+        return False
+    
+    async def _run(self):
+        """Sleep until the earliest reminder is due, deliver everything due, repeat."""
+        if not await self._acquire_lease():
+            return
+        floor = self._catch_up_floor(await run_blocking(load_scheduler_watermark))
+        self._retries = {(record['kind'], record['id'], record['fire_at']): record
+                         for record in await run_blocking(load_reminder_retries)}
+        await self._rebuild(floor)
+        if floor < self._current_minute():
+            since = datetime.datetime.fromtimestamp(floor, pytz.UTC).isoformat()
+            logger.info(f"Catching up on reminders due since {since}")
+        while not self._stopping.is_set():
             try:
-                self.loop.run_until_complete(self._check_and_send_reminders())
-                # Check every minute
-                threading.Event().wait(60)
+                self._wakeup.clear()
+                self._lease.heartbeat()
+                await self._send_due_reminders()
+                if self._stopping.is_set():
+                    break
+                
+                deadline = self._next_deadline()
+                slept_from, slept_from_wall = time.monotonic(), time.time()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, deadline - slept_from))
+                except asyncio.TimeoutError:
+                    pass
+                
+                jump = (time.time() - slept_from_wall) - (time.monotonic() - slept_from)
+                if abs(jump) > SCHEDULER_CLOCK_JUMP:
+                    # Overdue occurrences are delivered late on this tick; a backwards jump never re-fires one
+                    logger.warning(f"Wall clock jumped by {jump:+.0f}s while the reminder scheduler slept")
+                
+                if time.monotonic() >= self._next_resync:
+                    await run_blocking(archive_delivered_reminders)
+                    await self._rebuild()
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in reminder scheduler: {e}")
-                threading.Event().wait(60)
-        
-        # Clean up the loop
-        self.loop.close()
+                await asyncio.sleep(1)
     
-    async def _check_and_send_reminders(self):
-        """Check if any reminders need to be sent now."""
+    async def _send_due_reminders(self):
+        """Pop every queued reminder or daily slot whose fire time has passed and deliver them in batches."""
+        now = time.time()
+        async with self._queue_lock:
+            deliveries = await self._collect_due(now)
+        if not deliveries:
+            return
+        
+        # Each batch is sent concurrently; outcomes are collected and written once for the whole tick.
+        # A stop request skips the pauses but still finishes the tick. If the tick fails or is
+        # cancelled, whatever it didn't settle goes into the retry queue, so nothing popped is lost
+        self._delivering_from = min(fire_at for _, _, _, fire_at in deliveries)
+        settled = []
         try:
-            now = datetime.datetime.now()
-            current_time = now.strftime("%H:%M")
-            current_datetime = now
-            
-            data = load_json_data('bot_data.json')
-            
-            # Check daily reminders
-            daily_reminders = data.get('daily_reminders', {})
-            for user_id, reminders in daily_reminders.items():
-                for reminder in reminders:
-                    if (reminder.get('active', True) and 
-                        reminder.get('time') == current_time):
-                        
-                        # Send the daily reminder
-                        await self._send_daily_reminder(int(user_id), reminder['text'])
-            
-            # Check one-time reminders
-            one_time_reminders = data.get('one_time_reminders', {})
-            for user_id, reminders in one_time_reminders.items():
-                for i, reminder in enumerate(reminders):
-                    if not reminder.get('sent', False):
-                        try:
-                            reminder_datetime = datetime.datetime.fromisoformat(reminder['datetime'])
-                            # Check if reminder time has passed (within 1 minute window)
-                            if (current_datetime >= reminder_datetime and 
-                                (current_datetime - reminder_datetime).total_seconds() < 60):
-                                
-                                # Send the one-time reminder
-                                await self._send_one_time_reminder(int(user_id), reminder['text'])
-                                # Mark as sent
-                                mark_reminder_sent(int(user_id), i)
-                        except ValueError:
-                            logger.error(f"Invalid datetime format in reminder: {reminder['datetime']}")
+            for start in range(0, len(deliveries), REMINDER_BATCH_SIZE):
+                if start:
+                    await self._pause(REMINDER_BATCH_PAUSE)
+                batch = self._unlogged(deliveries[start:start + REMINDER_BATCH_SIZE], settled)
+                if not batch:
+                    continue
+                
+                claims = [(kind, user_id, reminder, fire_at, FIRE_SENDING, False)
+                          for kind, user_id, reminder, fire_at in batch]
+                if not await run_blocking(record_reminder_deliveries, claims, True):
+                    error = RuntimeError("the fire log couldn't be written")
+                    for kind, user_id, reminder, fire_at in batch:
+                        if self._retry_later(kind, user_id, reminder, fire_at, error):
+                            settled.append((kind, user_id, reminder, fire_at, FIRE_SKIPPED, True))
+                    continue
+                
+                results = await asyncio.gather(*(self._deliver_limited(kind, user_id, reminder, fire_at, now)
+                                                 for kind, user_id, reminder, fire_at in batch))
+                for (kind, user_id, reminder, fire_at), state in zip(batch, results):
+                    # A failed send gives up its claim, and its retry claims it again
+                    settled.append((kind, user_id, reminder, fire_at, state, state is not None))
             
-            # Check partner reminders
-            partner_reminders = data.get('partner_reminders', {})
-            for user_id, reminders in partner_reminders.items():
-                for i, reminder in enumerate(reminders):
-                    if not reminder.get('sent', False):
-                        try:
-                            reminder_datetime = datetime.datetime.fromisoformat(reminder['datetime'])
-                            # Check if reminder time has passed (within 1 minute window)
-                            if (current_datetime >= reminder_datetime and 
-                                (current_datetime - reminder_datetime).total_seconds() < 60):
-                                
-                                # Send the partner reminder
-                                await self._send_partner_reminder(
-                                    int(user_id), 
-                                    reminder['text'], 
-                                    reminder.get('sender_name', 'your partner')
-                                )
-                                # Mark as sent
-                                mark_partner_reminder_sent(int(user_id), i)
-                        except ValueError:
-                            logger.error(f"Invalid datetime format in partner reminder: {reminder['datetime']}")
-                            
-        except Exception as e:
-            logger.error(f"Error checking reminders: {e}")
+            if settled:
+                await run_blocking(record_reminder_deliveries, settled)
+        finally:
+            self._delivering_from = None
+            self._requeue_unsettled(deliveries, settled)
+        
+        retries = None
+        if self._retries_changed:
+            retries = list(self._retries.values())
+            self._retries_changed = False
+        await run_blocking(save_scheduler_watermark, self._safe_watermark(), retries)
     
-    async def _send_daily_reminder(self, user_id: int, reminder_text: str):
-        """Send a daily reminder to a user."""
+    async def _collect_due(self, now: float) -> list:
+        """
+        Pop every due heap entry and turn it into deliveries (call with the queue lock held).
+        
+        The popped reminders are re-read in one I/O pool call: they may have been removed,
+        disabled or marked sent since they were queued.
+        
+        Returns:
+            list: (kind, user_id, reminder, fire_at) of each occurrence to deliver
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, _, kind, user_id, key, pending = heapq.heappop(self._heap)
+            if pending:
+                self._entries.pop(key, None)
+                due.append((fire_at, kind, user_id, key))
+        if not due:
+            return []
+        
+        lookups = set()
+        for fire_at, kind, user_id, key in due:
+            if isinstance(key, tuple) and key[0] == 'retry':
+                record = self._retries.get(key[1:])
+                if record is not None:
+                    lookups.add((record['kind'], str(record['user_id']), record['id']))
+            elif kind == 'daily_reminders' and isinstance(key, tuple):
+                lookups.update(('daily_reminders', member, reminder_id)
+                               for reminder_id, member in self._daily_slots.get(key[1:], {}).items())
+            else:
+                lookups.add((kind, user_id, key))
         try:
-            user_name = get_user_name(user_id)
-            name_part = f" {user_name}" if user_name else ""
-            
-            message = f"⏰ **daily reminder!** ⏰\n\n💕 hey{name_part}! 💕\n\n📝 {reminder_text}\n\n✨ have a great day! ✨"
-            
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"Daily reminder sent to user {user_id}")
-            
-        except Exception as e:
-            logger.error(f"Error sending daily reminder to user {user_id}: {e}")
+            reminders = await run_blocking(load_reminders_by_id, lookups)
+        except Exception:
+            # Put the popped entries back so the next tick tries them again
+            for fire_at, kind, user_id, key in due:
+                self._queue(key, kind, user_id, fire_at)
+            raise
+        
+        deliveries = []
+        for fire_at, kind, user_id, key in due:
+            try:
+                if isinstance(key, tuple) and key[0] == 'retry':
+                    delivery = self._retry_delivery(key[1:], reminders)
+                    if delivery is not None:
+                        deliveries.append(delivery)
+                    continue
+                
+                self._last_fired[key] = fire_at
+                if kind == 'daily_reminders' and isinstance(key, tuple):
+                    deliveries.extend(self._daily_slot_deliveries(key[1:], fire_at, reminders))
+                    continue
+                
+                reminder = reminders.get((kind, user_id, key))
+                if reminder is None:
+                    continue
+                if kind == 'daily_reminders':
+                    # Recurring reminder: queue its next occurrence right away
+                    self._push(kind, user_id, reminder)
+                    if not reminder.active or reminder.rule is None:
+                        continue
+                elif reminder.sent:
+                    continue
+                # A catch-up can queue an occurrence again that already failed once; its retry entry delivers it
+                if (kind, key, fire_at) not in self._retries:
+                    deliveries.append((kind, int(user_id), reminder, fire_at))
+            except Exception as e:
+                logger.error(f"Error collecting {kind} {key}: {e}")
+        return deliveries
     
-    async def _send_one_time_reminder(self, user_id: int, reminder_text: str):
-        """Send a one-time reminder to a user."""
+    def _requeue_unsettled(self, deliveries: list, settled: list):
+        """Put the deliveries of an interrupted tick that were neither settled nor queued for a retry in the retry queue."""
+        handled = {(kind, reminder.id, fire_at) for kind, _, reminder, fire_at, _, _ in settled}
+        error = RuntimeError("the delivery round was interrupted")
+        for kind, user_id, reminder, fire_at in deliveries:
+            key = (kind, reminder.id, fire_at)
+            if key not in handled and ('retry',) + key not in self._entries:
+                self._retry_later(kind, user_id, reminder, fire_at, error)
+    
+    def _unlogged(self, batch: list, settled: list) -> list:
+        """Filter out the deliveries whose occurrence is already in the reminder's fire log."""
+        unlogged = []
+        for kind, user_id, reminder, fire_at in batch:
+            state = reminder.fire_state(fire_at)
+            if state is None:
+                unlogged.append((kind, user_id, reminder, fire_at))
+                continue
+            self._drop_retry(kind, reminder.id, fire_at)
+            if state == FIRE_SENDING:
+                # Claimed by a send that never reported back: it may well have gone out, so it isn't repeated
+                logger.warning(f"Not resending {kind} {reminder.id} to user {user_id}: its last send was interrupted")
+                settled.append((kind, user_id, reminder, fire_at, FIRE_SENDING, True))
+        return unlogged
+    
+    def _retry_delivery(self, retry_key: tuple, reminders: dict) -> Optional[tuple]:
+        """Get the delivery for a retry whose backoff has passed, or None if the reminder no longer needs it."""
+        record = self._retries.get(retry_key)
+        if record is None:
+            return None
+        kind, user_id = record['kind'], int(record['user_id'])
+        reminder = reminders.get((kind, str(user_id), record['id']))
+        # Removed, disabled or marked sent since the failed attempt
+        if reminder is None or not (reminder.active if kind == 'daily_reminders' else not reminder.sent):
+            self._drop_retry(*retry_key)
+            return None
+        return kind, user_id, reminder, record['fire_at']
+    
+    def _daily_slot_deliveries(self, slot: tuple, fire_at: int, reminders: dict) -> list:
+        """Collect the daily reminders of one (timezone, minute of day) slot and queue the slot's next occurrence."""
+        deliveries = []
+        overdue = fire_at < self._current_minute()
+        for reminder_id, user_id in list(self._daily_slots.get(slot, {}).items()):
+            reminder = reminders.get(('daily_reminders', user_id, reminder_id))
+            if (reminder is None or not reminder.active or reminder.rule is not None
+                    or (reminder.timezone, reminder.minute_of_day) != slot):
+                continue
+            if overdue:
+                # When catching up, skip reminders that didn't exist yet at that time
+                created = parse_due_datetime(reminder.created_at)
+                if created is not None and created.timestamp() > fire_at:
+                    continue
+            if ('daily_reminders', reminder_id, fire_at) in self._retries:
+                continue
+            deliveries.append(('daily_reminders', int(user_id), reminder, fire_at))
+        
+        if slot in self._daily_slots:
+            self._queue_slot(slot)
+        return deliveries
+    
+    async def _deliver_limited(self, kind: str, user_id: int, reminder, fire_at: int, now: float) -> Optional[str]:
+        """Deliver one reminder once a send slot is free (see REMINDER_SEND_CONCURRENCY)."""
+        async with self._send_slots:
+            return await self._deliver(kind, user_id, reminder, fire_at, now)
+    
+    async def _deliver(self, kind: str, user_id: int, reminder, fire_at: int, now: float) -> Optional[str]:
+        """
+        Send one reminder, with a note if it is late. A failed send goes into the retry queue.
+        
+        Returns:
+            Optional[str]: FIRE_SENT, FIRE_SKIPPED (too late or given up on), or None if it failed and
+            will be retried
+        """
         try:
-            user_name = get_user_name(user_id)
-            name_part = f" {user_name}" if user_name else ""
-            
-            message = f"🔔 **reminder time!** 🔔\n\n💕 hey{name_part}! 💕\n\n📝 {reminder_text}\n\n✨ hope this helps! ✨"
-            
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"One-time reminder sent to user {user_id}")
+            lateness = now - fire_at
+            if lateness > REMINDER_MAX_LATENESS:
+                logger.warning(f"Skipping {kind} {reminder.id} for user {user_id}: {lateness / 60:.0f} min late")
+                self._drop_retry(kind, reminder.id, fire_at)
+                return FIRE_SKIPPED
+            late_minutes = int(lateness // 60)
             
+            if kind == 'daily_reminders':
+                await self._send_daily_reminder(user_id, reminder.text, late_minutes)
+            elif kind == 'one_time_reminders':
+                await self._send_one_time_reminder(user_id, reminder.text, late_minutes)
+            else:
+                await self._send_partner_reminder(user_id, reminder.text, reminder.sender_name, late_minutes)
+            self._drop_retry(kind, reminder.id, fire_at)
+            return FIRE_SENT
         except Exception as e:
-            logger.error(f"Error sending one-time reminder to user {user_id}: {e}")
+            return FIRE_SKIPPED if self._retry_later(kind, user_id, reminder, fire_at, e) else None
+    
+    async def _send_daily_reminder(self, user_id: int, reminder_text: str, late_minutes: int = 0):
+        """Send a daily reminder to a user."""
+        user_name = await run_blocking(get_user_name, user_id)
+        name_part = f" {user_name}" if user_name else ""
+        
+        message = f"⏰ **daily reminder!** ⏰\n\n💕 hey{name_part}! 💕\n\n📝 {reminder_text}\n\n✨ have a great day! ✨{late_note(late_minutes)}"
+        
+        await self.application.bot.send_message(
+            chat_id=user_id,
+            text=message,
+            parse_mode='Markdown'
+        )
+        logger.info(f"Daily reminder sent to user {user_id}")
+    
+    async def _send_one_time_reminder(self, user_id: int, reminder_text: str, late_minutes: int = 0):
+        """Send a one-time reminder to a user."""
+        user_name = await run_blocking(get_user_name, user_id)
+        name_part = f" {user_name}" if user_name else ""
+        
+        message = f"🔔 **reminder time!** 🔔\n\n💕 hey{name_part}! 💕\n\n📝 {reminder_text}\n\n✨ hope this helps! ✨{late_note(late_minutes)}"
+        
+        await self.application.bot.send_message(
+            chat_id=user_id,
+            text=message,
+            parse_mode='Markdown'
+        )
+        logger.info(f"One-time reminder sent to user {user_id}")
     
-    async def _send_partner_reminder(self, user_id: int, reminder_text: str, sender_name: str):
+    async def _send_partner_reminder(self, user_id: int, reminder_text: str, sender_name: str, late_minutes: int = 0):
         """Send a partner reminder to a user."""
-        try:
-            user_name = get_user_name(user_id)
-            name_part = f" {user_name}" if user_name else ""
-            
-            # Get current times for both locations
-            times = get_current_times()
-            time_info = f"\n\n🕐 **current times** 🕐\n🇨🇿 **prague:** {times['prague']['full']}\n🇺🇸 **new orleans:** {times['new_orleans']['full']}"
-            
-            message = f"💌 **reminder from {sender_name}!** 💌\n\n💕 hey{name_part}! 💕\n\n📝 {sender_name} wanted to remind you: {reminder_text}\n\n✨ they're thinking of you! ✨{time_info}"
-            
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            logger.info(f"Partner reminder sent to user {user_id} from {sender_name}")
-            
-        except Exception as e:
-            logger.error(f"Error sending partner reminder to user {user_id}: {e}")
+        user_name = await run_blocking(get_user_name, user_id)
+        name_part = f" {user_name}" if user_name else ""
+        
+        # Get current times for both locations
+        times = get_current_times()
+        time_info = f"\n\n🕐 **current times** 🕐\n🇨🇿 **prague:** {times['prague']['full']}\n🇺🇸 **new orleans:** {times['new_orleans']['full']}"
+        
+        message = f"💌 **reminder from {sender_name}!** 💌\n\n💕 hey{name_part}! 💕\n\n📝 {sender_name} wanted to remind you: {reminder_text}\n\n✨ they're thinking of you! ✨{time_info}{late_note(late_minutes)}"
+        
+        await self.application.bot.send_message(
+            chat_id=user_id,
+            text=message,
+            parse_mode='Markdown'
+        )
+        logger.info(f"Partner reminder sent to user {user_id} from {sender_name}")
 
 # Global scheduler instance
 reminder_scheduler = None
 
-def save_content_for_partner(content_type: str, content_data: any, submitter_role: str) -> bool:
+def save_content_for_partner(content_type: str, content_data: any, submitter_role: str, couple_id: str) -> bool:
     """
     Save content submitted by one partner for the other.
     
@@ -795,36 +1957,22 @@ def save_content_for_partner(content_type: str, content_data: any, submitter_rol
         content_type (str): Type of content being saved
         content_data (any): The content to save
         submitter_role (str): Role of the person submitting ('boyfriend' or 'girlfriend')
+        couple_id (str): Couple of the submitting partner
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        # Initialize content structure if it doesn't exist
-        if 'content' not in data:
-            data['content'] = {
-                'boyfriend': {},
-                'girlfriend': {}
-            }
-        
         # Determine partner's role
         partner_role = 'girlfriend' if submitter_role == 'boyfriend' else 'boyfriend'
         
-        # Initialize content type array if it doesn't exist
-        if content_type not in data['content'][partner_role]:
-            data['content'][partner_role][content_type] = []
-        
         # Add the new content
-        data['content'][partner_role][content_type].append(content_data)
-        
-        return save_json_data('bot_data.json', data)
+        return bot_data_store.add_content(partner_role, content_type, content_data, couple_id)
     except Exception as e:
         logger.error(f"Error saving content for partner: {e}")
         return False
 
-def delete_content_for_user(content_type: str, content_path: str, user_role: str) -> bool:
+def delete_content_for_user(content_type: str, content_path: str, user_role: str, couple_id: Optional[str] = None) -> bool:
     """
     Delete specific content for a user and remove the associated file.
     
@@ -832,26 +1980,18 @@ def delete_content_for_user(content_type: str, content_path: str, user_role: str
         content_type (str): Type of content being deleted ('image_paths' or 'video_messages')
         content_path (str): Path of the content to delete
         user_role (str): Role of the user ('boyfriend' or 'girlfriend')
+        couple_id (Optional[str]): Couple the content belongs to
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        # Check if content structure exists
-        if 'content' not in data or user_role not in data['content']:
-            return False
-        
-        # Check if content type exists for user
-        if content_type not in data['content'][user_role]:
+        # Content without a couple is the legacy partition, which no user may delete from
+        if not couple_id:
             return False
         
-        # Remove from JSON data
-        content_list = data['content'][user_role][content_type]
-        if content_path in content_list:
-            content_list.remove(content_path)
-            
+        # Remove from stored content
+        if bot_data_store.remove_content(user_role, content_type, content_path, couple_id):
             # Try to delete the actual file
             try:
                 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -861,10 +2001,9 @@ def delete_content_for_user(content_type: str, content_path: str, user_role: str
                     logger.info(f"Deleted file: {full_path}")
             except Exception as file_error:
                 logger.warning(f"Could not delete file {content_path}: {file_error}")
-                # Continue anyway - JSON update is more important
+                # Continue anyway - data update is more important
             
-            # Save updated JSON
-            return save_json_data('bot_data.json', data)
+            return True
         
         return False
         
@@ -872,33 +2011,47 @@ def delete_content_for_user(content_type: str, content_path: str, user_role: str
         logger.error(f"Error deleting content: {e}")
         return False
 
-def get_content_index_by_path(content_type: str, content_path: str, user_role: str) -> int:
+def find_content_path(content_type: str, filename: str, user_role: str, couple_id: Optional[str] = None) -> Optional[str]:
     """
-    Get the index of content by its path for deletion purposes.
+    Find the stored path of a user's content by its filename (callback data only carries the filename).
     
     Args:
         content_type (str): Type of content ('image_paths' or 'video_messages')
-        content_path (str): Path of the content
+        filename (str): File name of the content
         user_role (str): Role of the user ('boyfriend' or 'girlfriend')
+        couple_id (Optional[str]): The user's couple
         
     Returns:
-        int: Index of the content or -1 if not found
+        Optional[str]: Relative path of the content or None if the user has no such file
     """
     try:
-        data = load_json_data('bot_data.json')
-        
-        if ('content' in data and 
-            user_role in data['content'] and 
-            content_type in data['content'][user_role]):
-            
-            content_list = data['content'][user_role][content_type]
-            if content_path in content_list:
-                return content_list.index(content_path)
+        if not couple_id:
+            return None
+        for content_path in bot_data_store.get_content(user_role, content_type, couple_id):
+            if os.path.basename(content_path) == filename:
+                return content_path
         
-        return -1
+        return None
     except Exception as e:
-        logger.error(f"Error getting content index: {e}")
-        return -1
+        logger.error(f"Error finding content path: {e}")
+        return None
+
+def find_user_content_path(user_id: int, content_type: str, filename: str) -> Optional[str]:
+    """
+    Find the stored path of a user's own content by its filename, looking up their role and couple.
+    
+    Args:
+        user_id (int): Telegram user ID
+        content_type (str): Type of content ('image_paths' or 'video_messages')
+        filename (str): File name of the content
+        
+    Returns:
+        Optional[str]: Relative path of the content or None if the user has no such file
+    """
+    user_role = get_user_role(user_id)
+    if not user_role:
+        return None
+    return find_content_path(content_type, filename, user_role, get_user_couple_id(user_id))
 
 async def show_main_menu_from_query(query) -> int:
     """
@@ -913,7 +2066,7 @@ async def show_main_menu_from_query(query) -> int:
         int: MENU state
     """
     user_id = query.from_user.id
-    user_role = get_user_role(user_id)
+    user_role = await run_blocking(get_user_role, user_id)
     
     # Base menu options
     keyboard = [
@@ -1017,9 +2170,9 @@ async def handle_flirt(query) -> int:
         int: MENU to return to main menu after showing flirt message
     """
     try:
-        data = load_json_data('bot_data.json')
+        flirt_messages = await run_blocking(bot_data_store.get, 'flirt_messages', [])
         
-        if 'flirt_messages' not in data or not data['flirt_messages']:
+        if not flirt_messages:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text(
@@ -1029,7 +2182,6 @@ async def handle_flirt(query) -> int:
             )
             return MENU
         
-        flirt_messages = data['flirt_messages']
         random_flirt = random.choice(flirt_messages)
         
         # Create inline keyboard with back to menu option
@@ -1068,7 +2220,7 @@ async def handle_picture(query) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
         
         if not user_role:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1080,7 +2232,8 @@ async def handle_picture(query) -> int:
             return MENU
         
         # Get role-specific images
-        image_paths = get_role_based_content('image_paths', user_role)
+        couple_id = await run_blocking(get_user_couple_id, user_id)
+        image_paths = await run_blocking(get_role_based_content, 'image_paths', user_role, couple_id)
         
         if not image_paths:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1091,16 +2244,8 @@ async def handle_picture(query) -> int:
             )
             return MENU
         
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Find available images
-        available_images = []
-        available_paths = []
-        for img_path in image_paths:
-            full_path = os.path.join(script_dir, img_path)
-            if os.path.exists(full_path):
-                available_images.append(full_path)
-                available_paths.append(img_path)
+        # Find available images (checked in the I/O pool so a slow disk doesn't stall other users)
+        available_images, available_paths = await run_blocking(find_existing_files, image_paths)
         
         if not available_images:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1130,13 +2275,13 @@ async def handle_picture(query) -> int:
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         # Send the photo
-        with open(random_image, 'rb') as photo:
-            await query.message.reply_photo(
-                photo=photo,
-                caption="**here's a little something to brighten your day!** 📸✨\n(submitted by your partner 💕)\n\n_you can delete this photo if you want! 🗑️_",
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+        photo = await run_blocking(read_media_file, random_image)
+        await query.message.reply_photo(
+            photo=photo,
+            caption="**here's a little something to brighten your day!** 📸✨\n(submitted by your partner 💕)\n\n_you can delete this photo if you want! 🗑️_",
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
     
     except Exception as e:
         logger.error(f"Error in handle_picture: {e}")
@@ -1172,7 +2317,7 @@ async def handle_bubble(query) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
         
         if not user_role:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1184,7 +2329,8 @@ async def handle_bubble(query) -> int:
             return MENU
         
         # Get role-specific video messages only
-        video_messages = get_role_based_content('video_messages', user_role)
+        couple_id = await run_blocking(get_user_couple_id, user_id)
+        video_messages = await run_blocking(get_role_based_content, 'video_messages', user_role, couple_id)
         
         if not video_messages:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1195,16 +2341,8 @@ async def handle_bubble(query) -> int:
             )
             return MENU
         
-        # Find available videos
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        available_videos = []
-        available_paths = []
-        
-        for video_path in video_messages:
-            full_path = os.path.join(script_dir, video_path)
-            if os.path.exists(full_path):
-                available_videos.append(full_path)
-                available_paths.append(video_path)
+        # Find available videos (checked in the I/O pool so a slow disk doesn't stall other users)
+        available_videos, available_paths = await run_blocking(find_existing_files, video_messages)
         
         if not available_videos:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1235,13 +2373,13 @@ async def handle_bubble(query) -> int:
         await query.delete_message()
         
         # Send the video
-        with open(random_video_path, 'rb') as video:
-            await query.message.reply_video(
-                video=video,
-                caption="🫧 **here's a video bubble from your partner!** 💕✨\n\n_you can delete this bubble if you want! �️_",
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
+        video = await run_blocking(read_media_file, random_video_path)
+        await query.message.reply_video(
+            video=video,
+            caption="🫧 **here's a video bubble from your partner!** 💕✨\n\n_you can delete this bubble if you want! �️_",
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
     
     except Exception as e:
         logger.error(f"Error in handle_bubble: {e}")
@@ -1276,9 +2414,9 @@ async def handle_motivation(query) -> int:
         int: MENU to return to main menu after showing motivation
     """
     try:
-        data = load_json_data('bot_data.json')
+        pep_talks = await run_blocking(bot_data_store.get, 'pep_talks', [])
         
-        if 'pep_talks' not in data or not data['pep_talks']:
+        if not pep_talks:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text(
@@ -1287,7 +2425,6 @@ async def handle_motivation(query) -> int:
             )
             return MENU
         
-        pep_talks = data['pep_talks']
         random_pep_talk = random.choice(pep_talks)
         
         # Create inline keyboard with back to menu option
@@ -1323,9 +2460,9 @@ async def handle_stats(query) -> int:
         int: MENU to return to main menu after showing stats
     """
     try:
-        data = load_json_data('bot_data.json')
+        stats = await run_blocking(bot_data_store.get, 'exchange_stats')
         
-        if 'exchange_stats' not in data:
+        if stats is None:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text(
@@ -1334,7 +2471,6 @@ async def handle_stats(query) -> int:
             )
             return MENU
         
-        stats = data['exchange_stats']
         today = datetime.datetime.now().date().strftime("%Y-%m-%d")
         
         # Calculate various statistics
@@ -1475,7 +2611,7 @@ async def process_reminder_time(update: Update, context: CallbackContext) -> int
         
         if time_input == "now":
             # Send immediate reminder
-            user_name = get_user_name(user_id)
+            user_name = await run_blocking(get_user_name, user_id)
             name_part = f" {user_name}" if user_name else ""
             await update.message.reply_text(
                 f"🔔 **reminder right now!** 🔔\n\n💕 hey{name_part}! 💕\n\n📝 {reminder_text}\n\n✨ here's your reminder! ✨", 
@@ -1484,11 +2620,11 @@ async def process_reminder_time(update: Update, context: CallbackContext) -> int
             )
         elif time_input == "tomorrow":
             # Schedule for same time tomorrow
-            now = datetime.datetime.now()
+            now = await run_blocking(get_user_now, user_id)
             tomorrow = now + datetime.timedelta(days=1)
             reminder_datetime = tomorrow.replace(second=0, microsecond=0)
             
-            success = save_one_time_reminder(user_id, reminder_text, reminder_datetime.isoformat())
+            success = await run_blocking(save_one_time_reminder, user_id, reminder_text, reminder_datetime.isoformat())
             
             if success:
                 await update.message.reply_text(
@@ -1508,7 +2644,7 @@ async def process_reminder_time(update: Update, context: CallbackContext) -> int
             # Parse time format HH:MM
             try:
                 time_obj = datetime.datetime.strptime(time_input, "%H:%M")
-                now = datetime.datetime.now()
+                now = await run_blocking(get_user_now, user_id)
                 
                 # Schedule for today if time hasn't passed, otherwise tomorrow
                 reminder_datetime = now.replace(
@@ -1522,7 +2658,7 @@ async def process_reminder_time(update: Update, context: CallbackContext) -> int
                     # Time has passed today, schedule for tomorrow
                     reminder_datetime += datetime.timedelta(days=1)
                 
-                success = save_one_time_reminder(user_id, reminder_text, reminder_datetime.isoformat())
+                success = await run_blocking(save_one_time_reminder, user_id, reminder_text, reminder_datetime.isoformat())
                 
                 if success:
                     display_time = reminder_datetime.strftime("%I:%M %p").lstrip('0')
@@ -1596,7 +2732,7 @@ async def handle_daily_reminders(query) -> int:
     """
     try:
         user_id = query.from_user.id
-        reminders = get_user_daily_reminders(user_id)
+        reminders = await run_blocking(get_user_daily_reminders, user_id)
         
         keyboard = [
             [InlineKeyboardButton("➕ add new daily reminder", callback_data="add_daily_reminder")]
@@ -1607,22 +2743,23 @@ async def handle_daily_reminders(query) -> int:
         if reminders:
             message += "**your current daily reminders:**\n\n"
             for i, reminder in enumerate(reminders):
-                status = "✅" if reminder.get('active', True) else "❌"
-                message += f"{i+1}. {status} **{reminder['time']}** - {reminder['text']}\n"
+                status = "✅" if reminder.active else "❌"
+                schedule = reminder.time if reminder.rule is None else describe_daily_schedule(reminder)
+                message += f"{i+1}. {status} **{schedule}** - {reminder.text}\n"
             
             message += "\n**manage your reminders:**\n"
             
             # Add management buttons
             for i, reminder in enumerate(reminders):
-                status_text = "disable" if reminder.get('active', True) else "enable"
+                status_text = "disable" if reminder.active else "enable"
                 keyboard.append([
-                    InlineKeyboardButton(f"🔄 {status_text} #{i+1}", callback_data=f"toggle_reminder_{i}"),
-                    InlineKeyboardButton(f"🗑️ delete #{i+1}", callback_data=f"delete_reminder_{i}")
+                    InlineKeyboardButton(f"🔄 {status_text} #{i+1}", callback_data=f"toggle_reminder_{reminder.id}"),
+                    InlineKeyboardButton(f"🗑️ delete #{i+1}", callback_data=f"delete_reminder_{reminder.id}")
                 ])
             
         else:
             message += "you have no daily reminders set up yet! 😊\n\n"
-            message += "daily reminders will send you a message every day at the time you choose! ⏰\n\n"
+            message += "daily reminders will send you a message every day (or on the days you choose) at the time you choose! ⏰\n\n"
         
         keyboard.append([InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")])
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -1695,6 +2832,11 @@ async def process_daily_reminder_text(update: Update, context: CallbackContext)
             "• **12:00** for 12:00 PM (noon) ☀️\n"
             "• **18:30** for 6:30 PM 🌆\n"
             "• **22:00** for 10:00 PM 🌙\n\n"
+            "or pick the days too:\n"
+            "• **weekdays 08:00** or **weekends 10:00** 📆\n"
+            "• **mon/thu 19:00** 🗓️\n"
+            "• **monthly 1 09:00** for the 1st of every month 📅\n"
+            "• **cron 30 8 * * 1-5** if you speak cron 🤓\n\n"
             "_(type /cancel to go back to menu)_",
             parse_mode='Markdown'
         )
@@ -1720,28 +2862,44 @@ async def process_daily_reminder_time(update: Update, context: CallbackContext)
         reminder_text = context.user_data.get('daily_reminder_text', 'daily reminder')
         user_id = update.effective_user.id
         
-        # Validate time format
+        # A plain HH:MM repeats every day; anything else must be a recurrence rule
+        rule = None
         try:
             datetime.datetime.strptime(time_input, "%H:%M")
         except ValueError:
-            await update.message.reply_text(
-                "❌ **invalid time format!** ⏰\n\n"
-                "please use **HH:MM** format (24-hour):\n"
-                "• **09:00** ✅\n"
-                "• **14:30** ✅\n"
-                "• **9:00** ❌ (use 09:00)\n"
-                "• **2:30 PM** ❌ (use 14:30)\n\n"
-                "try again! 😊"
-            )
-            return WAITING_DAILY_REMINDER_TIME
+            rule = parse_recurrence(time_input)
+            if rule is None:
+                await update.message.reply_text(
+                    "❌ **invalid time format!** ⏰\n\n"
+                    "please use **HH:MM** format (24-hour):\n"
+                    "• **09:00** ✅\n"
+                    "• **14:30** ✅\n"
+                    "• **9:00** ❌ (use 09:00)\n"
+                    "• **2:30 PM** ❌ (use 14:30)\n\n"
+                    "or a schedule like **weekdays 08:00**, **mon/thu 19:00**, **monthly 1 09:00** "
+                    "or **cron 30 8 * * 1-5**\n\n"
+                    "try again! 😊"
+                )
+                return WAITING_DAILY_REMINDER_TIME
+            time_input = f"{rule.hours[0]:02d}:{rule.minutes[0]:02d}"
         
         # Save the daily reminder
-        success = save_daily_reminder(user_id, reminder_text, time_input)
+        success = await run_blocking(save_daily_reminder, user_id, reminder_text, time_input, rule)
         
         keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        if success:
+        if success and rule is not None:
+            await update.message.reply_text(
+                f"✅ **recurring reminder created successfully!** 📅\n\n"
+                f"⏰ **when:** {rule.describe()}\n"
+                f"💬 **message:** \"{reminder_text}\"\n\n"
+                f"📱 i'll send you this reminder {rule.describe()}! ✨\n\n"
+                f"💡 you can manage your daily reminders from the main menu!",
+                reply_markup=reply_markup,
+                parse_mode='Markdown'
+            )
+        elif success:
             # Convert to 12-hour format for display
             time_obj = datetime.datetime.strptime(time_input, "%H:%M")
             display_time = time_obj.strftime("%I:%M %p").lstrip('0')
@@ -1775,20 +2933,20 @@ async def process_daily_reminder_time(update: Update, context: CallbackContext)
         )
         return MENU
 
-async def handle_toggle_reminder(query, reminder_index: int) -> int:
+async def handle_toggle_reminder(query, reminder_id: str) -> int:
     """
     Handle toggling a daily reminder on/off.
     
     Args:
         query: Telegram callback query object
-        reminder_index: Index of the reminder to toggle
+        reminder_id: ID of the reminder to toggle
         
     Returns:
         int: MENU state
     """
     try:
         user_id = query.from_user.id
-        success = toggle_daily_reminder(user_id, reminder_index)
+        success = await run_blocking(toggle_daily_reminder, user_id, reminder_id)
         
         if success:
             await query.answer("✅ reminder status updated!")
@@ -1803,20 +2961,20 @@ async def handle_toggle_reminder(query, reminder_index: int) -> int:
         await query.answer("❌ error occurred")
         return await show_main_menu_from_query(query)
 
-async def handle_delete_reminder(query, reminder_index: int) -> int:
+async def handle_delete_reminder(query, reminder_id: str) -> int:
     """
     Handle deleting a daily reminder.
     
     Args:
         query: Telegram callback query object
-        reminder_index: Index of the reminder to delete
+        reminder_id: ID of the reminder to delete
         
     Returns:
         int: MENU state
     """
     try:
         user_id = query.from_user.id
-        success = remove_daily_reminder(user_id, reminder_index)
+        success = await run_blocking(remove_daily_reminder, user_id, reminder_id)
         
         if success:
             await query.answer("🗑️ reminder deleted!")
@@ -1844,8 +3002,8 @@ async def handle_partner_reminder(query) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
-        partner_id = get_partner_user_id(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
+        partner_id = await run_blocking(get_partner_user_id, user_id)
         
         if not user_role:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1860,15 +3018,15 @@ async def handle_partner_reminder(query) -> int:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             await query.edit_message_text(
-                text="⚠️ couldn't find your partner! make sure they've set their role too! 💕\n\n"
-                     "both of you need to use the bot and set your roles (boyfriend/girlfriend) to use partner reminders! ✨",
+                text="⚠️ couldn't find your partner! 💕\n\n"
+                     "send /invite to get a code for your partner, or /join CODE if they already sent you one! ✨",
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
             return MENU
         
         partner_role = "girlfriend" if user_role == "boyfriend" else "boyfriend"
-        partner_name = get_user_name(partner_id) or f"your {partner_role}"
+        partner_name = await run_blocking(get_user_name, partner_id) or f"your {partner_role}"
         
         await query.edit_message_text(
             text=f"💌 **set a reminder for {partner_name}!** 💌\n\n"
@@ -1907,7 +3065,7 @@ async def process_partner_reminder_text(update: Update, context: CallbackContext
     try:
         user_id = update.effective_user.id
         reminder_text = update.message.text.strip()
-        partner_id = get_partner_user_id(user_id)
+        partner_id = await run_blocking(get_partner_user_id, user_id)
         
         if not partner_id:
             await update.message.reply_text("⚠️ **couldn't find your partner!** please try again later. 💕", parse_mode='Markdown')
@@ -1916,12 +3074,12 @@ async def process_partner_reminder_text(update: Update, context: CallbackContext
         context.user_data['partner_reminder_text'] = reminder_text
         context.user_data['partner_id'] = partner_id
         
-        partner_name = get_user_name(partner_id) or "your partner"
+        partner_name = await run_blocking(get_user_name, partner_id) or "your partner"
         
         await update.message.reply_text(
             f"📝 **reminder for {partner_name}:** \"{reminder_text}\" ✨\n\n"
             f"⏰ **when should i remind {partner_name}?** send me the time in format:\n"
-            f"• **HH:MM** (e.g., 14:30 for 2:30 PM) 🕐\n"
+            f"• **HH:MM** in {partner_name}'s time (e.g., 14:30 for 2:30 PM) 🕐\n"
             f"• or just say **now** for immediate reminder ⚡\n"
             f"• or **tomorrow** for same time tomorrow 📅\n\n"
             f"_(type /cancel to go back to menu)_ 💕",
@@ -1955,8 +3113,8 @@ async def process_partner_reminder_time(update: Update, context: CallbackContext
             await update.message.reply_text("⚠️ **error:** couldn't find partner information. please try again! 💕", parse_mode='Markdown')
             return MENU
         
-        partner_name = get_user_name(partner_id) or "your partner"
-        user_name = get_user_name(user_id) or "your partner"
+        partner_name = await run_blocking(get_user_name, partner_id) or "your partner"
+        user_name = await run_blocking(get_user_name, user_id) or "your partner"
         
         # Create back to menu keyboard
         keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
@@ -1989,17 +3147,17 @@ async def process_partner_reminder_time(update: Update, context: CallbackContext
                 
         elif time_input == "tomorrow":
             # Schedule for same time tomorrow
-            now = datetime.datetime.now()
+            now = await run_blocking(get_user_now, partner_id)
             tomorrow = now + datetime.timedelta(days=1)
             reminder_datetime = tomorrow.replace(second=0, microsecond=0)
             
-            success = save_partner_reminder(user_id, partner_id, reminder_text, reminder_datetime.isoformat())
+            success = await run_blocking(save_partner_reminder, user_id, partner_id, reminder_text, reminder_datetime.isoformat())
             
             if success:
                 await update.message.reply_text(
                     f"✅ **partner reminder scheduled for tomorrow!** 📅\n\n"
                     f"👤 **for:** {partner_name}\n"
-                    f"⏰ **time:** {reminder_datetime.strftime('%B %d, %Y at %I:%M %p')}\n"
+                    f"⏰ **time:** {reminder_datetime.strftime('%B %d, %Y at %I:%M %p')} (their time)\n"
                     f"📝 **message:** \"{reminder_text}\"\n\n"
                     f"i'll remind {partner_name} tomorrow! 💕",
                     reply_markup=reply_markup,
@@ -2015,7 +3173,7 @@ async def process_partner_reminder_time(update: Update, context: CallbackContext
             # Parse time format HH:MM
             try:
                 time_obj = datetime.datetime.strptime(time_input, "%H:%M")
-                now = datetime.datetime.now()
+                now = await run_blocking(get_user_now, partner_id)
                 
                 # Schedule for today if time hasn't passed, otherwise tomorrow
                 reminder_datetime = now.replace(
@@ -2029,7 +3187,7 @@ async def process_partner_reminder_time(update: Update, context: CallbackContext
                     # Time has passed today, schedule for tomorrow
                     reminder_datetime += datetime.timedelta(days=1)
                 
-                success = save_partner_reminder(user_id, partner_id, reminder_text, reminder_datetime.isoformat())
+                success = await run_blocking(save_partner_reminder, user_id, partner_id, reminder_text, reminder_datetime.isoformat())
                 
                 if success:
                     display_time = reminder_datetime.strftime("%I:%M %p").lstrip('0')
@@ -2038,7 +3196,7 @@ async def process_partner_reminder_time(update: Update, context: CallbackContext
                     await update.message.reply_text(
                         f"✅ **partner reminder scheduled!** 💌\n\n"
                         f"👤 **for:** {partner_name}\n"
-                        f"⏰ **time:** {day_text} at {display_time}\n"
+                        f"⏰ **time:** {day_text} at {display_time} (their time)\n"
                         f"📝 **message:** \"{reminder_text}\"\n\n"
                         f"i'll remind {partner_name} {day_text}! 💕",
                         reply_markup=reply_markup,
@@ -2196,17 +3354,24 @@ async def confirm_role_and_name(query, role: str, name: str) -> int:
     """
     try:
         user_id = query.from_user.id
-        role_success = set_user_role(user_id, role)
-        name_success = set_user_name(user_id, name)
         
-        if role_success and name_success:
+        if await run_blocking(set_user_role_and_name, user_id, role, name):
             emoji = "💙" if role == "boyfriend" else "💖"
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            # Both partners holding the same role means neither sees what the other submits
+            partner_id = await run_blocking(get_partner_user_id, user_id)
+            conflict_note = ""
+            if partner_id and await run_blocking(get_user_role, partner_id) == role:
+                logger.warning(f"Role conflict: user {user_id} and partner {partner_id} are both {role}")
+                conflict_note = f"\n\n⚠️ heads up: your partner is also set as the **{role}**! one of you should switch 💕"
+            
             await query.edit_message_text(
                 text=f"✅ sup **{name}**! {emoji}\n\n"
                      f"okay la ur the **{role}** la\n\n"
-                     f"💕 you can now submit content for your partner and access role-specific features. yippee!",
+                     f"💕 you can now submit content for your partner and access role-specific features. yippee!"
+                     f"{conflict_note}",
                 parse_mode='Markdown',
                 reply_markup=reply_markup
             )
@@ -2233,7 +3398,7 @@ async def handle_submit_photo(query) -> int:
         int: WAITING_PHOTO_UPLOAD state
     """
     try:
-        user_role = get_user_role(query.from_user.id)
+        user_role = await run_blocking(get_user_role, query.from_user.id)
         if not user_role:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2243,6 +3408,15 @@ async def handle_submit_photo(query) -> int:
             )
             return MENU
         
+        if not await run_blocking(get_user_couple_id, query.from_user.id):
+            keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            await query.edit_message_text(
+                text="⚠️ pair up with your partner first! send /invite to get a code for them, or /join CODE 💕",
+                reply_markup=reply_markup
+            )
+            return MENU
+        
         partner_role = "girlfriend" if user_role == "boyfriend" else "boyfriend"
         
         await query.edit_message_text(
@@ -2267,7 +3441,7 @@ async def handle_submit_bubble(query) -> int:
         int: WAITING_VIDEO_UPLOAD state
     """
     try:
-        user_role = get_user_role(query.from_user.id)
+        user_role = await run_blocking(get_user_role, query.from_user.id)
         if not user_role:
             keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2277,6 +3451,15 @@ async def handle_submit_bubble(query) -> int:
             )
             return MENU
         
+        if not await run_blocking(get_user_couple_id, query.from_user.id):
+            keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            await query.edit_message_text(
+                text="⚠️ pair up with your partner first! send /invite to get a code for them, or /join CODE 💕",
+                reply_markup=reply_markup
+            )
+            return MENU
+        
         partner_role = "girlfriend" if user_role == "boyfriend" else "boyfriend"
         
         await query.edit_message_text(
@@ -2302,30 +3485,34 @@ async def process_photo_upload(update: Update, context: CallbackContext) -> int:
         int: MENU to return to main menu
     """
     try:
-        user_role = get_user_role(update.effective_user.id)
+        user_role = await run_blocking(get_user_role, update.effective_user.id)
         if not user_role:
             await update.message.reply_text("⚠️ **error:** role not found. please set your role first! 💕", parse_mode='Markdown')
             return MENU
         
+        couple_id = await run_blocking(get_user_couple_id, update.effective_user.id)
+        if not couple_id:
+            await update.message.reply_text("⚠️ **error:** you're not paired with your partner yet. send /invite first! 💕", parse_mode='Markdown')
+            return MENU
+        
         # Get the photo
         photo = update.message.photo[-1]  # Get the highest resolution
         file = await context.bot.get_file(photo.file_id)
         
-        # Create directories if they don't exist
+        # Work out where to save it (the directory is created by write_media_file)
         script_dir = os.path.dirname(os.path.abspath(__file__))
         partner_role = "girlfriend" if user_role == "boyfriend" else "boyfriend"
-        images_dir = os.path.join(script_dir, "images", partner_role)
-        os.makedirs(images_dir, exist_ok=True)
+        images_dir = os.path.join(script_dir, "images", couple_id, partner_role)
         
         # Save the photo
-        import time
         filename = f"submitted_{int(time.time())}_{photo.file_id[:8]}.jpg"
         file_path = os.path.join(images_dir, filename)
-        await file.download_to_drive(file_path)
+        content = await file.download_as_bytearray()
+        await run_blocking(write_media_file, file_path, bytes(content))
         
         # Add to partner's content
-        relative_path = f"images/{partner_role}/{filename}"
-        success = save_content_for_partner('image_paths', relative_path, user_role)
+        relative_path = f"images/{couple_id}/{partner_role}/{filename}"
+        success = await run_blocking(save_content_for_partner, 'image_paths', relative_path, user_role, couple_id)
         
         keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2366,11 +3553,16 @@ async def process_video_upload(update: Update, context: CallbackContext) -> int:
         int: MENU to return to main menu
     """
     try:
-        user_role = get_user_role(update.effective_user.id)
+        user_role = await run_blocking(get_user_role, update.effective_user.id)
         if not user_role:
             await update.message.reply_text("⚠️ **error:** role not found. please set your role first! 💕", parse_mode='Markdown')
             return MENU
         
+        couple_id = await run_blocking(get_user_couple_id, update.effective_user.id)
+        if not couple_id:
+            await update.message.reply_text("⚠️ **error:** you're not paired with your partner yet. send /invite first! 💕", parse_mode='Markdown')
+            return MENU
+        
         # Get the video
         video = update.message.video
         if not video:
@@ -2383,21 +3575,20 @@ async def process_video_upload(update: Update, context: CallbackContext) -> int:
         
         file = await context.bot.get_file(video.file_id)
         
-        # Create directories if they don't exist
+        # Work out where to save it (the directory is created by write_media_file)
         script_dir = os.path.dirname(os.path.abspath(__file__))
         partner_role = "girlfriend" if user_role == "boyfriend" else "boyfriend"
-        videos_dir = os.path.join(script_dir, "videos", partner_role)
-        os.makedirs(videos_dir, exist_ok=True)
+        videos_dir = os.path.join(script_dir, "videos", couple_id, partner_role)
         
         # Save the video
-        import time
         filename = f"bubble_{int(time.time())}_{video.file_id[:8]}.mp4"
         file_path = os.path.join(videos_dir, filename)
-        await file.download_to_drive(file_path)
+        content = await file.download_as_bytearray()
+        await run_blocking(write_media_file, file_path, bytes(content))
         
         # Add to partner's content
-        relative_path = f"videos/{partner_role}/{filename}"
-        success = save_content_for_partner('video_messages', relative_path, user_role)
+        relative_path = f"videos/{couple_id}/{partner_role}/{filename}"
+        success = await run_blocking(save_content_for_partner, 'video_messages', relative_path, user_role, couple_id)
         
         keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2440,7 +3631,7 @@ async def handle_delete_image(query, image_path: str) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
         
         if not user_role:
             await query.answer("⚠️ role not found!")
@@ -2502,7 +3693,7 @@ async def handle_delete_video(query, video_path: str) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
         
         if not user_role:
             await query.answer("⚠️ role not found!")
@@ -2564,14 +3755,15 @@ async def confirm_delete_image(query, image_path: str) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
         
         if not user_role:
             await query.answer("⚠️ role not found!")
             return await show_main_menu_from_query(query)
         
         # Perform deletion
-        success = delete_content_for_user('image_paths', image_path, user_role)
+        couple_id = await run_blocking(get_user_couple_id, user_id)
+        success = await run_blocking(delete_content_for_user, 'image_paths', image_path, user_role, couple_id)
         
         keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2617,14 +3809,15 @@ async def confirm_delete_video(query, video_path: str) -> int:
     """
     try:
         user_id = query.from_user.id
-        user_role = get_user_role(user_id)
+        user_role = await run_blocking(get_user_role, user_id)
         
         if not user_role:
             await query.answer("⚠️ role not found!")
             return await show_main_menu_from_query(query)
         
         # Perform deletion
-        success = delete_content_for_user('video_messages', video_path, user_role)
+        couple_id = await run_blocking(get_user_couple_id, user_id)
+        success = await run_blocking(delete_content_for_user, 'video_messages', video_path, user_role, couple_id)
         
         keyboard = [[InlineKeyboardButton("🔙 back to menu", callback_data="back_to_menu")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2693,8 +3886,9 @@ async def start(update: Update, context: CallbackContext) -> int:
         int: MENU state to handle button presses
     """
     user_id = update.effective_user.id
-    user_role = get_user_role(user_id)
-    user_name = get_user_name(user_id)
+    profile = await run_blocking(get_user_profile, user_id)
+    user_role = profile.role
+    user_name = profile.name
     
     # Base menu options
     keyboard = [
@@ -2809,11 +4003,11 @@ async def button(update: Update, context: CallbackContext) -> int:
     elif query.data == "add_daily_reminder":
         return await handle_add_daily_reminder(query)
     elif query.data.startswith("toggle_reminder_"):
-        reminder_index = int(query.data.split("_")[-1])
-        return await handle_toggle_reminder(query, reminder_index)
+        reminder_id = query.data[len("toggle_reminder_"):]
+        return await handle_toggle_reminder(query, reminder_id)
     elif query.data.startswith("delete_reminder_"):
-        reminder_index = int(query.data.split("_")[-1])
-        return await handle_delete_reminder(query, reminder_index)
+        reminder_id = query.data[len("delete_reminder_"):]
+        return await handle_delete_reminder(query, reminder_id)
     elif query.data == "set_role" or query.data == "change_role":
         return await handle_set_role(query)
     elif query.data == "role_boyfriend":
@@ -2834,47 +4028,39 @@ async def button(update: Update, context: CallbackContext) -> int:
         return await handle_partner_reminder(query)
     elif query.data.startswith("delete_image_"):
         image_filename = query.data.replace("delete_image_", "")
-        # Reconstruct full path based on user role
-        user_id = query.from_user.id
-        user_role = get_user_role(user_id)
-        if user_role:
-            image_path = f"images/{user_role}/{image_filename}"
+        # Look up the full path among the user's own content
+        image_path = await run_blocking(find_user_content_path, query.from_user.id, 'image_paths', image_filename)
+        if image_path:
             return await handle_delete_image(query, image_path)
         else:
-            await query.answer("⚠️ Role not found!")
+            await query.answer("⚠️ Content not found!")
             return await show_main_menu_from_query(query)
     elif query.data.startswith("delete_video_"):
         video_filename = query.data.replace("delete_video_", "")
-        # Reconstruct full path based on user role
-        user_id = query.from_user.id
-        user_role = get_user_role(user_id)
-        if user_role:
-            video_path = f"videos/{user_role}/{video_filename}"
+        # Look up the full path among the user's own content
+        video_path = await run_blocking(find_user_content_path, query.from_user.id, 'video_messages', video_filename)
+        if video_path:
             return await handle_delete_video(query, video_path)
         else:
-            await query.answer("⚠️ Role not found!")
+            await query.answer("⚠️ Content not found!")
             return await show_main_menu_from_query(query)
     elif query.data.startswith("confirm_delete_image_"):
         image_filename = query.data.replace("confirm_delete_image_", "")
-        # Reconstruct full path based on user role
-        user_id = query.from_user.id
-        user_role = get_user_role(user_id)
-        if user_role:
-            image_path = f"images/{user_role}/{image_filename}"
+        # Look up the full path among the user's own content
+        image_path = await run_blocking(find_user_content_path, query.from_user.id, 'image_paths', image_filename)
+        if image_path:
             return await confirm_delete_image(query, image_path)
         else:
-            await query.answer("⚠️ Role not found!")
+            await query.answer("⚠️ Content not found!")
             return await show_main_menu_from_query(query)
     elif query.data.startswith("confirm_delete_video_"):
         video_filename = query.data.replace("confirm_delete_video_", "")
-        # Reconstruct full path based on user role
-        user_id = query.from_user.id
-        user_role = get_user_role(user_id)
-        if user_role:
-            video_path = f"videos/{user_role}/{video_filename}"
+        # Look up the full path among the user's own content
+        video_path = await run_blocking(find_user_content_path, query.from_user.id, 'video_messages', video_filename)
+        if video_path:
             return await confirm_delete_video(query, video_path)
         else:
-            await query.answer("⚠️ Role not found!")
+            await query.answer("⚠️ Content not found!")
             return await show_main_menu_from_query(query)
     elif query.data == "back_to_menu":
         return await show_main_menu_from_query(query)
@@ -2922,7 +4108,7 @@ async def cancel(update: Update, context: CallbackContext) -> int:
         int: MENU to return to main menu
     """
     user_id = update.effective_user.id
-    user_role = get_user_role(user_id)
+    user_role = await run_blocking(get_user_role, user_id)
     
     # Base menu options
     keyboard = [
@@ -3014,16 +4200,16 @@ async def reminders(update: Update, context: CallbackContext) -> None:
     """
     try:
         user_id = update.effective_user.id
-        user_name = get_user_name(user_id)
+        user_name = await run_blocking(get_user_name, user_id)
         
         # Get all types of reminders
-        daily_reminders = get_user_daily_reminders(user_id)
-        one_time_reminders = get_user_one_time_reminders(user_id)
-        partner_reminders = get_user_partner_reminders(user_id)
+        daily_reminders = await run_blocking(get_user_daily_reminders, user_id)
+        one_time_reminders = await run_blocking(get_user_one_time_reminders, user_id)
+        partner_reminders = await run_blocking(get_user_partner_reminders, user_id)
         
         # Filter out sent reminders
-        pending_one_time = [r for r in one_time_reminders if not r.get('sent', False)]
-        pending_partner = [r for r in partner_reminders if not r.get('sent', False)]
+        pending_one_time = [r for r in one_time_reminders if not r.sent]
+        pending_partner = [r for r in partner_reminders if not r.sent]
         
         if not daily_reminders and not pending_one_time and not pending_partner:
             await update.message.reply_text(
@@ -3039,34 +4225,28 @@ async def reminders(update: Update, context: CallbackContext) -> None:
         if daily_reminders:
             message += "🔄 **daily reminders:**\n"
             for i, reminder in enumerate(daily_reminders):
-                status = "✅" if reminder.get('active', True) else "❌"
-                time_obj = datetime.datetime.strptime(reminder['time'], "%H:%M")
-                display_time = time_obj.strftime("%I:%M %p").lstrip('0')
-                message += f"{i+1}. {status} **{display_time}** - {reminder['text']}\n"
+                status = "✅" if reminder.active else "❌"
+                message += f"{i+1}. {status} **{describe_daily_schedule(reminder)}** - {reminder.text}\n"
             message += "\n"
         
         if pending_one_time:
             message += "⏰ **scheduled reminders:**\n"
             for i, reminder in enumerate(pending_one_time):
-                try:
-                    reminder_dt = datetime.datetime.fromisoformat(reminder['datetime'])
-                    display_dt = reminder_dt.strftime("%B %d, %Y at %I:%M %p")
-                    message += f"{i+1}. **{display_dt}** - {reminder['text']}\n"
-                except ValueError:
-                    message += f"{i+1}. **invalid date** - {reminder['text']}\n"
+                if reminder.due is not None:
+                    display_dt = reminder.due.strftime("%B %d, %Y at %I:%M %p")
+                    message += f"{i+1}. **{display_dt}** - {reminder.text}\n"
+                else:
+                    message += f"{i+1}. **invalid date** - {reminder.text}\n"
             message += "\n"
         
         if pending_partner:
             message += "💌 **partner reminders for you:**\n"
             for i, reminder in enumerate(pending_partner):
-                try:
-                    reminder_dt = datetime.datetime.fromisoformat(reminder['datetime'])
-                    display_dt = reminder_dt.strftime("%B %d, %Y at %I:%M %p")
-                    sender_name = reminder.get('sender_name', 'your partner')
-                    message += f"{i+1}. **{display_dt}** from {sender_name}: {reminder['text']}\n"
-                except ValueError:
-                    sender_name = reminder.get('sender_name', 'your partner')
-                    message += f"{i+1}. **invalid date** from {sender_name}: {reminder['text']}\n"
+                if reminder.due is not None:
+                    display_dt = reminder.due.strftime("%B %d, %Y at %I:%M %p")
+                    message += f"{i+1}. **{display_dt}** from {reminder.sender_name}: {reminder.text}\n"
+                else:
+                    message += f"{i+1}. **invalid date** from {reminder.sender_name}: {reminder.text}\n"
             message += "\n"
         
         message += "💡 use /start to manage your reminders! ✨"
@@ -3120,6 +4300,95 @@ async def timezone(update: Update, context: CallbackContext) -> None:
             parse_mode='Markdown'
         )
 
+# Invite command handler
+async def invite(update: Update, context: CallbackContext) -> None:
+    """
+    Handle /invite command: create a couple for the user and show the code their partner joins with.
+    
+    Args:
+        update: Telegram update object
+        context: Callback context
+    """
+    try:
+        user_id = update.effective_user.id
+        if not await run_blocking(get_user_role, user_id):
+            await update.message.reply_text("⚠️ please set your role first using /start! 💕")
+            return
+        
+        partner_id = await run_blocking(get_partner_user_id, user_id)
+        if partner_id:
+            partner_name = await run_blocking(get_user_name, partner_id) or "your partner"
+            await update.message.reply_text(f"💕 you're already paired with **{partner_name}**! 💕", parse_mode='Markdown')
+            return
+        
+        invite_code = await run_blocking(create_couple_invite, user_id)
+        if not invite_code:
+            await update.message.reply_text("❌ couldn't create an invite right now, try again later! 😅")
+            return
+        
+        await update.message.reply_text(
+            f"💌 **your invite code:** `{invite_code}`\n\n"
+            f"ask your partner to send me **/join {invite_code}** and you'll be paired up! ✨",
+            parse_mode='Markdown'
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in invite command: {e}")
+        await update.message.reply_text("oops! something went wrong creating your invite 😅")
+
+# Join command handler
+async def join(update: Update, context: CallbackContext) -> None:
+    """
+    Handle /join CODE command: pair the user with the partner who created the invite.
+    
+    Args:
+        update: Telegram update object
+        context: Callback context (context.args holds the invite code)
+    """
+    try:
+        user_id = update.effective_user.id
+        user_role = await run_blocking(get_user_role, user_id)
+        if not user_role:
+            await update.message.reply_text("⚠️ please set your role first using /start! 💕")
+            return
+        
+        if not context.args:
+            await update.message.reply_text("⚠️ send me the code your partner got from /invite, like **/join ABC123** 💕", parse_mode='Markdown')
+            return
+        
+        if await run_blocking(get_partner_user_id, user_id):
+            await update.message.reply_text("💕 you're already paired with your partner! 💕")
+            return
+        
+        # The code check and the role comparison (partners need different roles to see each
+        # other's content) happen in the same store transaction as the join
+        outcome, inviter_id = await run_blocking(join_couple_by_invite, user_id, context.args[0])
+        if outcome == JOIN_UNKNOWN_CODE:
+            await update.message.reply_text("❌ that invite code doesn't exist or was already used! 😅")
+            return
+        if outcome == JOIN_OWN_CODE:
+            await update.message.reply_text("😂 that's your own invite code! send it to your partner instead 💕")
+            return
+        if outcome == JOIN_SAME_ROLE:
+            await update.message.reply_text(f"⚠️ you're both set as **{user_role}**! one of you needs to change roles first 💕", parse_mode='Markdown')
+            return
+        if outcome != JOIN_PAIRED:
+            await update.message.reply_text("❌ couldn't join, that invite was already used! 😅")
+            return
+        
+        partner_name = await run_blocking(get_user_name, inviter_id) or "your partner"
+        await update.message.reply_text(f"🎉 **you're now paired with {partner_name}!** 💕\n\nuse /start to see everything you can share ✨", parse_mode='Markdown')
+        
+        try:
+            user_name = await run_blocking(get_user_name, user_id) or f"your {user_role}"
+            await context.bot.send_message(chat_id=inviter_id, text=f"🎉 **{user_name} joined you!** you're now paired up 💕", parse_mode='Markdown')
+        except Exception as notify_error:
+            logger.warning(f"Could not notify user {inviter_id} about the new pairing: {notify_error}")
+        
+    except Exception as e:
+        logger.error(f"Error in join command: {e}")
+        await update.message.reply_text("oops! something went wrong joining your partner 😅")
+
 # Help command handler
 async def help_command(update: Update, context: CallbackContext) -> None:
     """
@@ -3137,6 +4406,8 @@ async def help_command(update: Update, context: CallbackContext) -> None:
             "ℹ️ **/version** - show bot version number and author information\n\n"
             "📋 **/reminders** - view all your active reminders (daily, one-time, and partner reminders)\n\n"
             "🌍 **/timezone** - show current time in prague and new orleans with timezone info\n\n"
+            "💌 **/invite** - get a code to pair up with your partner\n\n"
+            "🤝 **/join CODE** - pair up with your partner using their invite code\n\n"
             "❓ **/help** - show this help message with command descriptions\n\n"
             "🚪 **/stop** or **/exit** - end your bot session and say goodbye\n\n"
             "↩️ **/cancel** - return to the main menu from any conversation state\n\n"
@@ -3170,6 +4441,8 @@ async def help_command(update: Update, context: CallbackContext) -> None:
             "/version - show version info\n"
             "/reminders - view active reminders\n"
             "/timezone - show current times\n"
+            "/invite - get a pairing code\n"
+            "/join CODE - pair with your partner\n"
             "/help - show this help\n"
             "/stop - end bot session\n"
             "/cancel - return to menu\n\n"
@@ -3177,13 +4450,44 @@ async def help_command(update: Update, context: CallbackContext) -> None:
             parse_mode='Markdown'
         )
 
+async def post_init(application) -> None:
+    """
+    Start background tasks that need the running event loop.
+    
+    Args:
+        application: Telegram application being started
+    """
+    global reminder_scheduler
+    loop_monitor.start()
+    
+    # The scheduler runs on the application's own loop so it shares the bot's HTTP client safely
+    reminder_scheduler = DailyReminderScheduler(application)
+    reminder_scheduler.start()
+
+async def post_shutdown(application) -> None:
+    """
+    Stop background tasks and log how long the event loop was blocked.
+    
+    Args:
+        application: Telegram application being shut down
+    """
+    if reminder_scheduler is not None:
+        await reminder_scheduler.stop()
+    await loop_monitor.stop()
+    if io_executor is not None:
+        io_executor.shutdown(wait=True)
+
 # Main function to start the bot
 def main():
     """
     Main function to initialize and start the Telegram bot.
     Sets up conversation handlers and starts polling for updates.
     """
-    global reminder_scheduler
+    # Pair up the users of a single-couple install before handling any updates
+    migrate_legacy_couple()
+    find_role_conflicts()
+    assign_reminder_timezones()
+    archive_delivered_reminders()
     
     application = (
         ApplicationBuilder()
@@ -3191,13 +4495,11 @@ def main():
         .read_timeout(10)
         .write_timeout(10)
         .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
-    # Initialize and start the daily reminder scheduler
-    reminder_scheduler = DailyReminderScheduler(application)
-    reminder_scheduler.start()
-
     # ConversationHandler to handle the state machine
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -3236,6 +4538,10 @@ def main():
     # Add timezone command handler
     application.add_handler(CommandHandler("timezone", timezone))
     
+    # Add couple pairing command handlers
+    application.add_handler(CommandHandler("invite", invite))
+    application.add_handler(CommandHandler("join", join))
+    
     # Add help command handler
     application.add_handler(CommandHandler("help", help_command))
     
@@ -3251,10 +4557,8 @@ def main():
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     finally:
-        # Clean up the scheduler
-        if reminder_scheduler:
-            reminder_scheduler.stop()
-        logger.info("Daily reminder scheduler stopped! 📅")
+        # Write any changes still waiting in the store's debounce window
+        bot_data_store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
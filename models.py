@@ -0,0 +1,583 @@
+import datetime
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+import pytz
+
+from recurrence import CronRule
+
+logger = logging.getLogger(__name__)
+
+
+class Reminder:
+    """
+    Base class for reminder records.
+
+    Records use __slots__ instead of a per-instance dict, so thousands of
+    reminders cost a fraction of the memory of the raw JSON dicts, and their
+    schedule is parsed once when the record is created instead of on every
+    scheduler tick. to_dict() produces exactly the JSON shape stored in
+    bot_data, and unknown keys are carried along in `extra` so nothing is
+    lost on a round trip.
+
+    Every record has a short stable `id`, so buttons and the scheduler can
+    address a reminder without relying on its position in the user's list.
+
+    Times are wall-clock times in the record's `timezone` (the recipient's
+    pytz zone). Records saved before reminders had a zone have none and are
+    read in the server's local time. Fire times are UTC epoch seconds.
+
+    `fire_log` maps recent occurrences (fire times as strings) to what became
+    of them: FIRE_SENDING while a send is in flight, then FIRE_SENT or
+    FIRE_SKIPPED. It lives in the record so it is written together with the
+    sent flag.
+    """
+
+    __slots__ = ('id', 'text', 'created_at', 'timezone', 'fire_log', 'extra')
+
+    # JSON keys handled by the record's own fields, in the order they are written
+    FIELDS = ('id', 'text', 'created_at', 'timezone', 'fire_log')
+
+    def __init__(self, text: str, created_at: Optional[str] = None, extra: Optional[Dict[str, Any]] = None,
+                 reminder_id: Optional[str] = None, timezone: Optional[str] = None,
+                 fire_log: Optional[Dict[str, str]] = None):
+        """
+        Create a reminder record.
+
+        Args:
+            text (str): The reminder message
+            created_at (Optional[str]): ISO timestamp of creation, defaults to now
+            extra (Optional[Dict[str, Any]]): Unknown JSON keys to keep on a round trip
+            reminder_id (Optional[str]): Stable ID, a new one is generated if not given
+            timezone (Optional[str]): pytz zone the reminder's times are in, None for server time
+            fire_log (Optional[Dict[str, str]]): Recent occurrences (epoch seconds as strings) and their state
+        """
+        self.id = reminder_id or new_reminder_id()
+        self.text = text
+        self.created_at = created_at if created_at is not None else datetime.datetime.now().isoformat()
+        self.timezone = timezone
+        self.fire_log = fire_log or {}
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Reminder':
+        """
+        Decode a record from its JSON dict.
+
+        Args:
+            data (dict): Reminder as stored in bot_data
+
+        Returns:
+            Reminder: Decoded record
+        """
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS}
+        return cls(**cls._field_values(data), extra=extra or None)
+
+    @classmethod
+    def _field_values(cls, data: dict) -> dict:
+        """Get the constructor arguments for a record from its JSON dict."""
+        return {'reminder_id': data.get('id'), 'text': data.get('text', ''), 'created_at': data.get('created_at'),
+                'timezone': data.get('timezone'), 'fire_log': data.get('fire_log')}
+
+    def to_dict(self) -> dict:
+        """
+        Encode the record in the JSON shape stored in bot_data.
+
+        Returns:
+            dict: JSON-serializable reminder
+        """
+        data = self._dict_fields()
+        if self.timezone is not None:
+            data['timezone'] = self.timezone
+        if self.fire_log:
+            data['fire_log'] = dict(self.fire_log)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def _dict_fields(self) -> dict:
+        """Get the record's own fields as JSON keys, in storage order."""
+        return {'id': self.id, 'text': self.text, 'created_at': self.created_at}
+
+    def update(self, changes: dict) -> None:
+        """
+        Overwrite fields using JSON keys (e.g. {'sent': True}), re-parsing as needed.
+
+        Args:
+            changes (dict): JSON keys and their new values
+        """
+        data = self.to_dict()
+        data.update(changes)
+        updated = self.from_dict(data)
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                setattr(self, slot, getattr(updated, slot))
+
+    def fire_state(self, fire_at: int) -> Optional[str]:
+        """
+        Look up one occurrence in the fire log.
+
+        Args:
+            fire_at (int): Occurrence in UTC epoch seconds
+
+        Returns:
+            Optional[str]: FIRE_SENDING, FIRE_SENT or FIRE_SKIPPED, None if it never fired
+        """
+        return self.fire_log.get(str(fire_at))
+
+    def logged(self, states: Dict[int, Optional[str]], keep_after: int) -> Dict[str, str]:
+        """
+        Get the fire log with some occurrences recorded, leaving the record unchanged.
+
+        Args:
+            states (Dict[int, Optional[str]]): New state per occurrence, None to forget it
+            keep_after (int): Older occurrences are pruned (UTC epoch seconds)
+
+        Returns:
+            Dict[str, str]: New fire log, to be stored with update({'fire_log': ...})
+        """
+        fire_log = {instant: state for instant, state in self.fire_log.items() if int(instant) > keep_after}
+        for fire_at, state in states.items():
+            if state is None:
+                fire_log.pop(str(fire_at), None)
+            else:
+                fire_log[str(fire_at)] = state
+        return fire_log
+
+    def next_occurrence(self, not_before: int) -> Optional[int]:
+        """
+        Get the next time the reminder should fire.
+
+        Args:
+            not_before (int): Earliest time to consider, in UTC epoch seconds
+
+        Returns:
+            Optional[int]: Next fire time in UTC epoch seconds, or None if it won't fire again
+        """
+        return None
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class DailyReminder(Reminder):
+    """
+    A reminder that repeats every day at a fixed HH:MM time, or on a recurrence rule.
+
+    With a `rule` (a cron expression, see recurrence.py) the reminder fires on
+    the rule's occurrences instead, and `time` holds its first time of day.
+    """
+
+    __slots__ = ('time', 'active', 'hour', 'minute', 'rule', 'recurrence')
+
+    FIELDS = ('id', 'text', 'time', 'active', 'created_at', 'timezone', 'rule', 'fire_log')
+
+    def __init__(self, text: str, time: str, active: bool = True, created_at: Optional[str] = None,
+                 extra: Optional[Dict[str, Any]] = None, reminder_id: Optional[str] = None,
+                 timezone: Optional[str] = None, rule: Optional[str] = None,
+                 fire_log: Optional[Dict[str, str]] = None):
+        """
+        Create a daily reminder record.
+
+        Args:
+            text (str): The reminder message
+            time (str): Time of day in HH:MM format
+            active (bool): Whether the reminder is enabled
+            created_at (Optional[str]): ISO timestamp of creation, defaults to now
+            extra (Optional[Dict[str, Any]]): Unknown JSON keys to keep on a round trip
+            reminder_id (Optional[str]): Stable ID, a new one is generated if not given
+            timezone (Optional[str]): pytz zone of the time of day, None for server time
+            rule (Optional[str]): Cron expression of a recurring schedule, None to repeat every day
+            fire_log (Optional[Dict[str, str]]): Recent occurrences and their state
+        """
+        super().__init__(text, created_at, extra, reminder_id, timezone, fire_log)
+        self.time = time
+        self.active = active
+        self.hour, self.minute = parse_time_of_day(time)
+        self.rule = rule
+        self.recurrence = None if rule is None else parse_rule(rule)
+
+    @classmethod
+    def _field_values(cls, data: dict) -> dict:
+        values = super()._field_values(data)
+        values.update(time=data.get('time', ''), active=data.get('active', True), rule=data.get('rule'))
+        return values
+
+    def _dict_fields(self) -> dict:
+        data = {'id': self.id, 'text': self.text, 'time': self.time, 'active': self.active,
+                'created_at': self.created_at}
+        if self.rule is not None:
+            data['rule'] = self.rule
+        return data
+
+    @property
+    def minute_of_day(self) -> Optional[int]:
+        """Minutes since midnight of the reminder's time (0-1439), or None if the time is invalid."""
+        return None if self.hour is None else self.hour * 60 + self.minute
+
+    def next_occurrence(self, not_before: int) -> Optional[int]:
+        """Get the first local occurrence at or after not_before, or None if inactive or the schedule is invalid."""
+        if not self.active:
+            return None
+        if self.rule is not None:
+            return None if self.recurrence is None else next_rule_occurrence(self.recurrence, not_before, self.timezone)
+        if self.hour is None:
+            return None
+        return next_time_of_day(self.minute_of_day, not_before, self.timezone)
+
+
+class OneTimeReminder(Reminder):
+    """A reminder that fires once at a specific date and time."""
+
+    __slots__ = ('datetime_text', 'due', 'fire_at', 'sent')
+
+    FIELDS = ('id', 'text', 'datetime', 'sent', 'created_at', 'timezone', 'fire_log')
+
+    def __init__(self, text: str, datetime_text: str, sent: bool = False, created_at: Optional[str] = None,
+                 extra: Optional[Dict[str, Any]] = None, reminder_id: Optional[str] = None,
+                 timezone: Optional[str] = None, fire_log: Optional[Dict[str, str]] = None):
+        """
+        Create a one-time reminder record.
+
+        Args:
+            text (str): The reminder message
+            datetime_text (str): When to fire, in ISO format (stored as 'datetime')
+            sent (bool): Whether the reminder was already delivered
+            created_at (Optional[str]): ISO timestamp of creation, defaults to now
+            extra (Optional[Dict[str, Any]]): Unknown JSON keys to keep on a round trip
+            reminder_id (Optional[str]): Stable ID, a new one is generated if not given
+            timezone (Optional[str]): pytz zone of datetime_text, None for server time
+            fire_log (Optional[Dict[str, str]]): Recent occurrences and their state
+        """
+        super().__init__(text, created_at, extra, reminder_id, timezone, fire_log)
+        self.datetime_text = datetime_text
+        self.sent = sent
+        self.due = parse_due_datetime(datetime_text)
+        self.fire_at = None if self.due is None else local_to_timestamp(self.due, timezone)
+
+    @classmethod
+    def _field_values(cls, data: dict) -> dict:
+        values = super()._field_values(data)
+        values.update(datetime_text=data.get('datetime', ''), sent=data.get('sent', False))
+        return values
+
+    def _dict_fields(self) -> dict:
+        return {'id': self.id, 'text': self.text, 'datetime': self.datetime_text, 'sent': self.sent,
+                'created_at': self.created_at}
+
+    def next_occurrence(self, not_before: int) -> Optional[int]:
+        """Get the precomputed UTC fire time, or None if already sent, invalid or due before not_before."""
+        if self.sent or self.fire_at is None or self.fire_at < not_before:
+            return None
+        return self.fire_at
+
+
+class PartnerReminder(OneTimeReminder):
+    """A one-time reminder one partner set for the other."""
+
+    __slots__ = ('sender_id', 'sender_name')
+
+    FIELDS = ('id', 'text', 'datetime', 'sent', 'sender_id', 'sender_name', 'created_at', 'timezone', 'fire_log')
+
+    def __init__(self, text: str, datetime_text: str, sent: bool = False, sender_id: Optional[int] = None,
+                 sender_name: str = 'your partner', created_at: Optional[str] = None,
+                 extra: Optional[Dict[str, Any]] = None, reminder_id: Optional[str] = None,
+                 timezone: Optional[str] = None, fire_log: Optional[Dict[str, str]] = None):
+        """
+        Create a partner reminder record.
+
+        Args:
+            text (str): The reminder message
+            datetime_text (str): When to fire, in ISO format (stored as 'datetime')
+            sent (bool): Whether the reminder was already delivered
+            sender_id (Optional[int]): Telegram user ID of the partner who set it
+            sender_name (str): Display name of the partner who set it
+            created_at (Optional[str]): ISO timestamp of creation, defaults to now
+            extra (Optional[Dict[str, Any]]): Unknown JSON keys to keep on a round trip
+            reminder_id (Optional[str]): Stable ID, a new one is generated if not given
+            timezone (Optional[str]): pytz zone of datetime_text (the recipient's), None for server time
+            fire_log (Optional[Dict[str, str]]): Recent occurrences and their state
+        """
+        super().__init__(text, datetime_text, sent, created_at, extra, reminder_id, timezone, fire_log)
+        self.sender_id = sender_id
+        self.sender_name = sender_name
+
+    @classmethod
+    def _field_values(cls, data: dict) -> dict:
+        values = super()._field_values(data)
+        values.update(sender_id=data.get('sender_id'), sender_name=data.get('sender_name', 'your partner'))
+        return values
+
+    def _dict_fields(self) -> dict:
+        return {'id': self.id, 'text': self.text, 'datetime': self.datetime_text, 'sent': self.sent,
+                'sender_id': self.sender_id, 'sender_name': self.sender_name, 'created_at': self.created_at}
+
+
+# Fire log states of an occurrence
+FIRE_SENDING = 'sending'
+FIRE_SENT = 'sent'
+FIRE_SKIPPED = 'skipped'
+
+# Record class used for each reminder section of bot_data
+REMINDER_TYPES = {
+    'daily_reminders': DailyReminder,
+    'one_time_reminders': OneTimeReminder,
+    'partner_reminders': PartnerReminder,
+}
+
+
+def new_reminder_id() -> str:
+    """
+    Generate a short reminder ID that fits comfortably in callback_data.
+
+    Returns:
+        str: 8 hex characters
+    """
+    return uuid.uuid4().hex[:8]
+
+
+def parse_time_of_day(value: str) -> tuple:
+    """
+    Parse an HH:MM time of day.
+
+    Args:
+        value (str): Time in HH:MM format
+
+    Returns:
+        tuple: (hour, minute), or (None, None) if the value is invalid
+    """
+    try:
+        parsed = datetime.datetime.strptime(value, "%H:%M")
+        return parsed.hour, parsed.minute
+    except (TypeError, ValueError):
+        logger.error(f"Invalid time format in reminder: {value}")
+        return None, None
+
+
+def get_zone(timezone: Optional[str]):
+    """
+    Look up a pytz zone.
+
+    Args:
+        timezone (Optional[str]): Zone name such as 'Europe/Prague'
+
+    Returns:
+        The pytz zone, or None for server time (no name, or an unknown one)
+    """
+    if timezone is None:
+        return None
+    try:
+        return pytz.timezone(timezone)
+    except pytz.UnknownTimeZoneError:
+        logger.error(f"Unknown timezone in reminder: {timezone}")
+        return None
+
+
+def local_to_timestamp(local: datetime.datetime, timezone: Optional[str] = None) -> int:
+    """
+    Convert a wall-clock time to UTC epoch seconds.
+
+    A time skipped by a DST change (02:30 on the spring-forward night) fires
+    at the same offset after the change (03:30), and a time that happens
+    twice (fall-back night) fires at its first occurrence.
+
+    Args:
+        local (datetime.datetime): Wall-clock time; an aware value keeps its own offset
+        timezone (Optional[str]): Zone of a naive value, None for server time
+
+    Returns:
+        int: UTC epoch seconds
+    """
+    zone = get_zone(timezone)
+    if local.tzinfo is not None or zone is None:
+        return int(local.timestamp())
+    try:
+        aware = zone.localize(local, is_dst=None)
+    except pytz.AmbiguousTimeError:
+        aware = zone.localize(local, is_dst=True)
+    except pytz.NonExistentTimeError:
+        aware = zone.localize(local, is_dst=False)
+    return int(aware.timestamp())
+
+
+def timestamp_to_local(timestamp: float, timezone: Optional[str] = None) -> datetime.datetime:
+    """
+    Convert UTC epoch seconds to a naive wall-clock time.
+
+    Args:
+        timestamp (float): UTC epoch seconds
+        timezone (Optional[str]): Zone to express the time in, None for server time
+
+    Returns:
+        datetime.datetime: Naive wall-clock time in that zone
+    """
+    zone = get_zone(timezone)
+    if zone is None:
+        return datetime.datetime.fromtimestamp(timestamp)
+    return datetime.datetime.fromtimestamp(timestamp, zone).replace(tzinfo=None)
+
+
+def next_time_of_day(minute_of_day: int, not_before: int, timezone: Optional[str] = None) -> int:
+    """
+    Get the first time a given local minute of the day comes around.
+
+    Args:
+        minute_of_day (int): Minutes since local midnight (0-1439)
+        not_before (int): Earliest acceptable time, in UTC epoch seconds
+        timezone (Optional[str]): Zone of the minute of day, None for server time
+
+    Returns:
+        int: That minute today, or tomorrow if it already passed, in UTC epoch seconds
+    """
+    hour, minute = divmod(minute_of_day, 60)
+    day = timestamp_to_local(not_before, timezone).date()
+    # Usually today or tomorrow; a DST change can push it one day further
+    for offset in range(3):
+        local = datetime.datetime.combine(day + datetime.timedelta(days=offset), datetime.time(hour, minute))
+        candidate = local_to_timestamp(local, timezone)
+        if candidate >= not_before:
+            return candidate
+    return candidate
+
+
+def next_rule_occurrence(rule: CronRule, not_before: int, timezone: Optional[str] = None) -> Optional[int]:
+    """
+    Get the first occurrence of a recurrence rule in a zone.
+
+    Args:
+        rule (CronRule): Recurrence rule in local wall-clock terms
+        not_before (int): Earliest acceptable time, in UTC epoch seconds
+        timezone (Optional[str]): Zone of the rule's times, None for server time
+
+    Returns:
+        Optional[int]: UTC epoch seconds of the occurrence, None if the rule never fires again
+    """
+    local = timestamp_to_local(not_before, timezone)
+    # A wall-clock time repeated by a DST change maps before not_before; move past it
+    for _ in range(3):
+        candidate = rule.next_after(local)
+        if candidate is None:
+            return None
+        timestamp = local_to_timestamp(candidate, timezone)
+        if timestamp >= not_before:
+            return timestamp
+        local = candidate + datetime.timedelta(minutes=1)
+    return None
+
+
+def parse_rule(value: str) -> Optional[CronRule]:
+    """
+    Parse a stored recurrence rule.
+
+    Args:
+        value (str): Cron expression
+
+    Returns:
+        Optional[CronRule]: Parsed rule, or None if the value is invalid
+    """
+    try:
+        return CronRule.parse(value)
+    except (AttributeError, ValueError):
+        logger.error(f"Invalid recurrence rule in reminder: {value}")
+        return None
+
+
+def parse_due_datetime(value: str) -> Optional[datetime.datetime]:
+    """
+    Parse an ISO reminder datetime.
+
+    Args:
+        value (str): DateTime in ISO format
+
+    Returns:
+        Optional[datetime.datetime]: Parsed datetime, or None if the value is invalid
+    """
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        logger.error(f"Invalid datetime format in reminder: {value}")
+        return None
+
+
+def reminder_from_dict(kind: str, data: dict) -> Reminder:
+    """
+    Decode one reminder of a given section.
+
+    Args:
+        kind (str): 'daily_reminders', 'one_time_reminders' or 'partner_reminders'
+        data (dict): Reminder as stored in bot_data
+
+    Returns:
+        Reminder: Decoded record
+    """
+    return REMINDER_TYPES[kind].from_dict(data)
+
+
+def decode_reminder_section(kind: str, section: Dict[str, List[dict]]) -> Dict[str, List[Reminder]]:
+    """
+    Decode a whole reminder section (user ID -> list of reminders).
+
+    Args:
+        kind (str): Reminder section name
+        section (Dict[str, List[dict]]): Section as stored in bot_data
+
+    Returns:
+        Dict[str, List[Reminder]]: Same mapping with records instead of dicts
+    """
+    record_type = REMINDER_TYPES[kind]
+    return {user_id: [reminder if isinstance(reminder, Reminder) else record_type.from_dict(reminder)
+                      for reminder in reminders]
+            for user_id, reminders in section.items()}
+
+
+def encode_reminder_section(section: Dict[str, List[Reminder]]) -> Dict[str, List[dict]]:
+    """
+    Encode a reminder section back to its JSON shape.
+
+    Args:
+        section (Dict[str, List[Reminder]]): Section holding records
+
+    Returns:
+        Dict[str, List[dict]]: JSON-serializable section
+    """
+    return {user_id: [reminder.to_dict() for reminder in reminders] for user_id, reminders in section.items()}
+
+
+class UserProfile:
+    """
+    A user's resolved identity: role, display name, couple, partner and timezone.
+
+    Profiles are built once from the profiles shard and cached per user, so
+    handlers and the scheduler can ask "who is this?" many times per update
+    without going back to the store.
+    """
+
+    __slots__ = ('user_id', 'role', 'name', 'couple_id', 'partner_id', 'timezone')
+
+    def __init__(self, user_id: int, role: Optional[str] = None, name: Optional[str] = None,
+                 couple_id: Optional[str] = None, partner_id: Optional[int] = None, timezone: str = 'UTC'):
+        """
+        Create a user profile.
+
+        Args:
+            user_id (int): Telegram user ID
+            role (Optional[str]): 'boyfriend', 'girlfriend' or None if not set
+            name (Optional[str]): Display name or None if not set
+            couple_id (Optional[str]): Couple the user belongs to
+            partner_id (Optional[int]): Telegram user ID of the partner, None until paired
+            timezone (str): pytz timezone name used for the user's reminders
+        """
+        self.user_id = user_id
+        self.role = role
+        self.name = name
+        self.couple_id = couple_id
+        self.partner_id = partner_id
+        self.timezone = timezone
+
+    def __repr__(self) -> str:
+        return (f"UserProfile(user_id={self.user_id!r}, role={self.role!r}, name={self.name!r}, "
+                f"couple_id={self.couple_id!r}, partner_id={self.partner_id!r}, timezone={self.timezone!r})")
@@ -0,0 +1,335 @@
+import datetime
+import re
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+# Weekday numbers follow cron: 0 (and 7) is Sunday
+DAY_NAMES = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+MONTH_NAMES = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+
+WEEKDAYS = frozenset(range(1, 6))
+WEEKENDS = frozenset((0, 6))
+
+# Longest gap between two occurrences of any valid rule (Feb 29 can be 8 years apart)
+MAX_SEARCH_DAYS = 366 * 8 + 1
+
+
+class CronRule:
+    """
+    A recurrence rule in cron form: minute, hour, day of month, month and weekday.
+
+    The friendly formats (every weekday, mon/thu, monthly on the 1st) are parsed
+    into the same rule, so one next-occurrence calculator serves them all.
+    Occurrences are never expanded ahead of time: next_after() walks forward from
+    the given wall-clock time, skipping whole months that don't match, and stops
+    at the first match.
+
+    As in cron, a rule that restricts both the day of month and the weekday
+    fires on days matching either.
+    """
+
+    __slots__ = ('minutes', 'hours', 'days', 'months', 'weekdays')
+
+    def __init__(self, minutes: Iterable[int], hours: Iterable[int], days: Iterable[int] = range(1, 32),
+                 months: Iterable[int] = range(1, 13), weekdays: Iterable[int] = range(7)):
+        """
+        Create a rule.
+
+        Args:
+            minutes (Iterable[int]): Minutes of the hour (0-59)
+            hours (Iterable[int]): Hours of the day (0-23)
+            days (Iterable[int]): Days of the month (1-31), all by default
+            months (Iterable[int]): Months (1-12), all by default
+            weekdays (Iterable[int]): Weekdays (0-6, Sunday is 0), all by default
+        """
+        self.minutes: Tuple[int, ...] = tuple(sorted(set(minutes)))
+        self.hours: Tuple[int, ...] = tuple(sorted(set(hours)))
+        self.days: FrozenSet[int] = frozenset(days)
+        self.months: FrozenSet[int] = frozenset(months)
+        self.weekdays: FrozenSet[int] = frozenset(weekdays)
+
+    @classmethod
+    def parse(cls, expression: str) -> 'CronRule':
+        """
+        Parse a five-field cron expression such as '30 8 * * 1-5'.
+
+        Fields support '*', lists (1,15), ranges (1-5), steps (*/15, 8-18/2) and
+        day/month names (mon-fri, jan).
+
+        Args:
+            expression (str): minute hour day-of-month month weekday
+
+        Returns:
+            CronRule: Parsed rule
+
+        Raises:
+            ValueError: If the expression is malformed or can never fire
+        """
+        fields = expression.lower().split()
+        if len(fields) != 5:
+            raise ValueError(f"expected 5 cron fields, got {len(fields)}")
+        weekdays = {day % 7 for day in parse_cron_field(fields[4], 0, 7, DAY_NAMES)}
+        rule = cls(parse_cron_field(fields[0], 0, 59), parse_cron_field(fields[1], 0, 23),
+                   parse_cron_field(fields[2], 1, 31), parse_cron_field(fields[3], 1, 12, MONTH_NAMES, 1),
+                   weekdays)
+        if rule.next_after(datetime.datetime(2000, 1, 1)) is None:
+            raise ValueError(f"'{expression}' never fires")
+        return rule
+
+    @property
+    def any_day(self) -> bool:
+        """Whether the day-of-month field is unrestricted."""
+        return len(self.days) == 31
+
+    @property
+    def any_weekday(self) -> bool:
+        """Whether the weekday field is unrestricted."""
+        return len(self.weekdays) == 7
+
+    def to_cron(self) -> str:
+        """
+        Encode the rule as a canonical cron expression (what reminders store).
+
+        Returns:
+            str: Five-field cron expression, e.g. '0 8 * * 1-5'
+        """
+        return ' '.join((format_cron_field(self.minutes, 0, 59), format_cron_field(self.hours, 0, 23),
+                         format_cron_field(self.days, 1, 31), format_cron_field(self.months, 1, 12),
+                         format_cron_field(self.weekdays, 0, 6)))
+
+    def _day_matches(self, day: datetime.date) -> bool:
+        """Whether the rule fires at some time on a given date (its month already matched)."""
+        weekday = day.isoweekday() % 7
+        if self.any_day:
+            return weekday in self.weekdays
+        if self.any_weekday:
+            return day.day in self.days
+        return day.day in self.days or weekday in self.weekdays
+
+    def _first_time(self, not_before: Optional[datetime.time]) -> Optional[Tuple[int, int]]:
+        """Get the first (hour, minute) of the rule at or after a time of day (None: from midnight)."""
+        for hour in self.hours:
+            if not_before is not None and hour < not_before.hour:
+                continue
+            for minute in self.minutes:
+                if not_before is not None and hour == not_before.hour and minute < not_before.minute:
+                    continue
+                return hour, minute
+        return None
+
+    def next_after(self, start: datetime.datetime) -> Optional[datetime.datetime]:
+        """
+        Get the first occurrence at or after a wall-clock time.
+
+        Args:
+            start (datetime.datetime): Naive wall-clock time; seconds round up to the next minute
+
+        Returns:
+            Optional[datetime.datetime]: Naive wall-clock time of the occurrence, None if there is none
+        """
+        if start.second or start.microsecond:
+            start = start.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        day, not_before = start.date(), start.time()
+        last_day = day + datetime.timedelta(days=MAX_SEARCH_DAYS)
+        while day <= last_day:
+            if day.month not in self.months:
+                day = (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+                not_before = None
+                continue
+            if self._day_matches(day):
+                found = self._first_time(not_before)
+                if found is not None:
+                    return datetime.datetime.combine(day, datetime.time(*found))
+            day += datetime.timedelta(days=1)
+            not_before = None
+        return None
+
+    def describe(self) -> str:
+        """
+        Describe the rule for humans, e.g. 'weekdays at 08:00'.
+
+        Returns:
+            str: Short description, or the cron expression for rules with no simple wording
+        """
+        times = [f"{hour:02d}:{minute:02d}" for hour in self.hours for minute in self.minutes]
+        if len(times) > 3 or (not self.any_day and not self.any_weekday):
+            return f"cron {self.to_cron()}"
+
+        if self.any_day and self.any_weekday:
+            days = "every day"
+        elif self.any_day:
+            if self.weekdays == WEEKDAYS:
+                days = "weekdays"
+            elif self.weekdays == WEEKENDS:
+                days = "weekends"
+            else:
+                # Monday first, the way people list days
+                days = "every " + "/".join(DAY_NAMES[day] for day in sorted(self.weekdays, key=lambda d: (d + 6) % 7))
+        else:
+            days = "monthly on the " + ", ".join(ordinal(day) for day in sorted(self.days))
+
+        if len(self.months) < 12:
+            days += " in " + ", ".join(MONTH_NAMES[month - 1] for month in sorted(self.months))
+        return f"{days} at {' and '.join(times)}"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CronRule) and self.to_cron() == other.to_cron()
+
+    def __repr__(self) -> str:
+        return f"CronRule({self.to_cron()!r})"
+
+
+def parse_cron_field(field: str, low: int, high: int, names: Tuple[str, ...] = (), first_name: int = 0) -> set:
+    """
+    Parse one cron field.
+
+    Args:
+        field (str): Field text, e.g. '*/15', '1-5' or 'mon,thu'
+        low (int): Smallest allowed value
+        high (int): Largest allowed value
+        names (Tuple[str, ...]): Accepted names, in value order
+        first_name (int): Value of the first name (1 for months)
+
+    Returns:
+        set: Values the field matches
+
+    Raises:
+        ValueError: If the field is malformed or out of range
+    """
+    def value(token: str) -> int:
+        if token[:3] in names:
+            return names.index(token[:3]) + first_name
+        return int(token)
+
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"invalid step in '{field}'")
+        if part == '*':
+            first, last = low, high
+        elif '-' in part:
+            first_text, last_text = part.split('-', 1)
+            first, last = value(first_text), value(last_text)
+        else:
+            first = value(part)
+            last = high if step > 1 else first
+        if first > last or first < low or last > high:
+            raise ValueError(f"'{field}' is out of range {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return values
+
+
+def format_cron_field(values: Iterable[int], low: int, high: int) -> str:
+    """
+    Encode field values compactly ('*', ranges and lists).
+
+    Args:
+        values (Iterable[int]): Values the field matches
+        low (int): Smallest allowed value
+        high (int): Largest allowed value
+
+    Returns:
+        str: Field text, e.g. '*', '1-5' or '1,4'
+    """
+    values = sorted(set(values))
+    if values == list(range(low, high + 1)):
+        return '*'
+    parts = []
+    start = previous = values[0]
+    for value in values[1:] + [None]:
+        if value is not None and value == previous + 1:
+            previous = value
+            continue
+        parts.append(str(start) if start == previous else f"{start}-{previous}")
+        if value is not None:
+            start = previous = value
+    return ','.join(parts)
+
+
+def ordinal(number: int) -> str:
+    """
+    Spell a day of the month as an ordinal.
+
+    Args:
+        number (int): Day of the month
+
+    Returns:
+        str: e.g. '1st', '2nd', '11th', '23rd'
+    """
+    if 10 <= number % 100 <= 20:
+        return f"{number}th"
+    return f"{number}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th') }"
+
+
+def parse_day_list(text: str) -> Optional[set]:
+    """
+    Parse a list of day names such as 'mon/thu', 'monday and thursday' or 'tue, fri'.
+
+    Args:
+        text (str): Day names separated by commas, slashes, spaces or 'and'
+
+    Returns:
+        Optional[set]: Weekday numbers (Sunday is 0), or None if a word isn't a day
+    """
+    days = set()
+    for word in re.split(r'[\s,/&]+|\band\b', text):
+        if not word:
+            continue
+        if len(word) < 3 or word[:3] not in DAY_NAMES:
+            return None
+        full_name = ('sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday')[
+            DAY_NAMES.index(word[:3])]
+        if not full_name.startswith(word.rstrip('s')):
+            return None
+        days.add(DAY_NAMES.index(word[:3]))
+    return days or None
+
+
+def parse_recurrence(text: str) -> Optional[CronRule]:
+    """
+    Parse a reminder schedule typed by a user.
+
+    Accepted formats (times are HH:MM, 24-hour):
+        weekdays 08:00, weekends 10:00
+        mon/thu 09:30, every monday and friday at 18:00
+        monthly 1 09:00, monthly on the 15th at 12:00
+        cron 30 8 * * 1-5
+
+    Args:
+        text (str): User input
+
+    Returns:
+        Optional[CronRule]: Parsed rule, or None if the input isn't a schedule
+    """
+    text = ' '.join(text.lower().split())
+    if text.startswith('cron '):
+        try:
+            return CronRule.parse(text[5:])
+        except ValueError:
+            return None
+
+    match = re.fullmatch(r'(.+?)\s+(?:at\s+)?(\d{2}):(\d{2})', text)
+    if not match:
+        return None
+    days_text, hour, minute = match.group(1), int(match.group(2)), int(match.group(3))
+    if hour > 23 or minute > 59:
+        return None
+    days_text = re.sub(r'^every\s+', '', days_text)
+
+    if days_text in ('day', 'daily'):
+        return CronRule([minute], [hour])
+    if days_text in ('weekday', 'weekdays'):
+        return CronRule([minute], [hour], weekdays=WEEKDAYS)
+    if days_text in ('weekend', 'weekends'):
+        return CronRule([minute], [hour], weekdays=WEEKENDS)
+
+    monthly = re.fullmatch(r'(?:monthly|month)(?:\s+on)?(?:\s+the)?\s+(\d{1,2})(?:st|nd|rd|th)?', days_text)
+    if monthly:
+        day = int(monthly.group(1))
+        return CronRule([minute], [hour], days=[day]) if 1 <= day <= 31 else None
+
+    weekdays = parse_day_list(days_text)
+    return CronRule([minute], [hour], weekdays=weekdays) if weekdays else None
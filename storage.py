@@ -0,0 +1,2293 @@
+import asyncio
+import contextlib
+import datetime
+import gzip
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from codec import codec
+from models import (REMINDER_TYPES, Reminder, decode_reminder_section, encode_reminder_section, new_reminder_id,
+                    reminder_from_dict)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# File signature that never matches a real one, so the first load() always reads the file
+NOT_LOADED = (-1, -1)
+
+# Key a journaled snapshot uses to record the last journal entry it contains
+JOURNAL_SEQ_KEY = '_journal_seq'
+
+
+def read_json_file(path: str) -> Any:
+    """
+    Read and parse a JSON file with the shared codec.
+
+    Args:
+        path (str): Path of the file to read
+
+    Returns:
+        Any: Decoded contents
+
+    Raises:
+        OSError: If the file can't be read
+        ValueError: If the file isn't valid JSON
+    """
+    with open(path, 'rb') as file:
+        return codec.loads(file.read())
+
+
+def write_json_atomic(path: str, data: dict, pretty: Optional[bool] = None) -> None:
+    """
+    Write JSON data to a file without ever leaving a truncated file behind.
+
+    The data is written to a temp file in the same directory, fsynced and then
+    atomically renamed over the target, so a crash mid-write leaves either the
+    old or the new file on disk.
+
+    Args:
+        path (str): Absolute path of the file to write
+        data (dict): Data to save
+        pretty (Optional[bool]): Force indented/compact output, None uses the codec's file layout
+
+    Raises:
+        OSError: If the file can't be written
+    """
+    encoded = codec.dumps_file(data) if pretty is None else codec.dumps(data, pretty=pretty)
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(encoded)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Make the rename itself durable (not supported on Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def append_to_archive(archive_dir: str, records_by_month: Dict[str, List[dict]]) -> None:
+    """
+    Append records to monthly gzip JSON Lines archives.
+
+    Each call adds one gzip member per month file (`<archive_dir>/YYYY-MM.jsonl.gz`);
+    concatenated members are still a valid gzip file, so `zcat` reads the whole month.
+
+    Args:
+        archive_dir (str): Directory of the archive files (created if needed)
+        records_by_month (Dict[str, List[dict]]): 'YYYY-MM' -> records to append
+
+    Raises:
+        OSError: If an archive file can't be written
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    for month, records in records_by_month.items():
+        with open(os.path.join(archive_dir, f"{month}.jsonl.gz"), 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                for record in records:
+                    archive.write(codec.dumps(record) + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+class FileLease:
+    """
+    Exclusive lease on a lock file, so only one process at a time does a job
+    such as running the reminder scheduler.
+
+    The lease is an OS file lock (flock on Unix, msvcrt.locking on Windows).
+    The OS drops it the moment the holding process exits or dies, however it
+    dies, so a standby that keeps calling try_acquire() takes over within one
+    polling interval. Nothing has to expire and there is no clock to trust.
+
+    The holder writes its PID and a heartbeat time into the file. They only
+    tell standbys (and humans) who holds the lease and whether it looks hung;
+    the lock alone decides who holds it.
+    """
+
+    # Windows locks a byte range that readers can't touch, so lock one byte well past the holder record
+    WINDOWS_LOCK_OFFSET = 4096
+
+    def __init__(self, path: str):
+        """
+        Create a lease (not acquired yet).
+
+        Args:
+            path (str): Lock file, created if needed; every process competing for the lease must use the same one
+        """
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        """Whether this process holds the lease."""
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Take the lease without waiting.
+
+        Returns:
+            bool: True if this process holds the lease now, False if another one does
+        """
+        if self._fd is not None:
+            return True
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logger.error(f"Error opening lock file {self.path}: {e}")
+            return False
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                os.lseek(fd, self.WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                logger.warning("No file locking on this platform, the lease can't exclude other processes")
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        self.heartbeat()
+        return True
+
+    def heartbeat(self) -> None:
+        """Record that the holder is alive (call regularly while holding the lease)."""
+        if self._fd is None:
+            return
+        try:
+            # Fixed width, so the record is overwritten in place and never needs truncating
+            record = f"{os.getpid():>10} {int(time.time()):>12}\n".encode()
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            os.write(self._fd, record)
+        except OSError as e:
+            logger.error(f"Error writing heartbeat to {self.path}: {e}")
+
+    def holder(self) -> Optional[Tuple[int, float]]:
+        """
+        Read who holds the lease.
+
+        Returns:
+            Optional[Tuple[int, float]]: (PID, seconds since its last heartbeat), None if unknown
+        """
+        try:
+            with open(self.path, 'r') as file:
+                pid, beat = file.readline().split()
+            return int(pid), time.time() - int(beat)
+        except (OSError, ValueError):
+            return None
+
+    def release(self) -> None:
+        """Give up the lease so a standby can take over."""
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(fd, self.WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        except OSError as e:
+            logger.error(f"Error releasing lock file {self.path}: {e}")
+        finally:
+            os.close(fd)
+
+
+class KeyLock:
+    """
+    Reentrant lock that can be held by either a thread or an asyncio task.
+
+    threading.RLock can't be used here because every coroutine on the event loop
+    runs on the same thread - an RLock would let two handlers hold it at once.
+    The owner is therefore the current task when called from a coroutine and the
+    current thread otherwise.
+
+    Threads wait on a condition variable. Tasks wait on a future that release()
+    resolves (thread-safely, from whichever thread releases), so a waiting task
+    never blocks the event loop and wakes up as soon as the lock is free.
+    """
+
+    def __init__(self):
+        self._state = threading.Condition(threading.Lock())
+        self._owner = None
+        self._count = 0
+        self._waiters = []
+
+    @staticmethod
+    def _current_owner() -> Any:
+        """Get the task or thread that is trying to take the lock."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return task if task is not None else threading.get_ident()
+
+    def _take(self, owner: Any) -> bool:
+        """Take the lock if it is free or already ours (call with _state held)."""
+        if self._owner is None:
+            self._owner = owner
+            self._count = 1
+            return True
+        if self._owner == owner:
+            self._count += 1
+            return True
+        return False
+
+    def try_acquire(self, owner: Any) -> bool:
+        """Take the lock without waiting; reentrant for the same owner."""
+        with self._state:
+            return self._take(owner)
+
+    def acquire(self, owner: Any, timeout: float) -> bool:
+        """Wait up to timeout seconds for the lock, blocking the calling thread (never call on the event loop)."""
+        with self._state:
+            return self._state.wait_for(lambda: self._take(owner), timeout)
+
+    async def acquire_async(self, owner: Any, timeout: float) -> bool:
+        """Wait up to timeout seconds for the lock without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._state:
+                if self._take(owner):
+                    return True
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                with self._state:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def release(self) -> None:
+        """Release one level of ownership, waking every waiting thread and task once the lock is free."""
+        with self._state:
+            self._count -= 1
+            if self._count:
+                return
+            self._owner = None
+            waiters, self._waiters = self._waiters, []
+            self._state.notify_all()
+        # The waiters race for the lock; the losers queue up again
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake_waiter, waiter)
+            except RuntimeError:
+                pass  # The waiter's loop is closed, nobody is left to wake
+
+
+def _wake_waiter(waiter: asyncio.Future) -> None:
+    """Resolve a KeyLock waiter unless it already gave up (runs on the waiter's loop)."""
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def on_event_loop() -> bool:
+    """Whether the calling thread is running an asyncio event loop (where nothing may block)."""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class TransactionalStore:
+    """
+    Read-modify-write transactions for the data stores.
+
+    Single mutations (add_reminder, add_content, ...) are already atomic. A
+    transaction is needed when a change depends on what was read first, e.g.
+    toggling a reminder or setting a role and name together. Locks are per key
+    (a section name, optionally with a user ID or role), so updates for
+    different users never wait on each other and the bot can keep
+    concurrent_updates(True).
+
+    Keys are always taken in sorted order so two transactions can't deadlock.
+    """
+
+    TRANSACTION_TIMEOUT = 10.0
+
+    def _key_lock(self, key: Any) -> KeyLock:
+        """Get (creating if needed) the lock for one key."""
+        with self._key_locks_guard:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = KeyLock()
+            return lock
+
+    def _ordered_locks(self, keys: tuple) -> List[KeyLock]:
+        """Get the locks for keys in a deadlock-free order."""
+        normalized = sorted({tuple(str(part) for part in (key if isinstance(key, tuple) else (key,))) for key in keys})
+        return [self._key_lock(key) for key in normalized]
+
+    @contextlib.contextmanager
+    def transaction(self, *keys: Any):
+        """
+        Hold the locks for keys for the duration of a with-block (thread-safe).
+
+        Waiting blocks the calling thread, so coroutines must use atransaction() or
+        run the store call in a worker thread. On the event loop this only succeeds
+        when the locks are free or already held by the current task (inside atransaction).
+
+        Args:
+            *keys: Lock keys such as ('daily_reminders', user_id) or 'flirt_messages'
+
+        Raises:
+            TimeoutError: If the locks can't be taken within TRANSACTION_TIMEOUT seconds
+            RuntimeError: If taking the locks would block the event loop
+        """
+        owner = KeyLock._current_owner()
+        blocking_allowed = not on_event_loop()
+        deadline = time.monotonic() + self.TRANSACTION_TIMEOUT
+        held = []
+        try:
+            for lock in self._ordered_locks(keys):
+                if not blocking_allowed:
+                    if not lock.try_acquire(owner):
+                        raise RuntimeError(f"Store transaction on {keys} would block the event loop: "
+                                           f"use atransaction() or run it in a worker thread")
+                elif not lock.acquire(owner, max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError(f"Could not acquire store transaction on {keys}")
+                held.append(lock)
+            yield self
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    @contextlib.asynccontextmanager
+    async def atransaction(self, *keys: Any):
+        """
+        Hold the locks for keys for the duration of an async with-block.
+
+        Waiting never blocks the event loop, so other updates keep being served.
+
+        Args:
+            *keys: Lock keys such as ('daily_reminders', user_id) or 'flirt_messages'
+
+        Raises:
+            TimeoutError: If the locks can't be taken within TRANSACTION_TIMEOUT seconds
+        """
+        owner = KeyLock._current_owner()
+        deadline = time.monotonic() + self.TRANSACTION_TIMEOUT
+        held = []
+        try:
+            for lock in self._ordered_locks(keys):
+                if not await lock.acquire_async(owner, max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError(f"Could not acquire store transaction on {keys}")
+                held.append(lock)
+            yield self
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+
+# Batched reminder ops and the single-reminder op applied to each entry of their 'updates' list
+REMINDER_BATCH_OPS = {'update_reminders': 'update_reminder', 'remove_reminders': 'remove_reminder'}
+
+
+def mutation_section(mutation: dict) -> str:
+    """
+    Get the top-level section a mutation changes.
+
+    Args:
+        mutation (dict): Mutation record
+
+    Returns:
+        str: Top-level key, e.g. 'daily_reminders'
+    """
+    op = mutation['op']
+    if op == 'set':
+        return mutation['key']
+    if op == 'set_user_value':
+        return mutation['section']
+    if op in ('add_content', 'remove_content'):
+        return 'couple_content' if mutation.get('couple_id') else 'content'
+    if op in ('create_couple', 'join_couple'):
+        return 'couples'
+    if op in REMINDER_BATCH_OPS:
+        # Every reminder kind lives in the reminders shard, so the first update names the section for all
+        return mutation['updates'][0]['kind']
+    return mutation['kind']
+
+
+def mutation_lock_key(mutation: dict) -> tuple:
+    """
+    Get the transaction key a mutation touches.
+
+    Args:
+        mutation (dict): Mutation record
+
+    Returns:
+        tuple: Lock key, e.g. ('daily_reminders', '12345')
+    """
+    op = mutation['op']
+    if op == 'set':
+        return (mutation['key'],)
+    if op == 'set_user_value':
+        return (mutation['section'], mutation['user_id'])
+    if op in ('add_content', 'remove_content'):
+        if mutation.get('couple_id'):
+            return ('content', mutation['couple_id'], mutation['role'])
+        return ('content', mutation['role'])
+    if op in ('create_couple', 'join_couple'):
+        return ('couples', mutation['couple_id'])
+    return (mutation['kind'], mutation['user_id'])
+
+
+def mutation_lock_keys(mutation: dict) -> List[tuple]:
+    """
+    Get every transaction key a mutation touches.
+
+    Args:
+        mutation (dict): Mutation record
+
+    Returns:
+        List[tuple]: Lock keys (one per user for batched reminder updates)
+    """
+    if mutation['op'] in REMINDER_BATCH_OPS:
+        return [(update['kind'], update['user_id']) for update in mutation['updates']]
+    return [mutation_lock_key(mutation)]
+
+
+class ReminderIndex:
+    """
+    In-memory index from reminder ID to its record.
+
+    Lets the store find a reminder in O(1) instead of scanning every user's
+    list, and keeps pointing at the right record when other reminders are
+    added or removed around it.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self._entries = {}
+
+    def rebuild(self, data: dict) -> None:
+        """
+        Re-index every reminder in the bot data.
+
+        Args:
+            data (dict): Bot data holding reminder records
+        """
+        self._entries = {}
+        for kind in REMINDER_TYPES:
+            for user_id, reminders in data.get(kind, {}).items():
+                for reminder in reminders:
+                    self.add(kind, user_id, reminder)
+
+    def add(self, kind: str, user_id: str, reminder: Reminder) -> None:
+        """
+        Index a reminder.
+
+        Args:
+            kind (str): Reminder section name
+            user_id (str): Owner's user ID string
+            reminder (Reminder): The record
+        """
+        self._entries[reminder.id] = (kind, user_id, reminder)
+
+    def discard(self, reminder_id: str) -> None:
+        """
+        Drop a reminder from the index if it is there.
+
+        Args:
+            reminder_id (str): Reminder ID
+        """
+        self._entries.pop(reminder_id, None)
+
+    def get(self, reminder_id: str) -> Optional[Tuple[str, str, Reminder]]:
+        """
+        Look up a reminder by ID.
+
+        Args:
+            reminder_id (str): Reminder ID
+
+        Returns:
+            Optional[Tuple[str, str, Reminder]]: (kind, user ID string, record) or None if unknown
+        """
+        return self._entries.get(reminder_id)
+
+    def __contains__(self, reminder_id: str) -> bool:
+        return reminder_id in self._entries
+
+
+class RoleIndex:
+    """
+    In-memory reverse index from role to the users holding it.
+
+    Answers "who are the girlfriends?" without walking every user_roles
+    entry, and is kept up to date as roles are set.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self._holders = {}
+        self._roles = {}
+
+    def rebuild(self, data: dict) -> None:
+        """
+        Re-index every user's role.
+
+        Args:
+            data (dict): Bot data holding the user_roles section
+        """
+        self._holders = {}
+        self._roles = {}
+        for user_id, role in data.get('user_roles', {}).items():
+            self.set(user_id, role)
+
+    def set(self, user_id: str, role: str) -> None:
+        """
+        Record a user's (new) role.
+
+        Args:
+            user_id (str): User ID string
+            role (str): Role the user now holds
+        """
+        previous = self._roles.get(user_id)
+        if previous is not None:
+            self._holders.get(previous, set()).discard(user_id)
+        self._roles[user_id] = role
+        self._holders.setdefault(role, set()).add(user_id)
+
+    def holders(self, role: str) -> List[str]:
+        """
+        Get the users holding a role.
+
+        Args:
+            role (str): 'boyfriend' or 'girlfriend'
+
+        Returns:
+            List[str]: User ID strings, in no particular order
+        """
+        return list(self._holders.get(role, ()))
+
+
+def find_reminder(data: dict, kind: str, user_id: str, reminder_id: str,
+                  index: Optional[ReminderIndex] = None) -> Optional[Reminder]:
+    """
+    Find one of a user's reminders by ID.
+
+    Args:
+        data (dict): Bot data holding reminder records
+        kind (str): Reminder section name
+        user_id (str): Owner's user ID string
+        reminder_id (str): Reminder ID
+        index (Optional[ReminderIndex]): Index for an O(1) lookup, scans the user's list if None
+
+    Returns:
+        Optional[Reminder]: The record, or None if the user has no such reminder
+    """
+    if index is not None:
+        entry = index.get(reminder_id)
+        # The owner check stops a crafted callback from touching someone else's reminder
+        if entry is None or entry[0] != kind or entry[1] != user_id:
+            return None
+        return entry[2]
+
+    for reminder in data.get(kind, {}).get(user_id, []):
+        if reminder.id == reminder_id:
+            return reminder
+    return None
+
+
+def snapshot(value: Any) -> Any:
+    """
+    Copy the dicts and lists of a cached value so it can be used outside the store lock.
+
+    Records inside (reminders, strings) are shared: mutations replace them rather
+    than change them in place.
+
+    Args:
+        value: Cached value
+
+    Returns:
+        Any: Copy of the containers holding the same records
+    """
+    if isinstance(value, dict):
+        return {key: snapshot(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [snapshot(item) for item in value]
+    return value
+
+
+def apply_mutation(data: dict, mutation: dict, index: Optional[ReminderIndex] = None,
+                   role_index: Optional[RoleIndex] = None) -> bool:
+    """
+    Apply one mutation record to bot data in place.
+
+    Every change the store makes is expressed as one of these records, so the
+    same code path serves live writes and journal replay.
+
+    Args:
+        data (dict): Bot data to change
+        mutation (dict): Record with an 'op' field and its arguments
+        index (Optional[ReminderIndex]): Reminder index to use and keep up to date
+        role_index (Optional[RoleIndex]): Role index to keep up to date
+
+    Returns:
+        bool: True if the data changed, False if the target didn't exist
+    """
+    op = mutation['op']
+
+    if op == 'set':
+        data[mutation['key']] = mutation['value']
+        if role_index is not None and mutation['key'] == 'user_roles':
+            role_index.rebuild(data)
+        return True
+
+    if op == 'set_user_value':
+        data.setdefault(mutation['section'], {})[mutation['user_id']] = mutation['value']
+        if role_index is not None and mutation['section'] == 'user_roles':
+            role_index.set(mutation['user_id'], mutation['value'])
+        return True
+
+    if op == 'add_reminder':
+        reminder = reminder_from_dict(mutation['kind'], mutation['reminder'])
+        data.setdefault(mutation['kind'], {}).setdefault(mutation['user_id'], []).append(reminder)
+        if index is not None:
+            index.add(mutation['kind'], mutation['user_id'], reminder)
+        return True
+
+    if op in ('update_reminder', 'remove_reminder'):
+        reminders = data.get(mutation['kind'], {}).get(mutation['user_id'])
+        if not reminders:
+            return False
+        if 'reminder_id' in mutation:
+            reminder = find_reminder(data, mutation['kind'], mutation['user_id'], mutation['reminder_id'], index)
+        elif 0 <= mutation['index'] < len(reminders):
+            # Entries journaled before reminders had IDs
+            reminder = reminders[mutation['index']]
+        else:
+            reminder = None
+        if reminder is None:
+            return False
+
+        if op == 'update_reminder':
+            # Copy on write: readers may still hold the old record, so it is never changed in place
+            updated = reminder.from_dict({**reminder.to_dict(), **mutation['changes']})
+            reminders[:] = [updated if other is reminder else other for other in reminders]
+            if index is not None:
+                index.add(mutation['kind'], mutation['user_id'], updated)
+        else:
+            # Compare by identity - two reminders can have identical contents
+            reminders[:] = [other for other in reminders if other is not reminder]
+            if index is not None:
+                index.discard(reminder.id)
+        return True
+
+    if op in REMINDER_BATCH_OPS:
+        changed = False
+        for update in mutation['updates']:
+            changed = apply_mutation(data, dict(update, op=REMINDER_BATCH_OPS[op]), index) or changed
+        return changed
+
+    if op == 'add_content':
+        if mutation.get('couple_id'):
+            content = data.setdefault('couple_content', {}).setdefault(mutation['couple_id'], {})
+        else:
+            content = data.setdefault('content', {'boyfriend': {}, 'girlfriend': {}})
+        content.setdefault(mutation['role'], {}).setdefault(mutation['content_type'], []).append(mutation['item'])
+        return True
+
+    if op == 'remove_content':
+        if mutation.get('couple_id'):
+            content = data.get('couple_content', {}).get(mutation['couple_id'], {})
+        else:
+            content = data.get('content', {})
+        content_list = content.get(mutation['role'], {}).get(mutation['content_type'])
+        if not content_list or mutation['item'] not in content_list:
+            return False
+        content_list.remove(mutation['item'])
+        return True
+
+    if op == 'create_couple':
+        couple_id, user_id = mutation['couple_id'], mutation['user_id']
+        if couple_id in data.get('couples', {}) or user_id in data.get('user_couples', {}):
+            return False
+        data.setdefault('couples', {})[couple_id] = {
+            'members': [user_id], 'invite_code': mutation['invite_code'], 'created_at': mutation['created_at']
+        }
+        data.setdefault('user_couples', {})[user_id] = couple_id
+        data.setdefault('invite_codes', {})[mutation['invite_code']] = couple_id
+        return True
+
+    if op == 'join_couple':
+        couple_id, user_id = mutation['couple_id'], mutation['user_id']
+        couple = data.get('couples', {}).get(couple_id)
+        if couple is None or len(couple['members']) >= 2 or user_id in couple['members']:
+            return False
+
+        # A joiner who was still waiting on their own invite gives it up
+        user_couples = data.setdefault('user_couples', {})
+        pending_id = user_couples.get(user_id)
+        if pending_id is not None:
+            pending = data['couples'].get(pending_id)
+            if pending is None or pending['members'] != [user_id]:
+                return False
+            data.get('invite_codes', {}).pop(pending['invite_code'], None)
+            del data['couples'][pending_id]
+
+        couple['members'].append(user_id)
+        data.get('invite_codes', {}).pop(couple['invite_code'], None)
+        couple['invite_code'] = None
+        user_couples[user_id] = couple_id
+        return True
+
+    raise ValueError(f"Unknown mutation op: {op}")
+
+
+# Which shard file each top-level section lives in; every other section goes to DEFAULT_SHARD
+DATA_SHARDS = {
+    'profiles': ('user_roles', 'user_names', 'couples', 'user_couples', 'invite_codes'),
+    'reminders': ('daily_reminders', 'one_time_reminders', 'partner_reminders'),
+    'content': ('content', 'couple_content', 'image_paths', 'telebubbles', 'video_messages'),
+    'scheduler': ('scheduler_state',),
+}
+DEFAULT_SHARD = 'catalog'
+SHARD_NAMES = tuple(DATA_SHARDS) + (DEFAULT_SHARD,)
+SECTION_SHARDS = {section: shard for shard, sections in DATA_SHARDS.items() for section in sections}
+REMINDER_SHARD = 'reminders'
+
+
+def shard_has_missing_reminder_ids(shard_data: dict) -> bool:
+    """
+    Check whether a freshly parsed shard holds reminders saved before reminders had IDs.
+
+    Args:
+        shard_data (dict): Parsed shard contents (still plain JSON)
+
+    Returns:
+        bool: True if any reminder has no 'id' key
+    """
+    return any('id' not in reminder
+               for kind in REMINDER_TYPES
+               for reminders in shard_data.get(kind, {}).values()
+               for reminder in reminders)
+
+
+def decode_records(data: dict) -> dict:
+    """
+    Replace the JSON reminder sections of bot data with typed records, in place.
+
+    Args:
+        data (dict): Bot data (or one shard of it) as parsed from JSON
+
+    Returns:
+        dict: The same dict, for chaining
+    """
+    for kind in REMINDER_TYPES:
+        if kind in data:
+            data[kind] = decode_reminder_section(kind, data[kind])
+    return data
+
+
+def encode_records(data: dict) -> dict:
+    """
+    Get a JSON-serializable copy of bot data holding typed records.
+
+    Args:
+        data (dict): Bot data (or one shard of it) from the store
+
+    Returns:
+        dict: Shallow copy with reminder sections encoded back to dicts
+    """
+    encoded = dict(data)
+    for kind in REMINDER_TYPES:
+        if kind in encoded:
+            encoded[kind] = encode_reminder_section(encoded[kind])
+    return encoded
+
+
+def shard_for_section(section: str) -> str:
+    """
+    Get the shard a top-level section is stored in.
+
+    Args:
+        section (str): Top-level key such as 'daily_reminders' or 'jokes'
+
+    Returns:
+        str: Shard name
+    """
+    return SECTION_SHARDS.get(section, DEFAULT_SHARD)
+
+
+def load_sharded_data(shard_dir: str) -> dict:
+    """
+    Read every shard in a directory back into one bot data dict.
+
+    Args:
+        shard_dir (str): Directory containing <shard>.json files
+
+    Returns:
+        dict: Merged bot data
+    """
+    data = {}
+    for shard in SHARD_NAMES:
+        shard_path = os.path.join(shard_dir, f"{shard}.json")
+        if os.path.exists(shard_path):
+            data.update(read_json_file(shard_path))
+    data.pop(JOURNAL_SEQ_KEY, None)
+    return data
+
+
+def split_into_shards(legacy_path: str, shard_dir: str) -> bool:
+    """
+    One-shot migration of a single bot_data.json file into per-domain shards.
+
+    The old file is renamed to <name>.migrated afterwards so nobody keeps
+    editing a copy the bot no longer reads.
+
+    Args:
+        legacy_path (str): Path of the single-file bot_data.json
+        shard_dir (str): Directory to write the shards into
+
+    Returns:
+        bool: True if the migration succeeded, False otherwise
+    """
+    try:
+        data = read_json_file(legacy_path)
+        os.makedirs(shard_dir, exist_ok=True)
+        for shard in SHARD_NAMES:
+            shard_data = {key: value for key, value in data.items() if shard_for_section(key) == shard}
+            write_json_atomic(os.path.join(shard_dir, f"{shard}.json"), shard_data)
+        os.replace(legacy_path, legacy_path + '.migrated')
+        logger.info(f"Split {os.path.basename(legacy_path)} into shards in {shard_dir}")
+        return True
+    except Exception as e:
+        logger.error(f"Error splitting {legacy_path} into shards: {e}")
+        return False
+
+
+class BotDataStore(TransactionalStore):
+    """
+    In-memory store for bot data, kept on disk as per-domain JSON shards.
+
+    The data is parsed once and then served from memory, so accessors become
+    dictionary lookups instead of file reads. It is split into shards
+    (profiles, reminders, content, catalog) that are loaded and saved
+    separately: a shard is only re-read when its modification time or size
+    changes on disk (e.g. after a manual edit), and a write only re-serializes
+    the shard that changed - marking a reminder sent no longer pays for the
+    whole content catalog.
+
+    Writes are coalesced: mutations update memory and schedule a single atomic
+    flush of the dirty shards after flush_interval seconds, so a burst of
+    mutations (e.g. the scheduler marking many reminders sent) costs one write.
+    """
+
+    def __init__(self, shard_dir: str, flush_interval: float = 1.0, legacy_path: Optional[str] = None):
+        """
+        Create a store backed by a shard directory.
+
+        Args:
+            shard_dir (str): Absolute path of the directory holding the shard files
+            flush_interval (float): Seconds to wait before writing pending changes
+            legacy_path (Optional[str]): Single-file bot_data.json to split into shards on first use
+        """
+        self.shard_dir = shard_dir
+        self.flush_interval = flush_interval
+        self._data = {}
+        self._signatures = {shard: NOT_LOADED for shard in SHARD_NAMES}
+        self._failed_shards = set()
+        self._dirty_shards = set()
+        self._reminder_index = ReminderIndex()
+        self._role_index = RoleIndex()
+        self._flush_timer = None
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self._key_locks_guard = threading.Lock()
+
+        if legacy_path and os.path.exists(legacy_path) and not os.path.isdir(shard_dir):
+            split_into_shards(legacy_path, shard_dir)
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def shard_path(self, shard: str) -> str:
+        """
+        Get the file a shard is stored in.
+
+        Args:
+            shard (str): Shard name
+
+        Returns:
+            str: Absolute path of the shard file
+        """
+        return os.path.join(self.shard_dir, f"{shard}.json")
+
+    def _stat_signature(self, shard: str) -> Optional[Tuple[int, int]]:
+        """
+        Get the (mtime, size) signature of a shard file.
+
+        Args:
+            shard (str): Shard name
+
+        Returns:
+            Optional[Tuple[int, int]]: Signature or None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(self.shard_path(shard))
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _reload_shard(self, shard: str, signature: Optional[Tuple[int, int]]) -> None:
+        """
+        Re-read one shard into memory, replacing the sections it owns.
+
+        A shard that exists but can't be parsed is marked as failed, and saving
+        it is refused until a good copy is loaded again - otherwise the next
+        save would persist an empty shard and wipe its data.
+
+        Args:
+            shard (str): Shard name
+            signature: Signature of the file that is being read
+        """
+        shard_data = {}
+        if signature is not None:
+            try:
+                shard_data = read_json_file(self.shard_path(shard))
+                self._failed_shards.discard(shard)
+                logger.info(f"Loaded {shard} shard into memory")
+            except Exception as e:
+                logger.error(f"Error loading {shard} shard: {e}")
+                self._failed_shards.add(shard)
+        else:
+            self._failed_shards.discard(shard)
+
+        missing_ids = shard_has_missing_reminder_ids(shard_data)
+        self._on_shard_loaded(shard, shard_data)
+        for section in [key for key in self._data if shard_for_section(key) == shard]:
+            del self._data[section]
+        self._data.update(shard_data)
+        self._signatures[shard] = signature
+        if shard == REMINDER_SHARD:
+            self._reminder_index.rebuild(self._data)
+        if shard == shard_for_section('user_roles'):
+            self._role_index.rebuild(self._data)
+        if missing_ids and shard not in self._failed_shards:
+            # Reminders from before IDs existed just got one - write them back so the IDs stay stable
+            self._schedule_flush((shard,))
+
+    def _on_shard_loaded(self, shard: str, shard_data: dict) -> None:
+        """
+        Prepare a freshly read shard before it is merged: reminders are decoded
+        into typed records once here, so the scheduler never re-parses them.
+
+        Args:
+            shard (str): Shard name
+            shard_data (dict): Parsed shard contents (modified in place)
+        """
+        shard_data.pop(JOURNAL_SEQ_KEY, None)
+        decode_records(shard_data)
+
+    def _refresh(self) -> List[str]:
+        """
+        Re-read every shard whose file changed on disk.
+
+        Returns:
+            List[str]: Names of the shards that were reloaded
+        """
+        reloaded = []
+        for shard in SHARD_NAMES:
+            signature = self._stat_signature(shard)
+            if signature != self._signatures[shard]:
+                if shard in self._dirty_shards:
+                    logger.warning(f"{shard} shard changed on disk while changes are pending - keeping in-memory data")
+                else:
+                    self._reload_shard(shard, signature)
+                    reloaded.append(shard)
+        return reloaded
+
+    def load(self) -> dict:
+        """
+        Get the cached data, re-reading only shards that changed on disk.
+
+        The returned dict is the live cached copy: it may only be read while
+        holding self._lock. The getters below return snapshots for everyone else.
+
+        Returns:
+            dict: Cached bot data
+        """
+        with self._lock:
+            self._refresh()
+            return self._data
+
+    def save(self, data: dict) -> bool:
+        """
+        Replace all cached data and schedule every shard to be written.
+
+        Args:
+            data (dict): Data to save
+
+        Returns:
+            bool: True if the change was accepted, False if saving is refused
+        """
+        with self._lock:
+            if self._failed_shards:
+                logger.error(f"Refusing to save: shards {sorted(self._failed_shards)} failed to load, fix them first")
+                return False
+
+            self._data = decode_records(data)
+            self._reminder_index.rebuild(self._data)
+            self._role_index.rebuild(self._data)
+            self._schedule_flush(SHARD_NAMES)
+            return True
+
+    def _schedule_flush(self, shards) -> None:
+        """
+        Mark shards dirty and arm the debounce timer if it isn't running.
+
+        Args:
+            shards: Names of the shards that changed
+        """
+        self._dirty_shards.update(shards)
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _mutate(self, mutation: dict) -> bool:
+        """
+        Apply a mutation to the cached data and persist it.
+
+        Args:
+            mutation (dict): Mutation record (see apply_mutation)
+
+        Returns:
+            bool: True if the data changed and was accepted, False otherwise
+        """
+        shard = shard_for_section(mutation_section(mutation))
+        with self.transaction(*mutation_lock_keys(mutation)), self._lock:
+            data = self.load()
+            if shard in self._failed_shards:
+                logger.error(f"Refusing to save {shard} shard: last load failed, fix the file first")
+                return False
+            if not apply_mutation(data, mutation, self._reminder_index, self._role_index):
+                return False
+            return self._persist(mutation, shard)
+
+    def _persist(self, mutation: dict, shard: str) -> bool:
+        """
+        Persist a mutation that was already applied in memory.
+
+        Args:
+            mutation (dict): The applied mutation record
+            shard (str): Shard the mutation touched
+
+        Returns:
+            bool: True if the change was accepted
+        """
+        self._schedule_flush((shard,))
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a top-level section (e.g. 'flirt_messages' or 'exchange_stats').
+
+        Args:
+            key (str): Top-level key in bot_data.json
+            default: Value returned if the key doesn't exist
+
+        Returns:
+            Any: Snapshot of the stored value or default
+        """
+        with self._lock:
+            return snapshot(self.load().get(key, default))
+
+    def set(self, key: str, value: Any) -> bool:
+        """
+        Replace a top-level section.
+
+        Args:
+            key (str): Top-level key in bot_data.json
+            value: JSON-serializable value
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self._mutate({'op': 'set', 'key': key, 'value': value})
+
+    def get_user_value(self, section: str, user_id: int) -> Any:
+        """
+        Get a per-user value from a section like 'user_roles' or 'user_names'.
+
+        Args:
+            section (str): Section name
+            user_id (int): Telegram user ID
+
+        Returns:
+            Any: Stored value or None if not set
+        """
+        with self._lock:
+            return snapshot(self.load().get(section, {}).get(str(user_id)))
+
+    def get_user_values(self, section: str) -> Dict[str, Any]:
+        """
+        Get every per-user value in a section, keyed by user ID string.
+
+        Args:
+            section (str): Section name
+
+        Returns:
+            Dict[str, Any]: Mapping of user ID to value (a snapshot)
+        """
+        with self._lock:
+            return snapshot(self.load().get(section, {}))
+
+    def get_role_holders(self, role: str) -> List[str]:
+        """
+        Get the users holding a role, from the reverse role index.
+
+        Args:
+            role (str): 'boyfriend' or 'girlfriend'
+
+        Returns:
+            List[str]: User ID strings, in no particular order
+        """
+        with self._lock:
+            self.load()
+            return self._role_index.holders(role)
+
+    def set_user_value(self, section: str, user_id: int, value: Any) -> bool:
+        """
+        Set a per-user value in a section like 'user_roles' or 'user_names'.
+
+        Args:
+            section (str): Section name
+            user_id (int): Telegram user ID
+            value: Value to store
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self._mutate({'op': 'set_user_value', 'section': section, 'user_id': str(user_id), 'value': value})
+
+    def get_reminders(self, kind: str, user_id: int) -> List[Reminder]:
+        """
+        Get a user's reminders of one kind.
+
+        Args:
+            kind (str): 'daily_reminders', 'one_time_reminders' or 'partner_reminders'
+            user_id (int): Telegram user ID
+
+        Returns:
+            List[Reminder]: The user's reminder records, in creation order (read-only records in a new list)
+        """
+        with self._lock:
+            return list(self.load().get(kind, {}).get(str(user_id), []))
+
+    def get_all_reminders(self, kind: str) -> Dict[str, List[Reminder]]:
+        """
+        Get every user's reminders of one kind.
+
+        Args:
+            kind (str): Reminder section name
+
+        Returns:
+            Dict[str, List[Reminder]]: Mapping of user ID string to reminder records (read-only records in new containers)
+        """
+        with self._lock:
+            return snapshot(self.load().get(kind, {}))
+
+    def add_reminder(self, kind: str, user_id: int, reminder: Reminder) -> bool:
+        """
+        Append a reminder for a user.
+
+        Args:
+            kind (str): Reminder section name
+            user_id (int): Telegram user ID
+            reminder (Reminder): Reminder record of the section's type
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        mutation = {'op': 'add_reminder', 'kind': kind, 'user_id': str(user_id)}
+        # Same lock order as _mutate (which re-enters both), so the ID check and the append are one step
+        with self.transaction(mutation_lock_key(mutation)), self._lock:
+            self.load()
+            while reminder.id in self._reminder_index:
+                reminder.id = new_reminder_id()
+            return self._mutate(dict(mutation, reminder=reminder.to_dict()))
+
+    def get_reminder(self, kind: str, user_id: int, reminder_id: str) -> Optional[Reminder]:
+        """
+        Get one of a user's reminders by ID.
+
+        Args:
+            kind (str): Reminder section name
+            user_id (int): Telegram user ID
+            reminder_id (str): Reminder ID
+
+        Returns:
+            Optional[Reminder]: The record (read-only), or None if the user has no such reminder
+        """
+        with self._lock:
+            data = self.load()
+            return find_reminder(data, kind, str(user_id), reminder_id, self._reminder_index)
+
+    def update_reminder(self, kind: str, user_id: int, reminder_id: str, changes: dict) -> bool:
+        """
+        Update fields of one of a user's reminders.
+
+        Args:
+            kind (str): Reminder section name
+            user_id (int): Telegram user ID
+            reminder_id (str): Reminder ID
+            changes (dict): Fields to overwrite
+
+        Returns:
+            bool: True if successful, False if the reminder doesn't exist
+        """
+        return self._mutate({'op': 'update_reminder', 'kind': kind, 'user_id': str(user_id),
+                             'reminder_id': reminder_id, 'changes': changes})
+
+    def update_reminders(self, updates: List[Tuple[str, int, str, dict]]) -> bool:
+        """
+        Update fields of several reminders as one change (one journal entry or flush).
+
+        Args:
+            updates (List[Tuple[str, int, str, dict]]): (kind, user_id, reminder_id, changes) for each reminder
+
+        Returns:
+            bool: True if at least one reminder was updated (or there was nothing to do)
+        """
+        if not updates:
+            return True
+        return self._mutate({'op': 'update_reminders', 'updates': [
+            {'kind': kind, 'user_id': str(user_id), 'reminder_id': reminder_id, 'changes': changes}
+            for kind, user_id, reminder_id, changes in updates]})
+
+    def remove_reminder(self, kind: str, user_id: int, reminder_id: str) -> bool:
+        """
+        Remove one of a user's reminders.
+
+        Args:
+            kind (str): Reminder section name
+            user_id (int): Telegram user ID
+            reminder_id (str): Reminder ID
+
+        Returns:
+            bool: True if successful, False if the reminder doesn't exist
+        """
+        return self._mutate({'op': 'remove_reminder', 'kind': kind, 'user_id': str(user_id),
+                             'reminder_id': reminder_id})
+
+    def remove_reminders(self, reminders: List[Tuple[str, int, str]]) -> bool:
+        """
+        Remove several reminders as one change (one journal entry or flush).
+
+        Args:
+            reminders (List[Tuple[str, int, str]]): (kind, user_id, reminder_id) of each reminder
+
+        Returns:
+            bool: True if at least one reminder was removed (or there was nothing to do)
+        """
+        if not reminders:
+            return True
+        return self._mutate({'op': 'remove_reminders', 'updates': [
+            {'kind': kind, 'user_id': str(user_id), 'reminder_id': reminder_id}
+            for kind, user_id, reminder_id in reminders]})
+
+    def get_content(self, role: str, content_type: str, couple_id: Optional[str] = None) -> list:
+        """
+        Get the role-specific content list (e.g. a girlfriend's image_paths).
+
+        Args:
+            role (str): 'boyfriend' or 'girlfriend'
+            content_type (str): Content type such as 'image_paths'
+            couple_id (Optional[str]): Couple the content belongs to, None for the legacy single-couple content
+
+        Returns:
+            list: Content items (empty if none)
+        """
+        with self._lock:
+            data = self.load()
+            content = data.get('couple_content', {}).get(couple_id, {}) if couple_id else data.get('content', {})
+            return snapshot(content.get(role, {}).get(content_type, []))
+
+    def add_content(self, role: str, content_type: str, item: Any, couple_id: Optional[str] = None) -> bool:
+        """
+        Append an item to a role's content list.
+
+        Args:
+            role (str): Role the content is for
+            content_type (str): Content type such as 'image_paths'
+            item: Content item to add
+            couple_id (Optional[str]): Couple the content belongs to, None for the legacy single-couple content
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        mutation = {'op': 'add_content', 'role': role, 'content_type': content_type, 'item': item}
+        if couple_id:
+            mutation['couple_id'] = couple_id
+        return self._mutate(mutation)
+
+    def remove_content(self, role: str, content_type: str, item: Any, couple_id: Optional[str] = None) -> bool:
+        """
+        Remove an item from a role's content list.
+
+        Args:
+            role (str): Role the content belongs to
+            content_type (str): Content type such as 'image_paths'
+            item: Content item to remove
+            couple_id (Optional[str]): Couple the content belongs to, None for the legacy single-couple content
+
+        Returns:
+            bool: True if the item was removed, False if it wasn't there
+        """
+        mutation = {'op': 'remove_content', 'role': role, 'content_type': content_type, 'item': item}
+        if couple_id:
+            mutation['couple_id'] = couple_id
+        return self._mutate(mutation)
+
+    def get_user_couple(self, user_id: int) -> Optional[str]:
+        """
+        Get the couple a user belongs to (a single pairing-table read).
+
+        Args:
+            user_id (int): Telegram user ID
+
+        Returns:
+            Optional[str]: Couple ID or None if the user isn't paired or invited anyone yet
+        """
+        with self._lock:
+            return self.load().get('user_couples', {}).get(str(user_id))
+
+    def get_couple(self, couple_id: str) -> Optional[dict]:
+        """
+        Get a couple record.
+
+        Args:
+            couple_id (str): Couple ID
+
+        Returns:
+            Optional[dict]: {'members': [user ID strings], 'invite_code', 'created_at'} (a snapshot) or None
+        """
+        with self._lock:
+            return snapshot(self.load().get('couples', {}).get(couple_id))
+
+    def get_couples(self) -> Dict[str, dict]:
+        """
+        Get every couple record.
+
+        Returns:
+            Dict[str, dict]: Mapping of couple ID to couple record (a snapshot)
+        """
+        with self._lock:
+            return snapshot(self.load().get('couples', {}))
+
+    def get_couple_by_invite(self, invite_code: str) -> Optional[str]:
+        """
+        Resolve an invite code.
+
+        Args:
+            invite_code (str): Code shared by the inviting partner
+
+        Returns:
+            Optional[str]: Couple ID waiting for a partner, or None if the code is unknown
+        """
+        with self._lock:
+            return self.load().get('invite_codes', {}).get(invite_code)
+
+    def create_couple(self, couple_id: str, user_id: int, invite_code: str) -> bool:
+        """
+        Create a couple with one member and an invite code for the partner.
+
+        Args:
+            couple_id (str): New couple ID
+            user_id (int): Telegram user ID of the inviting partner
+            invite_code (str): Code the partner joins with
+
+        Returns:
+            bool: True if created, False if the user already belongs to a couple
+        """
+        return self._mutate({'op': 'create_couple', 'couple_id': couple_id, 'user_id': str(user_id),
+                             'invite_code': invite_code, 'created_at': datetime.datetime.now().isoformat()})
+
+    def join_couple(self, couple_id: str, user_id: int) -> bool:
+        """
+        Add the second member to a couple and retire its invite code.
+
+        Args:
+            couple_id (str): Couple to join
+            user_id (int): Telegram user ID of the joining partner
+
+        Returns:
+            bool: True if joined, False if the couple is full or the user is already paired
+        """
+        return self._mutate({'op': 'join_couple', 'couple_id': couple_id, 'user_id': str(user_id)})
+
+    def _flush_from_timer(self) -> None:
+        """Flush pending changes when the debounce timer fires."""
+        with self._lock:
+            self._flush_timer = None
+            if not self.flush():
+                # Keep the changes and try again on the next interval
+                self._schedule_flush(())
+
+    def _shard_data(self, shard: str) -> dict:
+        """
+        Collect the sections that belong to one shard.
+
+        Args:
+            shard (str): Shard name
+
+        Returns:
+            dict: Shard contents ready to be written
+        """
+        return encode_records({key: value for key, value in self._data.items() if shard_for_section(key) == shard})
+
+    def _write_shard(self, shard: str, shard_data: dict) -> None:
+        """
+        Atomically write one shard and remember its new signature.
+
+        Args:
+            shard (str): Shard name
+            shard_data (dict): Contents to write
+        """
+        write_json_atomic(self.shard_path(shard), shard_data)
+        # Remember our own write so it doesn't trigger a reload
+        self._signatures[shard] = self._stat_signature(shard)
+
+    def flush(self) -> bool:
+        """
+        Write pending changes to disk now, one file per dirty shard.
+
+        Returns:
+            bool: True if nothing was pending or every write succeeded, False otherwise
+        """
+        with self._lock:
+            success = True
+            for shard in sorted(self._dirty_shards):
+                if shard in self._failed_shards:
+                    logger.error(f"Refusing to save {shard} shard: last load failed, fix the file first")
+                    success = False
+                    continue
+                try:
+                    self._write_shard(shard, self._shard_data(shard))
+                    self._dirty_shards.discard(shard)
+                except Exception as e:
+                    logger.error(f"Error saving {shard} shard: {e}")
+                    success = False
+            return success
+
+    def sync(self) -> bool:
+        """
+        Make every change so far durable before going on (e.g. before acting on it outside the store).
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.flush()
+
+    def close(self) -> None:
+        """Cancel the debounce timer and write any pending changes."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self.flush()
+
+
+class JournaledBotDataStore(BotDataStore):
+    """
+    BotDataStore that logs each mutation to an append-only JSONL journal.
+
+    Every mutation is written as one small line and fsynced, so write latency
+    doesn't grow with the size of the content catalog or reminder history. The
+    journal is periodically compacted into the shard snapshots, and on startup
+    the journal tail is replayed over them.
+
+    Each journal entry carries a sequence number and every shard records the
+    last sequence it contains (JOURNAL_SEQ_KEY), so a crash part-way through a
+    compaction never applies an entry twice.
+    """
+
+    def __init__(self, shard_dir: str, journal_path: str, compact_interval: float = 300.0,
+                 compact_max_entries: int = 1000, legacy_path: Optional[str] = None):
+        """
+        Create a journaled store.
+
+        Args:
+            shard_dir (str): Absolute path of the directory holding the shard snapshots
+            journal_path (str): Absolute path of the JSONL journal
+            compact_interval (float): Seconds between periodic compactions
+            compact_max_entries (int): Compact early once the journal has this many entries
+            legacy_path (Optional[str]): Single-file bot_data.json to split into shards on first use
+        """
+        super().__init__(shard_dir, legacy_path=legacy_path)
+        self.journal_path = journal_path
+        self.compact_interval = compact_interval
+        self.compact_max_entries = compact_max_entries
+        self._seq = 0
+        self._shard_seqs = {shard: 0 for shard in SHARD_NAMES}
+        self._journal_entries = 0
+        self._journaled_shards = set()
+        self._journal_file = None
+        self._compact_timer = None
+
+    def _on_shard_loaded(self, shard: str, shard_data: dict) -> None:
+        """Remember which journal entries a freshly read shard already contains."""
+        self._shard_seqs[shard] = shard_data.pop(JOURNAL_SEQ_KEY, 0)
+        super()._on_shard_loaded(shard, shard_data)
+
+    def load(self) -> dict:
+        """Re-read changed shards and replay the journal tail over them."""
+        with self._lock:
+            reloaded = self._refresh()
+            if reloaded:
+                # A shard that failed to parse keeps its journal entries until it is fixed
+                self._replay(set(reloaded) - self._failed_shards)
+            return self._data
+
+    def _replay(self, shards: set) -> None:
+        """
+        Apply journal entries newer than the snapshot of each reloaded shard.
+
+        Args:
+            shards (set): Shards that were just read from disk
+        """
+        self._journal_entries = 0
+        self._journaled_shards = set()
+        replayed = 0
+        try:
+            with open(self.journal_path, 'rb+') as journal:
+                good_offset = 0
+                for line in journal:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError("unterminated entry")
+                        entry = codec.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append - cut it off so new entries start clean
+                        logger.warning(f"Dropping incomplete entry at the end of {os.path.basename(self.journal_path)}")
+                        journal.truncate(good_offset)
+                        break
+                    good_offset += len(line)
+                    self._journal_entries += 1
+                    self._seq = max(self._seq, entry['seq'])
+
+                    shard = shard_for_section(mutation_section(entry['mutation']))
+                    self._journaled_shards.add(shard)
+                    if shard in shards and entry['seq'] > self._shard_seqs[shard]:
+                        apply_mutation(self._data, entry['mutation'], self._reminder_index, self._role_index)
+                        replayed += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error replaying {os.path.basename(self.journal_path)}: {e}")
+            self._failed_shards.update(shards)
+            return
+
+        self._seq = max([self._seq] + list(self._shard_seqs.values()))
+        if replayed:
+            logger.info(f"Replayed {replayed} journal entries over the shard snapshots")
+        self._schedule_compaction()
+
+    def _persist(self, mutation: dict, shard: str) -> bool:
+        """Append the mutation to the journal and fsync it."""
+        try:
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_path, 'ab')
+            entry = {'seq': self._seq + 1, 'mutation': mutation}
+            self._journal_file.write(codec.dumps(entry) + b'\n')
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+        except Exception as e:
+            logger.error(f"Error appending to {os.path.basename(self.journal_path)}: {e}")
+            return False
+
+        self._seq += 1
+        self._journal_entries += 1
+        self._journaled_shards.add(shard)
+        if self._journal_entries >= self.compact_max_entries:
+            self.compact()
+        else:
+            self._schedule_compaction()
+        return True
+
+    def save(self, data: dict) -> bool:
+        """Replace the whole document - written straight to fresh snapshots."""
+        with self._lock:
+            if self._failed_shards:
+                logger.error(f"Refusing to save: shards {sorted(self._failed_shards)} failed to load, fix them first")
+                return False
+            self._data = decode_records(data)
+            self._reminder_index.rebuild(self._data)
+            self._role_index.rebuild(self._data)
+            self._dirty_shards.update(SHARD_NAMES)
+            return self.compact()
+
+    def _schedule_compaction(self) -> None:
+        """Arm the periodic compaction timer if there is anything to compact."""
+        if self._compact_timer is None and self._journal_entries:
+            self._compact_timer = threading.Timer(self.compact_interval, self._compact_from_timer)
+            self._compact_timer.daemon = True
+            self._compact_timer.start()
+
+    def _compact_from_timer(self) -> None:
+        """Compact when the periodic timer fires."""
+        with self._lock:
+            self._compact_timer = None
+            if not self.compact():
+                self._schedule_compaction()
+
+    def compact(self) -> bool:
+        """
+        Write snapshots of every shard touched by the journal and truncate it.
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        with self._lock:
+            shards = self._journaled_shards | self._dirty_shards
+            if self._failed_shards & shards:
+                return False
+            if not self._journal_entries and not shards:
+                return True
+            try:
+                for shard in sorted(shards):
+                    shard_data = self._shard_data(shard)
+                    shard_data[JOURNAL_SEQ_KEY] = self._seq
+                    self._write_shard(shard, shard_data)
+                    self._shard_seqs[shard] = self._seq
+                    self._dirty_shards.discard(shard)
+
+                # The snapshots now cover every entry, so the journal can start over
+                if self._journal_file is not None:
+                    self._journal_file.close()
+                    self._journal_file = None
+                with open(self.journal_path, 'w', encoding='utf-8') as journal:
+                    os.fsync(journal.fileno())
+                self._journal_entries = 0
+                self._journaled_shards = set()
+                logger.info(f"Compacted journal into shards: {', '.join(sorted(shards))}")
+                return True
+            except Exception as e:
+                logger.error(f"Error compacting {os.path.basename(self.journal_path)}: {e}")
+                return False
+
+    def flush(self) -> bool:
+        """Mutations are durable as soon as they are journaled; flushing means compacting."""
+        return self.compact()
+
+    def sync(self) -> bool:
+        """Mutations are fsynced to the journal as they happen, so they are durable already."""
+        return True
+
+    def close(self) -> None:
+        """Stop the compaction timer, compact and close the journal."""
+        with self._lock:
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+                self._compact_timer = None
+            self.compact()
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+
+
+# Reminder sections and the field each one is scheduled by
+REMINDER_KINDS = {
+    'daily_reminders': 'time',
+    'one_time_reminders': 'datetime',
+    'partner_reminders': 'datetime',
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS user_roles (user_id TEXT PRIMARY KEY, role TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS user_names (user_id TEXT PRIMARY KEY, name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_user_roles_role ON user_roles (role);
+CREATE TABLE IF NOT EXISTS daily_reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    due TEXT,
+    data TEXT NOT NULL,
+    reminder_id TEXT
+);
+CREATE TABLE IF NOT EXISTS one_time_reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    due TEXT,
+    data TEXT NOT NULL,
+    reminder_id TEXT
+);
+CREATE TABLE IF NOT EXISTS partner_reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    due TEXT,
+    data TEXT NOT NULL,
+    reminder_id TEXT
+);
+CREATE TABLE IF NOT EXISTS content (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    role TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    value TEXT NOT NULL,
+    couple_id TEXT
+);
+CREATE TABLE IF NOT EXISTS couples (
+    couple_id TEXT PRIMARY KEY,
+    members TEXT NOT NULL,
+    invite_code TEXT UNIQUE,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS user_couples (user_id TEXT PRIMARY KEY, couple_id TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_daily_reminders_user ON daily_reminders (user_id);
+CREATE INDEX IF NOT EXISTS idx_daily_reminders_due ON daily_reminders (due);
+CREATE INDEX IF NOT EXISTS idx_one_time_reminders_user ON one_time_reminders (user_id);
+CREATE INDEX IF NOT EXISTS idx_one_time_reminders_due ON one_time_reminders (due);
+CREATE INDEX IF NOT EXISTS idx_partner_reminders_user ON partner_reminders (user_id);
+CREATE INDEX IF NOT EXISTS idx_partner_reminders_due ON partner_reminders (due);
+"""
+
+# Created after _migrate_columns(), since older databases lack the reminder_id / couple_id columns
+SQLITE_MIGRATED_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_reminders_reminder_id ON daily_reminders (reminder_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_one_time_reminders_reminder_id ON one_time_reminders (reminder_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_partner_reminders_reminder_id ON partner_reminders (reminder_id);
+DROP INDEX IF EXISTS idx_content_role_type;
+CREATE INDEX IF NOT EXISTS idx_content_couple_role_type ON content (couple_id, role, content_type);
+"""
+
+# Sections that get their own table; everything else is kept as a JSON document
+SQLITE_USER_TABLES = {'user_roles': 'role', 'user_names': 'name'}
+
+
+def sql_json(value: Any) -> str:
+    """
+    Encode a value for a TEXT column with the shared codec.
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        str: Compact JSON text
+    """
+    return codec.dumps(value).decode('utf-8')
+
+
+class SqliteBotDataStore(TransactionalStore):
+    """
+    SQLite (WAL mode) backend with the same interface as BotDataStore.
+
+    Users, couples, reminders and role content live in their own tables, so a mutation
+    writes one row instead of re-serializing the whole document. Sections that
+    rarely change (flirt_messages, jokes, exchange_stats, ...) are stored as
+    JSON documents.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the SQLite database.
+
+        Args:
+            path (str): Absolute path of the database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self._key_locks_guard = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._migrate_columns()
+        self._conn.executescript(SQLITE_MIGRATED_INDEXES)
+        self._conn.commit()
+
+    def _migrate_columns(self) -> None:
+        """Add the reminder_id and couple_id columns to older databases and give every existing reminder an ID."""
+        with self._conn:
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(content)')]
+            if 'couple_id' not in columns:
+                self._conn.execute('ALTER TABLE content ADD COLUMN couple_id TEXT')
+
+            for kind in REMINDER_KINDS:
+                columns = [row[1] for row in self._conn.execute(f'PRAGMA table_info({kind})')]
+                if 'reminder_id' not in columns:
+                    self._conn.execute(f'ALTER TABLE {kind} ADD COLUMN reminder_id TEXT')
+
+                rows = self._conn.execute(f'SELECT id, data FROM {kind} WHERE reminder_id IS NULL').fetchall()
+                for row_id, data in rows:
+                    reminder = reminder_from_dict(kind, codec.loads(data)).to_dict()
+                    self._conn.execute(f'UPDATE {kind} SET reminder_id = ?, data = ? WHERE id = ?',
+                                       (reminder['id'], sql_json(reminder), row_id))
+                if rows:
+                    logger.info(f"Assigned IDs to {len(rows)} {kind}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """
+        Run a single write statement and commit it.
+
+        Args:
+            sql (str): SQL statement
+            params (tuple): Statement parameters
+
+        Returns:
+            sqlite3.Cursor: Cursor of the executed statement
+        """
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        """
+        Run a read query.
+
+        Args:
+            sql (str): SQL query
+            params (tuple): Query parameters
+
+        Returns:
+            list: All result rows
+        """
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def is_empty(self) -> bool:
+        """
+        Check whether the database has never been populated.
+
+        Returns:
+            bool: True if no migration or write has happened yet
+        """
+        return not self._query("SELECT 1 FROM meta WHERE key = 'initialized'")
+
+    def mark_initialized(self, source: str) -> None:
+        """
+        Record that the database has been populated.
+
+        Args:
+            source (str): Where the initial data came from
+        """
+        self._execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', ?)", (source,))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a JSON document section (e.g. 'flirt_messages' or 'exchange_stats').
+
+        Args:
+            key (str): Document key
+            default: Value returned if the key doesn't exist
+
+        Returns:
+            Any: Stored value or default
+        """
+        rows = self._query('SELECT value FROM documents WHERE key = ?', (key,))
+        return codec.loads(rows[0][0]) if rows else default
+
+    def set(self, key: str, value: Any) -> bool:
+        """
+        Replace a JSON document section.
+
+        Args:
+            key (str): Document key
+            value: JSON-serializable value
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            with self.transaction((key,)):
+                self._execute('INSERT OR REPLACE INTO documents (key, value) VALUES (?, ?)',
+                              (key, sql_json(value)))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving document {key}: {e}")
+            return False
+
+    def get_user_value(self, section: str, user_id: int) -> Any:
+        """Get a per-user value from 'user_roles' or 'user_names'."""
+        column = SQLITE_USER_TABLES[section]
+        rows = self._query(f'SELECT {column} FROM {section} WHERE user_id = ?', (str(user_id),))
+        return rows[0][0] if rows else None
+
+    def get_user_values(self, section: str) -> Dict[str, Any]:
+        """Get every per-user value in 'user_roles' or 'user_names'."""
+        column = SQLITE_USER_TABLES[section]
+        return dict(self._query(f'SELECT user_id, {column} FROM {section}'))
+
+    def get_role_holders(self, role: str) -> List[str]:
+        """Get the users holding a role (uses the role index on user_roles)."""
+        return [row[0] for row in self._query('SELECT user_id FROM user_roles WHERE role = ?', (role,))]
+
+    def set_user_value(self, section: str, user_id: int, value: Any) -> bool:
+        """Set a per-user value in 'user_roles' or 'user_names'."""
+        column = SQLITE_USER_TABLES[section]
+        try:
+            with self.transaction((section, user_id)):
+                self._execute(f'INSERT OR REPLACE INTO {section} (user_id, {column}) VALUES (?, ?)',
+                              (str(user_id), value))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {section} for user {user_id}: {e}")
+            return False
+
+    def get_reminders(self, kind: str, user_id: int) -> List[Reminder]:
+        """Get a user's reminder records of one kind, in creation order."""
+        rows = self._query(f'SELECT data FROM {kind} WHERE user_id = ? ORDER BY id', (str(user_id),))
+        return [reminder_from_dict(kind, codec.loads(row[0])) for row in rows]
+
+    def get_all_reminders(self, kind: str) -> Dict[str, List[Reminder]]:
+        """Get every user's reminder records of one kind, keyed by user ID string."""
+        reminders = {}
+        for user_id, data in self._query(f'SELECT user_id, data FROM {kind} ORDER BY id'):
+            reminders.setdefault(user_id, []).append(reminder_from_dict(kind, codec.loads(data)))
+        return reminders
+
+    def add_reminder(self, kind: str, user_id: int, reminder: Reminder) -> bool:
+        """Append a reminder record for a user."""
+        try:
+            data = reminder.to_dict()
+            with self.transaction((kind, user_id)):
+                self._execute(f'INSERT INTO {kind} (user_id, due, data, reminder_id) VALUES (?, ?, ?, ?)',
+                              (str(user_id), data.get(REMINDER_KINDS[kind]),
+                               sql_json(data), reminder.id))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {kind} for user {user_id}: {e}")
+            return False
+
+    def _reminder_row(self, kind: str, user_id: int, reminder_id: str) -> Optional[Tuple[int, str]]:
+        """
+        Find the row of a user's reminder by its ID (uses the unique reminder_id index).
+
+        Returns:
+            Optional[Tuple[int, str]]: (row id, JSON data) or None if the user has no such reminder
+        """
+        rows = self._query(f'SELECT id, data FROM {kind} WHERE reminder_id = ? AND user_id = ?',
+                           (reminder_id, str(user_id)))
+        return rows[0] if rows else None
+
+    def get_reminder(self, kind: str, user_id: int, reminder_id: str) -> Optional[Reminder]:
+        """Get one of a user's reminders by ID."""
+        row = self._reminder_row(kind, user_id, reminder_id)
+        return reminder_from_dict(kind, codec.loads(row[1])) if row else None
+
+    def update_reminder(self, kind: str, user_id: int, reminder_id: str, changes: dict) -> bool:
+        """Update fields of one of a user's reminders."""
+        with self.transaction((kind, user_id)), self._lock:
+            row = self._reminder_row(kind, user_id, reminder_id)
+            if row is None:
+                return False
+            reminder = reminder_from_dict(kind, codec.loads(row[1]))
+            reminder.update(changes)
+            data = reminder.to_dict()
+            self._execute(f'UPDATE {kind} SET due = ?, data = ? WHERE id = ?',
+                          (data.get(REMINDER_KINDS[kind]), sql_json(data), row[0]))
+            return True
+
+    def update_reminders(self, updates: List[Tuple[str, int, str, dict]]) -> bool:
+        """Update fields of several reminders in one SQLite transaction."""
+        if not updates:
+            return True
+        keys = [(kind, user_id) for kind, user_id, _, _ in updates]
+        updated = 0
+        with self.transaction(*keys), self._lock:
+            try:
+                for kind, user_id, reminder_id, changes in updates:
+                    row = self._reminder_row(kind, user_id, reminder_id)
+                    if row is None:
+                        continue
+                    reminder = reminder_from_dict(kind, codec.loads(row[1]))
+                    reminder.update(changes)
+                    data = reminder.to_dict()
+                    self._conn.execute(f'UPDATE {kind} SET due = ?, data = ? WHERE id = ?',
+                                       (data.get(REMINDER_KINDS[kind]), sql_json(data), row[0]))
+                    updated += 1
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return updated > 0
+
+    def remove_reminder(self, kind: str, user_id: int, reminder_id: str) -> bool:
+        """Remove one of a user's reminders."""
+        with self.transaction((kind, user_id)):
+            cursor = self._execute(f'DELETE FROM {kind} WHERE reminder_id = ? AND user_id = ?',
+                                   (reminder_id, str(user_id)))
+        return cursor.rowcount > 0
+
+    def remove_reminders(self, reminders: List[Tuple[str, int, str]]) -> bool:
+        """Remove several reminders in one SQLite transaction."""
+        if not reminders:
+            return True
+        keys = [(kind, user_id) for kind, user_id, _ in reminders]
+        removed = 0
+        with self.transaction(*keys), self._lock:
+            try:
+                for kind, user_id, reminder_id in reminders:
+                    cursor = self._conn.execute(f'DELETE FROM {kind} WHERE reminder_id = ? AND user_id = ?',
+                                                (reminder_id, str(user_id)))
+                    removed += cursor.rowcount
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return removed > 0
+
+    def get_content(self, role: str, content_type: str, couple_id: Optional[str] = None) -> list:
+        """Get the role-specific content list of a couple (None for the legacy single-couple content)."""
+        rows = self._query(
+            'SELECT value FROM content WHERE couple_id IS ? AND role = ? AND content_type = ? ORDER BY id',
+            (couple_id or None, role, content_type))
+        return [codec.loads(row[0]) for row in rows]
+
+    def add_content(self, role: str, content_type: str, item: Any, couple_id: Optional[str] = None) -> bool:
+        """Append an item to a role's content list."""
+        try:
+            with self.transaction(('content', couple_id, role) if couple_id else ('content', role)):
+                self._execute('INSERT INTO content (role, content_type, value, couple_id) VALUES (?, ?, ?, ?)',
+                              (role, content_type, sql_json(item), couple_id or None))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {content_type} for {role}: {e}")
+            return False
+
+    def remove_content(self, role: str, content_type: str, item: Any, couple_id: Optional[str] = None) -> bool:
+        """Remove an item from a role's content list."""
+        with self.transaction(('content', couple_id, role) if couple_id else ('content', role)):
+            # Compare decoded values: older rows were written with other separators
+            rows = self._query('SELECT id, value FROM content WHERE couple_id IS ? AND role = ? AND content_type = ? '
+                               'ORDER BY id', (couple_id or None, role, content_type))
+            row_id = next((row_id for row_id, value in rows if codec.loads(value) == item), None)
+            if row_id is None:
+                return False
+            cursor = self._execute('DELETE FROM content WHERE id = ?', (row_id,))
+        return cursor.rowcount > 0
+
+    def get_user_couple(self, user_id: int) -> Optional[str]:
+        """Get the couple a user belongs to (a primary-key lookup)."""
+        rows = self._query('SELECT couple_id FROM user_couples WHERE user_id = ?', (str(user_id),))
+        return rows[0][0] if rows else None
+
+    def get_couple(self, couple_id: str) -> Optional[dict]:
+        """Get a couple record ({'members', 'invite_code', 'created_at'}) or None."""
+        rows = self._query('SELECT members, invite_code, created_at FROM couples WHERE couple_id = ?', (couple_id,))
+        if not rows:
+            return None
+        members, invite_code, created_at = rows[0]
+        return {'members': codec.loads(members), 'invite_code': invite_code, 'created_at': created_at}
+
+    def get_couples(self) -> Dict[str, dict]:
+        """Get every couple record, keyed by couple ID."""
+        return {couple_id: {'members': codec.loads(members), 'invite_code': invite_code, 'created_at': created_at}
+                for couple_id, members, invite_code, created_at
+                in self._query('SELECT couple_id, members, invite_code, created_at FROM couples')}
+
+    def get_couple_by_invite(self, invite_code: str) -> Optional[str]:
+        """Resolve an invite code to the couple waiting for a partner."""
+        rows = self._query('SELECT couple_id FROM couples WHERE invite_code = ?', (invite_code,))
+        return rows[0][0] if rows else None
+
+    def create_couple(self, couple_id: str, user_id: int, invite_code: str) -> bool:
+        """Create a couple with one member and an invite code for the partner."""
+        with self.transaction(('couples', couple_id)), self._lock:
+            if self.get_user_couple(user_id) is not None:
+                return False
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        'INSERT INTO couples (couple_id, members, invite_code, created_at) VALUES (?, ?, ?, ?)',
+                        (couple_id, sql_json([str(user_id)]), invite_code, datetime.datetime.now().isoformat()))
+                    self._conn.execute('INSERT INTO user_couples (user_id, couple_id) VALUES (?, ?)',
+                                       (str(user_id), couple_id))
+                return True
+            except sqlite3.IntegrityError as e:
+                logger.error(f"Error creating couple {couple_id}: {e}")
+                return False
+
+    def join_couple(self, couple_id: str, user_id: int) -> bool:
+        """Add the second member to a couple and retire its invite code."""
+        with self.transaction(('couples', couple_id)), self._lock:
+            couple = self.get_couple(couple_id)
+            if couple is None or len(couple['members']) >= 2 or str(user_id) in couple['members']:
+                return False
+
+            # A joiner who was still waiting on their own invite gives it up
+            pending_id = self.get_user_couple(user_id)
+            if pending_id is not None:
+                pending = self.get_couple(pending_id)
+                if pending is None or pending['members'] != [str(user_id)]:
+                    return False
+
+            with self._conn:
+                if pending_id is not None:
+                    self._conn.execute('DELETE FROM couples WHERE couple_id = ?', (pending_id,))
+                self._conn.execute('UPDATE couples SET members = ?, invite_code = NULL WHERE couple_id = ?',
+                                   (sql_json(couple['members'] + [str(user_id)]), couple_id))
+                self._conn.execute('INSERT OR REPLACE INTO user_couples (user_id, couple_id) VALUES (?, ?)',
+                                   (str(user_id), couple_id))
+            return True
+
+    def flush(self) -> bool:
+        """Every write is committed immediately, so there is nothing to flush."""
+        return True
+
+    def sync(self) -> bool:
+        """Every write is committed immediately, so it is durable already."""
+        return True
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def import_json_into_sqlite(json_path: str, store: SqliteBotDataStore) -> bool:
+    """
+    One-shot import of a bot_data/ shard directory or a single JSON file into SQLite.
+
+    Args:
+        json_path (str): Shard directory, or a bot_data.json / bot_data_backup.json file
+        store (SqliteBotDataStore): Freshly created database to fill
+
+    Returns:
+        bool: True if the import succeeded, False otherwise
+    """
+    try:
+        if os.path.isdir(json_path):
+            data = load_sharded_data(json_path)
+        else:
+            data = read_json_file(json_path)
+    except Exception as e:
+        logger.error(f"Error reading {json_path} for import: {e}")
+        return False
+
+    conn = store._conn
+    with store._lock:
+        try:
+            with conn:
+                for section, column in SQLITE_USER_TABLES.items():
+                    conn.executemany(f'INSERT OR REPLACE INTO {section} (user_id, {column}) VALUES (?, ?)',
+                                     [(str(uid), value) for uid, value in data.get(section, {}).items()])
+
+                for kind, due_field in REMINDER_KINDS.items():
+                    # Round-trip through the record so reminders saved before IDs existed get one
+                    rows = [(str(uid), reminder_from_dict(kind, reminder).to_dict())
+                            for uid, reminders in data.get(kind, {}).items()
+                            for reminder in reminders]
+                    conn.executemany(f'INSERT INTO {kind} (user_id, due, data, reminder_id) VALUES (?, ?, ?, ?)',
+                                     [(uid, reminder.get(due_field), sql_json(reminder),
+                                       reminder['id'])
+                                      for uid, reminder in rows])
+
+                conn.executemany('INSERT INTO content (role, content_type, value) VALUES (?, ?, ?)',
+                                 [(role, content_type, sql_json(item))
+                                  for role, types in data.get('content', {}).items()
+                                  for content_type, items in types.items()
+                                  for item in items])
+                conn.executemany('INSERT INTO content (role, content_type, value, couple_id) VALUES (?, ?, ?, ?)',
+                                 [(role, content_type, sql_json(item), couple_id)
+                                  for couple_id, roles in data.get('couple_content', {}).items()
+                                  for role, types in roles.items()
+                                  for content_type, items in types.items()
+                                  for item in items])
+
+                conn.executemany('INSERT INTO couples (couple_id, members, invite_code, created_at) VALUES (?, ?, ?, ?)',
+                                 [(couple_id, sql_json(couple['members']), couple.get('invite_code'),
+                                   couple.get('created_at'))
+                                  for couple_id, couple in data.get('couples', {}).items()])
+                conn.executemany('INSERT INTO user_couples (user_id, couple_id) VALUES (?, ?)',
+                                 list(data.get('user_couples', {}).items()))
+
+                handled = (set(SQLITE_USER_TABLES) | set(REMINDER_KINDS) |
+                           {'content', 'couple_content', 'couples', 'user_couples', 'invite_codes'})
+                conn.executemany('INSERT OR REPLACE INTO documents (key, value) VALUES (?, ?)',
+                                 [(key, sql_json(value))
+                                  for key, value in data.items() if key not in handled])
+
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', ?)",
+                             (os.path.basename(json_path),))
+        except Exception as e:
+            logger.error(f"Error importing {json_path} into SQLite: {e}")
+            return False
+
+    logger.info(f"Imported {os.path.basename(json_path)} into {os.path.basename(store.path)}")
+    return True
+
+
+def open_sqlite_store(db_path: str, json_paths: List[str]) -> SqliteBotDataStore:
+    """
+    Open the SQLite store, migrating from the first existing JSON file on first use.
+
+    Args:
+        db_path (str): Path of the database file
+        json_paths (List[str]): Shard directories or JSON files to import from, in order of preference
+
+    Returns:
+        SqliteBotDataStore: Ready-to-use store
+    """
+    store = SqliteBotDataStore(db_path)
+    if store.is_empty():
+        for json_path in json_paths:
+            if os.path.exists(json_path):
+                import_json_into_sqlite(json_path, store)
+                break
+        else:
+            store.mark_initialized('empty')
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="anselmbot storage tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help="import bot data into a new SQLite database")
+    migrate_parser.add_argument('json_path', help="bot_data/ shard directory, bot_data.json or bot_data_backup.json")
+    migrate_parser.add_argument('db_path', help="SQLite database to create")
+    export_parser = subparsers.add_parser('export', help="write bot data as one pretty-printed JSON file")
+    export_parser.add_argument('source', help="bot_data/ shard directory or a JSON file (e.g. written in compact mode)")
+    export_parser.add_argument('output', help="JSON file to create")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        target = SqliteBotDataStore(args.db_path)
+        if not target.is_empty():
+            parser.error(f"{args.db_path} already contains data")
+        raise SystemExit(0 if import_json_into_sqlite(args.json_path, target) else 1)
+
+    if args.command == 'export':
+        exported = load_sharded_data(args.source) if os.path.isdir(args.source) else read_json_file(args.source)
+        exported.pop(JOURNAL_SEQ_KEY, None)
+        write_json_atomic(args.output, exported, pretty=True)
+        logger.info(f"Exported {args.source} to {args.output} using {codec.name}")